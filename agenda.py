@@ -0,0 +1,78 @@
+"""Agenda central do servidor: trabalho atrasado de cada sala.
+
+Em vez de cada jogada de bot, resposta de truco ou troca de mão abrir uma
+task que dorme alguns segundos, o handler agenda a continuação e retorna.
+A agenda usa loop.call_later (um timer, sem task parada) e só cria a task
+quando o prazo chega. Tudo fica indexado pelo nome da sala:
+cancelar_sala() derruba os timers e as tasks em andamento quando a sala sai
+de 'jogos', então nada acorda numa sala que já não existe.
+"""
+import asyncio
+import traceback
+
+
+class Agenda:
+    def __init__(self):
+        self._timers = {}   # nome_sala -> {TimerHandle}
+        self._tarefas = {}  # nome_sala -> {Task} em execução
+        self.stats = {'agendados': 0, 'disparados': 0, 'cancelados': 0, 'erros': 0}
+
+    def pendentes(self, nome_sala=None):
+        """Timers ainda não disparados (de uma sala ou de todas)"""
+        if nome_sala is not None:
+            return len(self._timers.get(nome_sala, ()))
+        return sum(len(t) for t in self._timers.values())
+
+    def em_execucao(self):
+        return sum(len(t) for t in self._tarefas.values())
+
+    def agendar(self, nome_sala, atraso, funcao, *args, **kwargs):
+        """Chama funcao(*args, **kwargs) daqui a 'atraso' segundos; se ela for
+        corrotina, roda como task da sala"""
+        loop = asyncio.get_running_loop()
+        timers = self._timers.setdefault(nome_sala, set())
+        timer = None
+
+        def disparar():
+            timers.discard(timer)
+            if not timers and self._timers.get(nome_sala) is timers:
+                del self._timers[nome_sala]
+            self.stats['disparados'] += 1
+            resultado = funcao(*args, **kwargs)
+            if asyncio.iscoroutine(resultado):
+                self._executar(nome_sala, resultado)
+
+        timer = loop.call_later(atraso, disparar)
+        timers.add(timer)
+        self.stats['agendados'] += 1
+        return timer
+
+    def _executar(self, nome_sala, corrotina):
+        tarefa = asyncio.ensure_future(corrotina)
+        tarefas = self._tarefas.setdefault(nome_sala, set())
+        tarefas.add(tarefa)
+
+        def terminou(tarefa):
+            tarefas.discard(tarefa)
+            if not tarefas and self._tarefas.get(nome_sala) is tarefas:
+                del self._tarefas[nome_sala]
+            if tarefa.cancelled():
+                return
+            erro = tarefa.exception()
+            if erro is not None:
+                self.stats['erros'] += 1
+                print(f"ERRO NA AGENDA ({nome_sala}): {erro}")
+                traceback.print_exception(type(erro), erro, erro.__traceback__)
+
+        tarefa.add_done_callback(terminou)
+
+    def cancelar_sala(self, nome_sala):
+        """Descarta tudo que a sala tinha agendado ou rodando"""
+        for timer in self._timers.pop(nome_sala, ()):
+            timer.cancel()
+            self.stats['cancelados'] += 1
+        atual = asyncio.current_task()
+        for tarefa in self._tarefas.pop(nome_sala, ()):
+            if tarefa is not atual:  # quem removeu a sala termina o que estava fazendo
+                tarefa.cancel()
+                self.stats['cancelados'] += 1
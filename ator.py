@@ -0,0 +1,95 @@
+"""Caixa de eventos de uma sala (modelo de ator).
+
+Tudo que mexe no estado de uma sala (jogada, truco, jogada de bot, fim de
+rodada, nova mão...) entra na caixa da sala e roda um de cada vez, na ordem
+de chegada. Um evento que está no meio de um await não é mais atravessado
+por outro da mesma sala; salas diferentes seguem independentes, sem trava
+global.
+
+- O limite vale para os eventos vindos do cliente: com 'capacidade' deles
+  esperando, o novo é descartado (clique repetido, cliente inundando). Os
+  da própria sala (interno=True: fim de rodada, nova mão, jogada de bot...)
+  sempre entram, senão a sala parava esperando um passo que se perdeu.
+- Cada evento pode trazer um 'valido': função barata conferida na hora de
+  rodar; se a sala já mudou (ex.: jogada de bot de um turno que passou), o
+  evento é descartado sem rodar.
+- Só existe task (e a fila da caixa) enquanto há evento na caixa: sala
+  parada não carrega nada além do próprio Ator.
+- 'depois' (se houver) roda ao fim de cada evento, mesmo com erro: é onde
+  a sala manda o quadro acumulado (ver quadros.py).
+"""
+import asyncio
+import os
+import traceback
+from collections import deque
+
+CAPACIDADE_CAIXA = int(os.environ.get('SALA_CAIXA', 32))
+
+# Totais de todas as salas
+ESTATISTICAS = {'eventos': 0, 'cheia': 0, 'obsoletos': 0, 'erros': 0}
+
+
+class Ator:
+    __slots__ = ('nome', 'depois', 'capacidade', '_caixa', '_externos', '_tarefa')
+
+    def __init__(self, nome, capacidade=CAPACIDADE_CAIXA, depois=None):
+        self.nome = nome
+        self.depois = depois  # corrotina sem argumentos
+        self.capacidade = capacidade
+        self._caixa = None    # deque, só enquanto há evento
+        self._externos = 0    # eventos de cliente na caixa (os que contam no limite)
+        self._tarefa = None
+
+    def __len__(self):
+        return len(self._caixa) if self._caixa is not None else 0
+
+    def enviar(self, funcao, *args, valido=None, interno=False):
+        """Põe funcao(*args) (corrotina) na caixa; False se é evento de cliente
+        e já há 'capacidade' deles esperando (interno=True entra sempre)"""
+        if not interno:
+            if self._externos >= self.capacidade:
+                ESTATISTICAS['cheia'] += 1
+                return False
+            self._externos += 1
+        if self._caixa is None:
+            self._caixa = deque()
+        self._caixa.append((funcao, args, valido, interno))
+        if self._tarefa is None:
+            self._tarefa = asyncio.ensure_future(self._rodar())
+        return True
+
+    async def _rodar(self):
+        try:
+            while self._caixa:
+                funcao, args, valido, interno = self._caixa.popleft()
+                if not interno:
+                    self._externos -= 1
+                if valido is not None and not valido():
+                    ESTATISTICAS['obsoletos'] += 1
+                    continue
+                ESTATISTICAS['eventos'] += 1
+                await self._chamar(funcao, *args)
+                if self.depois is not None:
+                    await self._chamar(self.depois)
+        finally:
+            self._tarefa = None
+            if not self._caixa:
+                self._caixa = None
+
+    async def _chamar(self, funcao, *args):
+        try:
+            await funcao(*args)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            ESTATISTICAS['erros'] += 1
+            print(f"ERRO NA SALA {self.nome}: {e}")
+            traceback.print_exc()
+
+    def parar(self):
+        """Descarta a caixa; o evento em andamento é cancelado, a menos que
+        seja ele quem está parando a sala"""
+        self._caixa = None
+        self._externos = 0
+        if self._tarefa is not None and self._tarefa is not asyncio.current_task():
+            self._tarefa.cancel()
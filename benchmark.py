@@ -0,0 +1,943 @@
+"""Micro-benchmarks do truco.
+
+Uso: python benchmark.py <nome>   (sem nome roda todos)
+"""
+import random
+import sys
+import time
+import timeit
+
+from truco_core import TrucoGame, NAIPES, FORCA_PADRAO, TABELAS_FORCA, resolver_mao
+
+
+# ==============================================================================
+# FORÇA DAS CARTAS
+# ==============================================================================
+
+def _forca_antiga(jogo, carta):
+    # Caminho antigo de calcular_forca: busca linear + comparação de string
+    if carta.valor == jogo.manilha_da_rodada:
+        return 100 + NAIPES[carta.naipe]
+    return FORCA_PADRAO.index(carta.valor)
+
+def bench_forca(repeticoes=200_000):
+    jogo = TrucoGame()
+    jogo.dar_cartas(4)
+    cartas = list(jogo.baralho)
+
+    for c in cartas:
+        assert _forca_antiga(jogo, c) == jogo.calcular_forca(c)
+
+    def antigo():
+        for c in cartas: _forca_antiga(jogo, c)
+
+    def novo():
+        for c in cartas: jogo.calcular_forca(c)
+
+    n = repeticoes // len(cartas)
+    t_antigo = min(timeit.repeat(antigo, number=n, repeat=5))
+    t_novo = min(timeit.repeat(novo, number=n, repeat=5))
+    total = n * len(cartas)
+    print(f"calcular_forca antigo: {t_antigo / total * 1e9:7.1f} ns/carta")
+    print(f"calcular_forca novo:   {t_novo / total * 1e9:7.1f} ns/carta  ({t_antigo / t_novo:.1f}x)")
+
+
+# ==============================================================================
+# BOT MONTE CARLO x BOT ANTIGO
+# ==============================================================================
+
+def _politica_antiga(mao, vira, *args, **kwargs):
+    # bot_jogar_delay antigo: sempre a carta mais forte
+    return max(mao, key=TABELAS_FORCA[vira // 4].__getitem__)
+
+def _jogar_mao(politicas, num_jogadores, inicial):
+    """Joga uma mão inteira; politicas[time] escolhe a carta. Devolve o vencedor."""
+    from bot_ia import resolver_rodada
+
+    jogo = TrucoGame()
+    maos, vira = jogo.dar_cartas(num_jogadores)
+    maos = [[c.id for c in m] for m in maos]
+    forca = TABELAS_FORCA[vira.id // 4]
+    rodadas = []
+    jogadas = 0  # máscara do RastreadorCartas
+    vez = inicial
+    while True:
+        mesa = []
+        while len(mesa) < num_jogadores:
+            c = politicas[vez % 2](maos[vez], vira.id, mesa, vez, num_jogadores, rodadas, inicial, jogadas=jogadas)
+            maos[vez].remove(c)
+            jogadas |= 1 << c
+            mesa.append((vez, c))
+            vez = (vez + 1) % num_jogadores
+        resultado, vez = resolver_rodada([(s, forca[c]) for s, c in mesa], inicial)
+        rodadas.append(resultado)
+        vencedor = resolver_mao(rodadas)
+        if vencedor is not None:
+            return vencedor
+
+def bench_bot_mc(num_maos=200):
+    from bot_ia import escolher_carta
+
+    for num_jogadores in (2, 4):
+        decisoes = [0, 0.0]
+
+        def politica_mc(*args, **kwargs):
+            inicio = time.perf_counter()
+            c = escolher_carta(*args, **kwargs)
+            decisoes[0] += 1
+            decisoes[1] += time.perf_counter() - inicio
+            return c
+
+        vitorias = derrotas = 0
+        for i in range(num_maos):
+            time_mc = i % 2
+            politicas = [_politica_antiga, _politica_antiga]
+            politicas[time_mc] = politica_mc
+            vencedor = _jogar_mao(politicas, num_jogadores, random.randrange(num_jogadores))
+            if vencedor == time_mc: vitorias += 1
+            elif vencedor in (0, 1): derrotas += 1
+
+        print(f"{num_jogadores} jogadores: MC venceu {vitorias}/{vitorias + derrotas} mãos "
+              f"({100 * vitorias / max(1, vitorias + derrotas):.1f}%) contra o bot antigo")
+        print(f"  {decisoes[0]} decisões, {decisoes[0] / decisoes[1]:.0f} decisões/s "
+              f"({1000 * decisoes[1] / decisoes[0]:.1f} ms cada)")
+
+
+# ==============================================================================
+# CACHE DE DECISÕES DOS BOTS
+# ==============================================================================
+
+def bench_cache(num_maos=10000, orcamento=0.001):
+    """Muitas mãos bot x bot, como várias salas ao mesmo tempo, com e sem cache"""
+    import bot_ia
+
+    for num_jogadores in (2, 4):
+        for tamanho in (0, bot_ia.CACHE_TAMANHO):
+            bot_ia.cache_decisoes = bot_ia.CacheDecisoes(tamanho)
+            gasto = [0, 0.0]
+
+            def politica(mao, vira, mesa, eu, n, rodadas, inicial, jogadas=0):
+                r = {'mao': mao, 'vira': vira, 'mesa': mesa, 'eu': eu, 'num_jogadores': n,
+                     'rodadas': rodadas, 'inicial': inicial, 'valor': 1, 'jogadas': jogadas,
+                     'orcamento': orcamento}
+                inicio = time.perf_counter()
+                c = bot_ia.escolher_carta_cache(r)
+                bot_ia.avaliar_mao(r)
+                gasto[0] += 1
+                gasto[1] += time.perf_counter() - inicio
+                return c
+
+            random.seed(0)
+            for i in range(num_maos):
+                _jogar_mao([politica, politica], num_jogadores, i % num_jogadores)
+
+            s = bot_ia.cache_decisoes.stats
+            consultas = s['acertos'] + s['falhas']
+            print(f"{num_jogadores} jogadores, cache {tamanho:>6}: {gasto[0] / gasto[1]:8.0f} decisões/s, "
+                  f"acertos {100 * s['acertos'] / max(1, consultas):5.1f}% ({len(bot_ia.cache_decisoes)} situações)")
+
+
+# ==============================================================================
+# ESTADO DA SALA: DICT x SALA (__slots__)
+# ==============================================================================
+
+def _sala_dict(nome, modo):
+    # Formato antigo de jogos[nome]
+    return {'jogo': TrucoGame(), 'mao': None, 'maos_server': [], 'jogadores': [f'sid{nome}'] + [f'BOT_{i+1}' for i in range(modo-1)],
+            'jogadores_nomes': ['J'] + [f'Robô {i+1}' for i in range(modo-1)], 'mesa_cartas': [], 'placar': [0,0], 'sets': [0,0],
+            'vez_atual_idx': None, 'estado_jogo': 'JOGANDO', 'max_jogadores': modo, 'jogador_inicial_mao': 0,
+            'pedinte_temp': 1, 'valor_proposto_temp': 3}
+
+def _sala_slots(nome, modo):
+    from sala import Sala
+    sala = Sala(nome, modo)
+    sala.adicionar_jogador(f'sid{nome}', 'J')
+    for i in range(modo-1): sala.adicionar_jogador(f'BOT_{i+1}', f'Robô {i+1}')
+    sala.jogador_inicial_mao = 0; sala.pedinte_temp = 1; sala.valor_proposto_temp = 3
+    return sala
+
+def _trabalho_dict(sala, sid):
+    # O que uma jogada fazia: assento por .index, times e humanos recalculados
+    idx = sala['jogadores'].index(sid)
+    [i for i in range(sala['max_jogadores']) if (i % 2) != (idx % 2)]
+    for p in sala['jogadores']:
+        if not p.startswith('BOT'): sala['jogadores'].index(p)
+    if 'valor_proposto_temp' in sala: sala['valor_proposto_temp']
+    return sala.get('estado_jogo') == 'JOGANDO' and 11 not in sala.get('placar', [])
+
+def _trabalho_slots(sala, sid):
+    idx = sala.assento[sid]
+    sala.indices_oponentes(idx)
+    for p in sala.humanos:
+        sala.assento[p]
+    if sala.valor_proposto_temp is not None: sala.valor_proposto_temp
+    return sala.estado_jogo == 'JOGANDO' and 11 not in sala.placar
+
+def bench_sala(num_salas=2000, repeticoes=200_000):
+    import tracemalloc
+
+    for modo in (2, 4):
+        print(f"-- {modo} jogadores --")
+        for rotulo, criar, trabalho in (('dict', _sala_dict, _trabalho_dict), ('Sala', _sala_slots, _trabalho_slots)):
+            criar('aquece', modo)
+            tracemalloc.start()
+            salas = [criar(str(i), modo) for i in range(num_salas)]
+            por_sala = tracemalloc.get_traced_memory()[0] / num_salas
+            tracemalloc.stop()
+
+            sala = salas[0]
+            sid = f'BOT_{modo-1}'
+            t = min(timeit.repeat(lambda: trabalho(sala, sid), number=repeticoes, repeat=5))
+            objeto = sys.getsizeof(sala) + (sys.getsizeof(sala.__dict__) if hasattr(sala, '__dict__') else 0)
+            print(f"{rotulo:>5}: {objeto:5d} bytes o objeto, {por_sala:6.0f} bytes/sala com tudo   "
+                  f"trabalho por jogada {t / repeticoes * 1e9:6.0f} ns")
+
+
+# ==============================================================================
+# INATIVIDADE: VARREDURA COMPLETA x RODA DE TEMPO
+# ==============================================================================
+
+def bench_afk(num_sids=50_000, segundos=120, sinais_por_segundo=20_000, precisao=1.0):
+    """Simula 'segundos' de servidor: sinais ao acaso e uma varredura por segundo"""
+    from inatividade import MonitorInatividade
+    limite = 60
+
+    rng = random.Random(0)
+    ultimos = {sid: 0.0 for sid in range(num_sids)}
+    monitor = MonitorInatividade(limite, precisao)
+    for sid in range(num_sids): monitor.tocar(sid, 0.0)
+
+    t_toque = [0.0, 0.0]  # antigo, roda
+    t_varre = [0.0, 0.0]
+    expulsos = [0, 0]
+    for seg in range(1, segundos + 1):
+        # só uma parte dos jogadores dá sinal: os outros vão vencendo
+        ativos = [rng.randrange(num_sids // 2) for _ in range(sinais_por_segundo)]
+        agora = float(seg)
+
+        inicio = time.perf_counter()
+        for sid in ativos:
+            if sid in ultimos: ultimos[sid] = agora
+        t_toque[0] += time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        for sid in ativos:
+            if sid in monitor: monitor.tocar(sid, agora)
+        t_toque[1] += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for sid in list(ultimos.keys()):
+            if agora - ultimos.get(sid, agora) > limite:
+                del ultimos[sid]; expulsos[0] += 1
+        t_varre[0] += time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        expulsos[1] += len(monitor.vencidos(agora))
+        t_varre[1] += time.perf_counter() - inicio
+
+    for i, rotulo in enumerate(('varredura completa', f'roda ({precisao}s)')):
+        print(f"{rotulo:>20}: sinal {t_toque[i] / (segundos * sinais_por_segundo) * 1e9:5.0f} ns, "
+              f"varredura {t_varre[i] / segundos * 1000:7.3f} ms, {expulsos[i]} expulsos")
+    print(f"  roda: {monitor.stats['conferidos']} sids conferidos em {monitor.stats['varreduras']} varreduras, "
+          f"{len(monitor)} pendentes")
+
+
+# ==============================================================================
+# EMITS: UM POR JOGADOR x UM PARA A SALA
+# ==============================================================================
+
+async def _servidor_sem_rede(num_sids):
+    """AsyncServer com num_sids clientes falsos na sala 'sala'; o pacote já
+    codificado é descartado. Devolve (sio, sids, contador de pacotes)"""
+    import socketio
+    sio = socketio.AsyncServer(async_mode='asgi')
+    entregues = [0]
+    async def enviar(eio_sid, pacote): entregues[0] += 1
+    sio._send_eio_packet = enviar
+    sids = []
+    for i in range(num_sids):
+        sid = await sio.manager.connect(f'eio{i}', '/')
+        await sio.enter_room(sid, 'sala')
+        sids.append(sid)
+    return sio, sids, entregues
+
+def bench_emit(segundos=1.0):
+    """Atualizações por segundo numa sala (som + mesa + vez), sem rede: só o
+    custo do servidor de montar e despachar os pacotes"""
+    import asyncio
+    from truco_core import BARALHO
+
+    async def rodar(modo):
+        sio, sids, entregues = await _servidor_sem_rede(modo)
+        mesa = {'cartas': [BARALHO[i].json_mesa[i % modo] for i in range(modo)]}
+        vez = sids[0]
+
+        async def antigo():
+            for p in sids: await sio.emit('tocar_som', {'som': 'card'}, to=p)
+            for p in sids: await sio.emit('atualizar_mesa', mesa, to=p)
+            for p in sids: await sio.emit('status_vez', {'e_sua_vez': p == vez}, to=p)
+
+        async def sala():
+            await sio.emit('tocar_som', {'som': 'card'}, room='sala')
+            await sio.emit('atualizar_mesa', mesa, room='sala')
+            await sio.emit('status_vez', {'e_sua_vez': False}, room='sala', skip_sid=vez)
+            await sio.emit('status_vez', {'e_sua_vez': True}, to=vez)
+
+        for rotulo, tick in (('um por sid', antigo), ('sala', sala)):
+            entregues[0] = 0
+            n = 0
+            inicio = time.perf_counter()
+            while time.perf_counter() - inicio < segundos:
+                for _ in range(100): await tick()
+                n += 100
+            dt = time.perf_counter() - inicio
+            print(f"{modo} jogadores, {rotulo:>10}: {n / dt:8.0f} atualizações/s "
+                  f"({3 * n / dt:8.0f} emits lógicos/s, {entregues[0] // n} pacotes por atualização)")
+
+    for modo in (2, 4):
+        asyncio.run(rodar(modo))
+
+
+# ==============================================================================
+# QUADROS: PACOTES POR LANCE
+# ==============================================================================
+
+def bench_quadro(repeticoes=20_000):
+    """Pacotes por jogador em cada tipo de lance (4 humanos), emit por evento x
+    quadro, e o custo de fechar o quadro"""
+    import json
+    from quadros import Quadro
+    from truco_core import BARALHO
+
+    sids = ['a', 'b', 'c', 'd']
+    todos = sids
+    mesa = {'cartas': [BARALHO[i].json_mesa[i] for i in range(3)]}
+    info = lambda i: {'placar': [3, 5], 'sets': [0, 1], 'valor': 1, 'dono_aposta': None,
+                      'nomes': ['A', 'B', 'C', 'D'], 'seu_indice': i, 'rodadas_hist': [0]}
+
+    def jogada(q):
+        q.adicionar('tocar_som', {'som': 'card'}, todos)
+        q.adicionar('atualizar_mesa', mesa, todos)
+        q.adicionar('status_vez', {'e_sua_vez': False}, sids[:1] + sids[2:])
+        q.adicionar('status_vez', {'e_sua_vez': True}, sids[1:2])
+
+    def fim_rodada(q):
+        for i, p in enumerate(sids): q.adicionar('info_jogo', info(i), [p])
+        q.adicionar('resultado_rodada', {'vencedor': 'Time A'}, todos)
+        q.adicionar('atualizar_mesa', {'cartas': []}, todos)
+        q.adicionar('status_vez', {'e_sua_vez': False}, sids[1:])
+        q.adicionar('status_vez', {'e_sua_vez': True}, sids[:1])
+
+    def nova_mao(q):
+        q.adicionar('atualizar_mesa', {'cartas': []}, todos)
+        q.adicionar('tocar_som', {'som': 'shuffle'}, todos)
+        for i, p in enumerate(sids):
+            q.adicionar('receber_mao', {'vira': BARALHO[0].json, 'minhas_cartas': [BARALHO[j].json for j in range(3)], 'seu_indice': i}, [p])
+        for i, p in enumerate(sids): q.adicionar('info_jogo', info(i), [p])
+        q.adicionar('status_vez', {'e_sua_vez': False}, sids[1:])
+        q.adicionar('status_vez', {'e_sua_vez': True}, sids[:1])
+
+    for rotulo, lance in (('jogada', jogada), ('fim de rodada', fim_rodada), ('nova mão', nova_mao)):
+        q = Quadro('sala')
+        lance(q)
+        antes = sum(len(para) for _, _, para in q._pendentes)
+        bytes_antes = sum(len(json.dumps([ev, d])) * len(para) for ev, d, para in q._pendentes)
+        saida, _ = q.fechar(sids)
+        depois = sum(len(s) for _, s in saida)
+        bytes_depois = sum(len(json.dumps(['quadro', pacote])) * len(s) for pacote, s in saida)
+
+        def fechar():
+            lance(q); q.fechar(sids)
+        t = min(timeit.repeat(fechar, number=repeticoes // 10, repeat=5)) / (repeticoes // 10)
+        print(f"{rotulo:>14}: {antes:2d} -> {depois} pacotes ({len(saida)} emits), "
+              f"{bytes_antes:5d} -> {bytes_depois:5d} bytes, montar+fechar {t * 1e6:5.1f} us")
+
+
+# ==============================================================================
+# PLATEIA: UM PACOTE POR ESPECTADOR x UM PACOTE PARA TODOS
+# ==============================================================================
+
+def bench_plateia(segundos=1.0):
+    """Quadros por segundo para uma plateia grande: montar o info_jogo e
+    emitir para cada espectador x montar uma vez e emitir para a lista"""
+    import asyncio
+    from truco_core import BARALHO
+
+    mesa = {'cartas': [BARALHO[i].json_mesa[i] for i in range(3)]}
+    placar, sets, nomes = [3, 5], [0, 1], ['A', 'B', 'C', 'D']
+
+    def info(i):
+        return {'placar': placar, 'sets': sets, 'valor': 3, 'dono_aposta': None,
+                'nomes': nomes, 'seu_indice': i, 'rodadas_hist': [0]}
+
+    async def rodar(num_espectadores):
+        sio, sids, entregues = await _servidor_sem_rede(num_espectadores)
+
+        async def antigo():
+            for v in sids:
+                await sio.emit('quadro', {'sala': 'S', 'v': 1, 'eventos': [('atualizar_mesa', mesa), ('info_jogo', info(0))]}, to=v)
+
+        async def uma_vez():
+            await sio.emit('quadro', {'sala': 'S', 'v': 1, 'eventos': [('atualizar_mesa', mesa), ('info_jogo', info(0))]}, to=sids)
+
+        for rotulo, quadro in (('um por espectador', antigo), ('uma vez', uma_vez)):
+            entregues[0] = 0
+            n = 0
+            inicio = time.perf_counter()
+            while time.perf_counter() - inicio < segundos:
+                await quadro()
+                n += 1
+            dt = time.perf_counter() - inicio
+            print(f"{num_espectadores:4d} espectadores, {rotulo:>17}: {n / dt:7.0f} quadros/s, "
+                  f"{dt / n * 1e3:6.2f} ms por quadro ({entregues[0] // n} pacotes)")
+
+    for n in (50, 500):
+        asyncio.run(rodar(n))
+
+
+# ==============================================================================
+# FILA DE SAÍDA: CLIENTE LENTO NA SALA
+# ==============================================================================
+
+def bench_saida(num_quadros=2000):
+    """Sala de 4 com um cliente cujo transporte não esvazia: quanto fica
+    parado para ele e quanto custa cada quadro para a sala"""
+    import asyncio
+    from saida import Saidas
+    from truco_core import BARALHO
+
+    mesa = {'cartas': [BARALHO[i].json_mesa[i] for i in range(3)]}
+
+    async def rodar():
+        sio, sids, entregues = await _servidor_sem_rede(4)
+        lento = sids[3]
+        saidas = Saidas(sio)
+        saidas._atraso = lambda sid: 100 if sid == lento else 0  # transporte dele nunca esvazia
+
+        def quadro(v):
+            return {'sala': 'S', 'v': v, 'eventos': [('tocar_som', {'som': 'card'}), ('atualizar_mesa', mesa),
+                                                     ('status_vez', {'e_sua_vez': False})]}
+
+        inicio = time.perf_counter()
+        for v in range(num_quadros):
+            await sio.emit('quadro', quadro(v), to=sids)
+        t_direto = time.perf_counter() - inicio
+        print(f"   emit direto: {t_direto / num_quadros * 1e6:6.1f} us por quadro, "
+              f"{num_quadros * 3} eventos parados para o lento (e crescendo)")
+
+        inicio = time.perf_counter()
+        for v in range(num_quadros):
+            await saidas.enviar(sids, 'quadro', quadro(v))
+        t_fila = time.perf_counter() - inicio
+        m = saidas.metricas()
+        print(f"fila de saída: {t_fila / num_quadros * 1e6:6.1f} us por quadro, "
+              f"{m['eventos_na_fila']} eventos na fila do lento ({m['substituidos']} substituídos, "
+              f"{m['descartados']} descartados)")
+        saidas.remover(lento)
+
+    asyncio.run(rodar())
+
+
+# ==============================================================================
+# LOBBY: LISTA INTEIRA x DIFERENÇAS
+# ==============================================================================
+
+def bench_lobby(num_salas=300, num_clientes=200, num_mudancas=100):
+    """Rajada de mudanças (alguém senta) com num_salas abertas e num_clientes
+    no lobby: a lista inteira para todos a cada mudança x diffs na janela"""
+    import asyncio
+    import json
+    from types import SimpleNamespace
+    from lobby import Lobby, resumo
+
+    async def rodar():
+        sio, sids, entregues = await _servidor_sem_rede(num_clientes)
+        bytes_ = [0]
+        async def enviar(eio_sid, pacote):
+            entregues[0] += 1
+            bytes_[0] += len(pacote.data) if isinstance(pacote.data, str) else len(json.dumps(pacote.data))
+        sio._send_eio_packet = enviar
+        jogos = {f'S{i}': SimpleNamespace(nome=f'S{i}', jogadores=['x'], max_jogadores=4 if i % 2 else 2,
+                                           espectadores=set()) for i in range(num_salas)}
+        mudancas = [jogos[f'S{random.randrange(num_salas)}'] for _ in range(num_mudancas)]
+
+        entregues[0] = bytes_[0] = 0
+        inicio = time.perf_counter()
+        for sala in mudancas:
+            sala.jogadores.append('y')
+            await sio.emit('receber_lista_salas', [resumo(s) for s in jogos.values()])
+        dt = time.perf_counter() - inicio
+        print(f"lista inteira: {dt * 1e3:7.1f} ms, {entregues[0]:6d} pacotes, {bytes_[0] / 1e6:7.2f} MB")
+
+        lobby = Lobby(sio, jogos)
+        await lobby.aplicar(lobby.locais())
+        for sid in sids:
+            await lobby.retrato(sid)
+        entregues[0] = bytes_[0] = 0
+        inicio = time.perf_counter()
+        for sala in mudancas:  # todas dentro de uma janela
+            sala.jogadores.append('y')
+            lobby.marcar(sala)
+        lobby._timer.cancel()
+        lobby._timer = None
+        await lobby._publicar()
+        dt = time.perf_counter() - inicio
+        print(f"   diferenças: {dt * 1e3:7.1f} ms, {entregues[0]:6d} pacotes, {bytes_[0] / 1e6:7.2f} MB")
+
+    asyncio.run(rodar())
+
+
+# ==============================================================================
+# CODIFICAÇÃO: JSON x COMPACTA (MESSAGEPACK)
+# ==============================================================================
+
+def bench_codificacao(repeticoes=20_000):
+    """Bytes e tempo de serialização de cada tipo de evento, num quadro de
+    um evento e num quadro típico de jogada"""
+    import json
+    import compacto
+    from truco_core import BARALHO
+
+    if not compacto.DISPONIVEL:
+        print("msgpack não instalado: só há o caminho JSON")
+        return
+
+    nomes = ['Fulano', 'Robô 1', 'Beltrano', 'Robô 3']
+    exemplos = {
+        'receber_mao': {'vira': BARALHO[7].json, 'animar': True, 'blind': False, 'modo_jogo': 4,
+                        'minhas_cartas': [BARALHO[i].json for i in (3, 18, 39)], 'seu_indice': 2},
+        'atualizar_mesa': {'cartas': [BARALHO[i].json_mesa[i % 4] for i in (5, 22, 31)]},
+        'info_jogo': {'valor': 3, 'nomes': nomes, 'rodadas_hist': [0, -1], 'placar': [7, 10], 'sets': [1, 0],
+                      'dono_aposta': 2, 'seu_indice': 2},
+        'status_vez': {'e_sua_vez': True},
+        'tocar_som': {'som': 'card'},
+        'fim_de_mao': {'ganhador': 'Fulano', 'ganhador_idx': 0, 'pontos': 3},
+    }
+    jogada = [('tocar_som', exemplos['tocar_som']), ('atualizar_mesa', exemplos['atualizar_mesa']),
+              ('info_jogo', exemplos['info_jogo']), ('status_vez', exemplos['status_vez'])]
+    casos = [(nome, [(nome, dados)]) for nome, dados in exemplos.items()] + [('quadro de jogada', jogada)]
+
+    print(f"{'evento':>18} {'json B':>7} {'compacto B':>10} {'json us':>8} {'compacto us':>11}")
+    for rotulo, eventos in casos:
+        pacote = {'sala': 'Sala do Fulano', 'v': 1234, 'eventos': eventos}
+        b_json = len(json.dumps(pacote, separators=(',', ':')).encode())
+        b_comp = len(compacto.codificar_quadro(pacote))
+        t_json = timeit.timeit(lambda: json.dumps(pacote, separators=(',', ':')), number=repeticoes) / repeticoes
+        t_comp = timeit.timeit(lambda: compacto.codificar_quadro(pacote), number=repeticoes) / repeticoes
+        print(f"{rotulo:>18} {b_json:7d} {b_comp:10d} {t_json * 1e6:8.2f} {t_comp * 1e6:11.2f}")
+
+
+# ==============================================================================
+# ESTÁTICOS: PRIMEIRA VISITA x VOLTA
+# ==============================================================================
+
+def bench_estaticos(visitas=200):
+    """Bytes por visita (index.html + sons): sem validadores, cada visita baixa
+    tudo; com ETag/compressão/nomes com hash, a volta é 304 e cache"""
+    import asyncio
+    import json
+    import os
+    from estaticos import Estaticos
+
+    arquivos = {'/': 'index.html', **{f'/{n}': n for n in sorted(os.listdir(os.path.dirname(os.path.abspath(__file__))))
+                                     if n.endswith('.mp3')}}
+    estaticos = Estaticos(arquivos)
+
+    async def pedir(caminho, cabecalhos=()):
+        resposta = {}
+        async def send(msg):
+            if msg['type'] == 'http.response.start':
+                resposta['status'] = msg['status']
+                resposta['headers'] = dict(msg['headers'])
+            else:
+                resposta['corpo'] = msg['body']
+        await estaticos({'type': 'http', 'method': 'GET', 'path': caminho, 'headers': list(cabecalhos)}, None, send)
+        return resposta
+
+    async def rodar():
+        sem_cache = sum(os.path.getsize(os.path.join(os.path.dirname(os.path.abspath(__file__)), n))
+                        for n in arquivos.values())
+        print(f" sem validadores: {sem_cache / 1e3:7.1f} kB por visita, {len(arquivos)} pedidos")
+
+        # Primeira visita: index comprimido + sons pelos nomes com hash
+        index = await pedir('/', [(b'accept-encoding', b'gzip, br')])
+        texto = estaticos.rotas['/'].variantes[None][0].decode()
+        mapa = json.loads(texto.split('/*ARQUIVOS*/', 1)[1].split(';', 1)[0])
+        primeira = len(index['corpo'])
+        for versionada in mapa.values():
+            primeira += len((await pedir('/' + versionada))['corpo'])
+        print(f"primeira visita: {primeira / 1e3:7.1f} kB, {1 + len(mapa)} pedidos")
+
+        # Volta: só o index revalida (304); os sons com hash nem são pedidos
+        etag = index['headers'][b'etag']
+        inicio = time.perf_counter()
+        for _ in range(visitas):
+            volta = await pedir('/', [(b'accept-encoding', b'gzip, br'), (b'if-none-match', etag)])
+        dt = time.perf_counter() - inicio
+        print(f"          volta: {len(volta['corpo']) / 1e3:7.1f} kB, 1 pedido ({volta['status']}), "
+              f"{dt / visitas * 1e6:.0f} us por revalidação")
+
+    asyncio.run(rodar())
+
+
+# ==============================================================================
+# SHARDS: SALAS POR SEGUNDO E LATÊNCIA COM N PROCESSOS
+# ==============================================================================
+
+def bench_shards(num_salas=60, segundos=10.0, shards=(1, 2, 4)):
+    """lancador.py com N processos e num_salas salas de 2 humanos (clientes
+    Socket.IO neste processo): salas prontas por segundo (criar + entrar até
+    as duas mãos chegarem) e latência da jogada (jogar_carta até o quadro
+    seguinte). Os clientes dividem a CPU com os servidores: em máquina com
+    poucos núcleos o ganho some."""
+    import asyncio
+    import os
+    import subprocess
+    import urllib.request
+    import socketio
+
+    porta = 10190
+    url = f'http://127.0.0.1:{porta}'
+
+    async def rodar(n):
+        env = dict(os.environ, PORT=str(porta), BOT_PROCESSOS='1')
+        lancador = subprocess.Popen([sys.executable, 'lancador.py', str(n)], env=env,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                try:
+                    urllib.request.urlopen(url + '/metricas', timeout=1)
+                    break
+                except OSError:
+                    await asyncio.sleep(0.1)
+            await asyncio.sleep(1.0)  # todos os processos de pé
+
+            latencias = []
+            prontas = asyncio.Queue()
+            no_lobby = set()      # salas que o lobby já mostrou
+            visivel = asyncio.Event()
+            clientes = []
+
+            def jogador(nome_sala):
+                c = socketio.AsyncClient()
+                st = {'mao': [], 'enviou': None, 'recebeu_mao': False}
+
+                async def quadro(q):
+                    agora = time.perf_counter()
+                    if st['enviou'] is not None:
+                        latencias.append(agora - st['enviou'])
+                        st['enviou'] = None
+                    for evento, dados in q['eventos']:
+                        if evento == 'receber_mao':
+                            st['mao'] = list(dados['minhas_cartas'])
+                            if not st['recebeu_mao']:
+                                st['recebeu_mao'] = True
+                                prontas.put_nowait(agora)
+                        elif evento == 'status_vez' and dados['e_sua_vez'] and st['mao']:
+                            st['enviou'] = time.perf_counter()
+                            await c.emit('jogar_carta', {'carta': st['mao'].pop(0)})
+                        elif evento == 'receber_pedido_truco':
+                            await c.emit('responder_truco', {'resposta': 'ACEITAR'})
+                        elif evento == 'decisao_mao_11':
+                            await c.emit('responder_mao_11', {'resposta': 'JOGAR'})
+
+                async def lobby(d):
+                    no_lobby.update(s['nome'] for s in d.get('mudou', d.get('salas', [])))
+                    visivel.set()
+                c.on('quadro', quadro)
+                c.on('lobby_diff', lobby)
+                c.on('lobby_retrato', lobby)
+                clientes.append(c)
+                return c
+
+            jogadas = []
+            try:
+                # Como gente: cria a sala, e o outro entra quando ela aparece no lobby
+                inicio = time.perf_counter()
+                pares = []
+                for i in range(num_salas):
+                    a, b = jogador(f'B{i}'), jogador(f'B{i}')
+                    await a.connect(url, transports=['websocket'])
+                    await b.connect(url, transports=['websocket'])
+                    await a.emit('criar_sala', {'nome_sala': f'B{i}', 'modo': 2, 'nome_jogador': 'A'})
+                    pares.append((f'B{i}', b))
+                while pares:
+                    visivel.clear()
+                    for nome, b in [p for p in pares if p[0] in no_lobby]:
+                        await b.emit('entrar_sala', {'nome_sala': nome, 'nome_jogador': 'B'})
+                    pares = [p for p in pares if p[0] not in no_lobby]
+                    if pares:
+                        await asyncio.wait_for(visivel.wait(), 30)
+                ultima = inicio
+                for _ in range(2 * num_salas):
+                    ultima = max(ultima, await asyncio.wait_for(prontas.get(), 30))
+                salas_s = num_salas / (ultima - inicio)
+
+                latencias.clear()
+                await asyncio.sleep(segundos)
+                jogadas = sorted(latencias)
+            finally:
+                for c in clientes:
+                    await c.disconnect()
+        finally:
+            lancador.terminate()
+            lancador.wait()
+        if not jogadas:
+            print(f"{n} processo(s): nenhuma jogada medida")
+            return
+        p50 = jogadas[len(jogadas) // 2] * 1e3
+        p99 = jogadas[int(len(jogadas) * 0.99)] * 1e3
+        print(f"{n} processo(s): {salas_s:6.1f} salas/s, {len(jogadas) / segundos:6.1f} jogadas/s, "
+              f"latência p50 {p50:6.1f} ms, p99 {p99:6.1f} ms")
+
+    print(f"({os.cpu_count()} núcleo(s) nesta máquina)")
+    for n in shards:
+        asyncio.run(rodar(n))
+
+
+# ==============================================================================
+# DIÁRIO: CUSTO POR JOGADA E RECUPERAÇÃO
+# ==============================================================================
+
+def _jogadas(sala, num_jogadas):
+    """Partida de mentira direto na Sala: dá cartas, joga, fecha rodadas e mãos"""
+    from truco_core import Mao
+    n = sala.max_jogadores
+    for _ in range(num_jogadas):
+        if sala.mao is None or len(sala.mao.rodadas) == 3:
+            sala.mao = Mao(sala.jogo)
+            sala.maos_server, _vira = sala.jogo.dar_cartas(n)
+            sala.num_mao += 1
+            sala.vez_atual_idx = sala.num_mao % n
+            sala.placar[sala.num_mao % 2] = (sala.placar[sala.num_mao % 2] + 1) % 12
+        idx = sala.vez_atual_idx
+        sala.mesa_cartas.append((sala.jogadores[idx], sala.maos_server[idx].pop()))
+        sala.vez_atual_idx = (idx + 1) % n
+        sala.turno += 1
+        if len(sala.mesa_cartas) == n:
+            sala.mesa_cartas = []
+            sala.mao.rodadas.append(random.choice((0, 1, -1)))
+        yield sala
+
+
+def bench_diario(num_salas=200, jogadas_por_sala=60, tamanhos=(1_000, 10_000, 100_000)):
+    """Quanto registrar() soma a cada jogada, quantos fsyncs a leva junta e
+    quanto tempo leva voltar com diários de vários tamanhos"""
+    import asyncio
+    import os
+    import shutil
+    import tempfile
+    from diario import Diario
+    from sala import Sala
+
+    def sala_nova(nome):
+        sala = Sala(nome, 4)
+        for i in range(4):
+            sala.adicionar_jogador(f'sid-{nome}-{i}', f'Jogador {i}')
+        return sala
+
+    pasta = tempfile.mkdtemp(prefix='diario-')
+    try:
+        # 1. Custo no caminho da jogada (estado + diff; JSON e disco são da thread)
+        diario = Diario(pasta, checkpoint=10 ** 9)
+        sala = sala_nova('S')
+        jogadas = list(range(20_000))
+        t_jogo = timeit.timeit(lambda: [None for _ in _jogadas(sala, len(jogadas))], number=1)
+        sala = sala_nova('S')
+        t_com = timeit.timeit(lambda: [diario.registrar(s) for s in _jogadas(sala, len(jogadas))], number=1)
+        diario._gravar(diario._buffer, None)
+        diario._arquivo.close()
+        print(f"registrar: {(t_com - t_jogo) / len(jogadas) * 1e6:5.1f} us por jogada, "
+              f"{diario.stats['bytes'] / diario.stats['registros']:5.0f} B por registro")
+
+        # 2. Group commit: num_salas jogando ao mesmo tempo, uma leva por janela
+        async def rodar():
+            diario = Diario(os.path.join(pasta, 'levas'), checkpoint=10 ** 9)
+            diario.iniciar()
+            salas = [_jogadas(sala_nova(f'S{i}'), jogadas_por_sala) for i in range(num_salas)]
+            inicio = time.perf_counter()
+            for _ in range(jogadas_por_sala):
+                for jogo in salas:
+                    diario.registrar(next(jogo))
+                await asyncio.sleep(0.001)
+            await diario.fechar()
+            dt = time.perf_counter() - inicio
+            s = diario.stats
+            print(f"   levas: {s['registros']} registros em {dt:.2f} s, {s['levas']} fsyncs "
+                  f"({s['registros'] / s['levas']:.0f} registros por fsync, {s['fsync_ms'] / s['levas']:.2f} ms cada)")
+
+        asyncio.run(rodar())
+
+        # 3. Recuperação x tamanho do diário (sem retrato: repassa tudo)
+        print(f"{'registros':>10} {'MB':>7} {'recuperar ms':>13} {'com retrato ms':>15}")
+        for tamanho in tamanhos:
+            caminho = os.path.join(pasta, f'r{tamanho}')
+            diario = Diario(caminho, checkpoint=10 ** 9)
+            os.makedirs(caminho)
+            salas = [_jogadas(sala_nova(f'S{i}'), tamanho) for i in range(num_salas)]
+            for k in range(tamanho):
+                diario.registrar(next(salas[k % num_salas]))
+            diario._gravar(diario._buffer, None)
+            mb = diario.stats['bytes'] / 1e6
+            t_tudo = timeit.timeit(lambda: Diario(caminho).recuperar(), number=1)
+            # Com retrato: só a cauda depois dele (o checkpoint normal)
+            diario._gravar(b'', dict(diario._ultimo))
+            t_retrato = timeit.timeit(lambda: Diario(caminho).recuperar(), number=1)
+            diario._arquivo.close()
+            print(f"{tamanho:10d} {mb:7.2f} {t_tudo * 1e3:13.1f} {t_retrato * 1e3:15.1f}")
+    finally:
+        shutil.rmtree(pasta)
+
+
+# ==============================================================================
+# FILA DE PARTIDA RÁPIDA
+# ==============================================================================
+
+def bench_fila(num_jogadores=100_000, salas_abertas=(100, 1000, 10_000), clientes=40, shards=(1, 2, 4)):
+    """Custo por entrada: procurar uma sala com vaga na lista x a fila por modo.
+    Depois, com o lancador.py: 'clientes' entram na fila de 4 (conectando em
+    processos quaisquer) e conta quantas mesas fecharam só com gente."""
+    import asyncio
+    import os
+    import subprocess
+    import urllib.request
+    from pareamento import Pareamento
+
+    async def rodar():
+        for abertas in salas_abertas:
+            # Caminho manual: varre as salas até achar uma com vaga (as cheias ficam na lista)
+            salas = [[0, 4] for _ in range(abertas)]
+            for sala in salas[:-1]:
+                sala[0] = 4
+            n = min(num_jogadores, 20_000)
+            inicio = time.perf_counter()
+            for _ in range(n):
+                for sala in salas:
+                    if sala[0] < sala[1]:
+                        sala[0] += 1
+                        if sala[0] == sala[1]:
+                            salas.append([0, 4])
+                        break
+            t_lista = (time.perf_counter() - inicio) / n
+            print(f"{abertas:6d} salas na lista: {t_lista * 1e6:8.2f} us por jogador")
+
+        mesas = []
+        fila = Pareamento(lambda modo, jogadores: mesas.append(jogadores), espera_bot=0)
+        inicio = time.perf_counter()
+        for i in range(num_jogadores):
+            fila.entrar(f'sid{i}', 'J', 4 if i % 3 else 2)
+        t_fila = (time.perf_counter() - inicio) / num_jogadores
+        print(f"          fila: {t_fila * 1e6:8.2f} us por jogador ({len(mesas)} mesas)")
+
+    porta = 10191
+    url = f'http://127.0.0.1:{porta}'
+
+    async def com_shards(n):
+        import socketio
+        env = dict(os.environ, PORT=str(porta), BOT_PROCESSOS='0', DIARIO='', FILA_ESPERA_BOT='5')
+        lancador = subprocess.Popen([sys.executable, 'lancador.py', str(n)], env=env,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        sentados = {}  # sid do cliente -> sala
+        todos = asyncio.Event()
+        conectados = []
+        try:
+            for _ in range(100):
+                try:
+                    urllib.request.urlopen(url + '/metricas', timeout=1)
+                    break
+                except OSError:
+                    await asyncio.sleep(0.1)
+            await asyncio.sleep(1.0)
+            for i in range(clientes):
+                c = socketio.AsyncClient()
+
+                def ficha(d, i=i):
+                    sentados[i] = d['nome_sala']
+                    if len(sentados) == clientes:
+                        todos.set()
+                c.on('ficha', ficha)
+                await c.connect(url, transports=['websocket'])
+                conectados.append(c)
+            inicio = time.perf_counter()
+            for c in conectados:
+                await c.emit('entrar_fila', {'modo': 4, 'nome_jogador': 'J'})
+            try:
+                await asyncio.wait_for(todos.wait(), 20)
+            except asyncio.TimeoutError:
+                pass
+            tempo = time.perf_counter() - inicio
+        finally:
+            for c in conectados:
+                await c.disconnect()
+            lancador.terminate()
+            lancador.wait()
+        por_sala = {}
+        for sala in sentados.values():
+            por_sala[sala] = por_sala.get(sala, 0) + 1
+        cheias = sum(1 for q in por_sala.values() if q == 4)
+        print(f"{n} processo(s): {len(sentados)}/{clientes} sentados em {tempo * 1000:6.0f} ms, "
+              f"{cheias} de {len(por_sala)} mesas só com gente")
+
+    asyncio.run(rodar())
+    for n in shards:
+        asyncio.run(com_shards(n))
+
+
+def bench_memoria(num_salas=2000, amostra=200):
+    """Bytes por sala: memoria() (a conta do servidor) x tracemalloc, e quanto
+    cada sala medida segura o loop, com compartilhados() por sala ou por varredura"""
+    import tracemalloc
+    from sala import Sala, compartilhados
+
+    def abrir(i):
+        sala = Sala(f'S{i}', 4)
+        for k in range(4):
+            sala.adicionar_jogador(f'sid{i}-{k}' if k % 2 == 0 else f'BOT_{k}', f'J{k}', None if k % 2 else 'x' * 22)
+        for _ in _jogadas(sala, random.randrange(1, 40)):
+            pass
+        return sala
+
+    abrir(0)  # caches e tabelas compartilhadas fora da medida
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    salas = [abrir(i) for i in range(num_salas)]
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"tracemalloc: {(depois - antes) / num_salas / 1024:6.1f} KB por sala ({num_salas} salas)")
+
+    sorteadas = random.sample(salas, amostra)
+    inicio = time.perf_counter()
+    tamanhos = [sala.memoria() for sala in sorteadas]
+    t_sala = (time.perf_counter() - inicio) / amostra
+    inicio = time.perf_counter()
+    base = compartilhados()
+    tamanhos = [sala.memoria(base) for sala in sorteadas]
+    t_base = (time.perf_counter() - inicio) / amostra
+    print(f"memoria():   {sum(tamanhos) / len(tamanhos) / 1024:6.1f} KB por sala (maior {max(tamanhos) / 1024:.1f} KB)")
+    print(f"  por sala: {t_sala * 1e6:.0f} us montando compartilhados() a cada uma, {t_base * 1e6:.0f} us com a base da varredura")
+
+
+BENCHMARKS = {
+    'forca': bench_forca,
+    'bot_mc': bench_bot_mc,
+    'cache': bench_cache,
+    'sala': bench_sala,
+    'afk': bench_afk,
+    'emit': bench_emit,
+    'quadro': bench_quadro,
+    'plateia': bench_plateia,
+    'saida': bench_saida,
+    'lobby': bench_lobby,
+    'codificacao': bench_codificacao,
+    'estaticos': bench_estaticos,
+    'shards': bench_shards,
+    'diario': bench_diario,
+    'fila': bench_fila,
+    'memoria': bench_memoria,
+}
+
+if __name__ == '__main__':
+    nomes = sys.argv[1:] or list(BENCHMARKS)
+    for nome in nomes:
+        print(f"== {nome} ==")
+        BENCHMARKS[nome]()
@@ -0,0 +1,335 @@
+"""Escolha de carta dos bots por Monte Carlo com determinização.
+
+A cada decisão o bot sorteia as cartas que não viu (baralho menos a própria
+mão, o vira e tudo que já foi jogado na mão) entre os outros jogadores, joga
+o resto da mão com uma política heurística para cada carta candidata e fica
+com a de melhor média de pontos. A busca tem um orçamento de tempo rígido; se não der para simular
+nada, cai direto na heurística.
+
+Tudo trabalha com ids de carta (0-39) e forças, sem objetos Carta, para que
+as decisões possam rodar em outro processo (ver servico_bots.py) a partir de
+um retrato da sala (dict montado por server.retrato_bot).
+"""
+import os
+import random
+import time
+from collections import OrderedDict
+
+from equidade import carregar_tabela
+from truco_core import TABELAS_FORCA, resolver_mao
+
+ORCAMENTO_PADRAO = 0.03   # segundos por decisão
+MAX_AMOSTRAS = 400        # para de simular antes do prazo se já tiver isso
+CACHE_TAMANHO = int(os.environ.get('BOT_CACHE', 50_000))  # situações guardadas por processo
+
+
+class RastreadorCartas:
+    """Memória do bot: cartas já jogadas na mão atual como máscara de 40 bits
+    (bit i = carta de id i). Só existe em salas com bot."""
+    __slots__ = ('jogadas', 'vira')
+
+    def __init__(self):
+        self.jogadas = 0
+        self.vira = None
+
+    def nova_mao(self, id_vira):
+        self.jogadas = 0
+        self.vira = id_vira
+
+    def registrar(self, id_carta):
+        self.jogadas |= 1 << id_carta
+
+
+def maior_forca_viva(mao, vira, jogadas):
+    """Maior força entre as cartas que o bot ainda não viu (-1 se nenhuma)"""
+    forca = TABELAS_FORCA[vira // 4]
+    vistas = jogadas | (1 << vira)
+    for c in mao:
+        vistas |= 1 << c
+    return max((forca[c] for c in range(40) if not vistas >> c & 1), default=-1)
+
+
+def cartas_imbativeis(mao, vira, jogadas):
+    """Cartas da mão que nenhuma carta não vista ganha nem empata
+    (ex.: as duas manilhas maiores já saíram, então o Copas virou a maior)"""
+    forca = TABELAS_FORCA[vira // 4]
+    limite = maior_forca_viva(mao, vira, jogadas)
+    return [c for c in mao if forca[c] > limite]
+
+
+def jogada_heuristica(mao, mesa, vez):
+    """Força a jogar: torna com a maior; se o time já ganha a mesa, joga a
+    menor; senão a menor que ganha, ou a menor de todas.
+    mao = forças do jogador, mesa = [(assento, força), ...]"""
+    if not mesa:
+        return max(mao)
+    meu_time = vez % 2
+    melhor_nosso = max((f for s, f in mesa if s % 2 == meu_time), default=-1)
+    melhor_deles = max((f for s, f in mesa if s % 2 != meu_time), default=-1)
+    if melhor_nosso > melhor_deles:
+        return min(mao)
+    maiores = [f for f in mao if f > melhor_deles]
+    return min(maiores) if maiores else min(mao)
+
+
+def resolver_rodada(mesa, inicial):
+    """(resultado, quem torna): resultado 0/1 ou -1 (canga). Quem jogou a maior
+    carta torna; na canga torna o jogador inicial da mão (igual ao servidor)."""
+    maior = max(f for _, f in mesa)
+    times = {s % 2 for s, f in mesa if f == maior}
+    if len(times) > 1:
+        return -1, inicial
+    vencedor = times.pop()
+    torna = next(s for s, f in mesa if f == maior and s % 2 == vencedor)
+    return vencedor, torna
+
+
+def _jogar_ate_o_fim(maos, mesa, vez, rodadas, inicial, num_jogadores):
+    """Completa a mão com a heurística para todos; devolve o vencedor."""
+    rodadas = list(rodadas)
+    while True:
+        while len(mesa) < num_jogadores:
+            f = jogada_heuristica(maos[vez], mesa, vez)
+            maos[vez].remove(f)
+            mesa.append((vez, f))
+            vez = (vez + 1) % num_jogadores
+        resultado, vez = resolver_rodada(mesa, inicial)
+        rodadas.append(resultado)
+        vencedor = resolver_mao(rodadas)
+        if vencedor is not None:
+            return vencedor
+        mesa = []
+
+
+def escolher_carta(mao, vira, mesa, eu, num_jogadores, rodadas, inicial,
+                   valor=1, jogadas=0, orcamento=ORCAMENTO_PADRAO):
+    """Id da carta que o bot no assento 'eu' deve jogar.
+
+    mao: ids na mão do bot; vira: id do vira; mesa: [(assento, id), ...] da
+    rodada atual; rodadas: resultados já decididos; inicial: quem começou a
+    mão; jogadas: máscara das cartas já jogadas na mão (RastreadorCartas)."""
+    forca = TABELAS_FORCA[vira // 4]
+    mesa_f = [(s, forca[c]) for s, c in mesa]
+    if len(mao) == 1:
+        return mao[0]
+
+    # Candidatas por força (cartas de mesma força são equivalentes)
+    por_forca = {}
+    for c in sorted(mao, key=lambda c: forca[c]):
+        por_forca.setdefault(forca[c], c)
+    if len(por_forca) == 1:
+        return mao[0]
+
+    # Cartas que faltam na mão de cada outro jogador
+    ja_jogou = {s for s, _ in mesa}
+    faltam = {s: 3 - len(rodadas) - (s in ja_jogou) for s in range(num_jogadores) if s != eu}
+    fora = set(mao) | {vira} | {c for _, c in mesa}
+    nao_vistas = [c for c in range(40) if c not in fora and not jogadas >> c & 1]
+    total = sum(faltam.values())
+
+    minhas = [forca[c] for c in mao]
+    pontos = dict.fromkeys(por_forca, 0)
+    amostras = 0
+    prazo = time.perf_counter() + orcamento
+    while amostras < MAX_AMOSTRAS and time.perf_counter() < prazo and total <= len(nao_vistas):
+        sorteio = random.sample(nao_vistas, total)
+        maos_outros = {}
+        i = 0
+        for s, n in faltam.items():
+            maos_outros[s] = [forca[c] for c in sorteio[i:i + n]]
+            i += n
+
+        # Mesma distribuição para todas as candidatas (compara em pé de igualdade)
+        for f in por_forca:
+            maos = {s: list(m) for s, m in maos_outros.items()}
+            maos[eu] = list(minhas)
+            maos[eu].remove(f)
+            vencedor = _jogar_ate_o_fim(maos, mesa_f + [(eu, f)], (eu + 1) % num_jogadores,
+                                        rodadas, inicial, num_jogadores)
+            if vencedor == eu % 2:
+                pontos[f] += valor
+            elif vencedor in (0, 1):
+                pontos[f] -= valor
+        amostras += 1
+
+    if not amostras:
+        return por_forca[jogada_heuristica(minhas, mesa_f, eu)]
+
+    # Em caso de empate fica a menor (poupa manilha)
+    melhor = max(por_forca, key=lambda f: (pontos[f], -f))
+    return por_forca[melhor]
+
+
+# ==============================================================================
+# CACHE DE DECISÕES
+# ==============================================================================
+# Bots de salas diferentes caem nas mesmas situações. A chave troca as cartas
+# pelas forças (o naipe só conta na manilha, e aí já está na força) e gira os
+# assentos de 2 em 2 para o bot ficar no 0 ou no 1 (os times não mudam).
+
+# Força "densa": posição da força entre as 13 possíveis com aquele vira (0-8
+# cartas comuns, 9-12 manilhas). A busca só compara forças, então a escolha não
+# muda; e com o vira contado entre as cartas vistas, a chave de escolher_carta
+# não depende mais de qual é o vira.
+FORCA_DENSA = tuple(tuple(sorted(set(t)).index(f) for f in t) for t in TABELAS_FORCA)
+
+class CacheDecisoes:
+    """LRU limitado de situação canônica -> decisão. Um por processo."""
+    def __init__(self, tamanho=CACHE_TAMANHO):
+        self.tamanho = tamanho
+        self._dados = OrderedDict()
+        self.stats = {'acertos': 0, 'falhas': 0}
+
+    def __len__(self):
+        return len(self._dados)
+
+    def obter(self, chave):
+        valor = self._dados.get(chave)
+        if valor is None:
+            self.stats['falhas'] += 1
+            return None
+        self._dados.move_to_end(chave)
+        self.stats['acertos'] += 1
+        return valor
+
+    def guardar(self, chave, valor):
+        if self.tamanho <= 0:
+            return
+        self._dados[chave] = valor
+        self._dados.move_to_end(chave)
+        if len(self._dados) > self.tamanho:
+            self._dados.popitem(last=False)
+
+cache_decisoes = CacheDecisoes()
+
+def _forcas_vistas(r, forca, vira=False):
+    """Forças (ordenadas) de tudo que já saiu na mão, mesa incluída"""
+    vistas = r['jogadas'] | (1 << r['vira'] if vira else 0)
+    for _, c in r['mesa']:
+        vistas |= 1 << c
+    return tuple(sorted(forca[c] for c in range(40) if vistas >> c & 1))
+
+def chave_carta(r):
+    """Situação canônica de escolher_carta. O valor da mão fica de fora: ele
+    multiplica os pontos de todas as candidatas e não muda a escolha."""
+    forca = FORCA_DENSA[r['vira'] // 4]
+    n = r['num_jogadores']
+    giro = r['eu'] - r['eu'] % 2
+    return ('carta', n, r['eu'] - giro, (r['inicial'] - giro) % n, tuple(r['rodadas']),
+            tuple(sorted(forca[c] for c in r['mao'])),
+            tuple(((s - giro) % n, forca[c]) for s, c in r['mesa']),
+            _forcas_vistas(r, forca, vira=True))
+
+def chave_avaliacao(r):
+    """Situação canônica de avaliar_mao (não depende de assento nem mesa). Usa
+    a força de verdade: os critérios sem tabela comparam com limiares fixos."""
+    forca = TABELAS_FORCA[r['vira'] // 4]
+    return ('avaliacao', r['num_jogadores'], r['vira'] // 4,
+            tuple(sorted(forca[c] for c in r['mao'])), _forcas_vistas(r, forca))
+
+
+# ==============================================================================
+# DECISÕES A PARTIR DO RETRATO DA SALA
+# ==============================================================================
+# Retrato: {'mao', 'vira', 'mesa', 'eu', 'num_jogadores', 'rodadas', 'inicial',
+#           'valor', 'jogadas', 'pode_pedir', 'orcamento'} (só ids e números, picklável)
+
+_tabela = False  # carregada na primeira consulta, uma vez por processo
+
+def tabela_equidade():
+    global _tabela
+    if _tabela is False:
+        _tabela = carregar_tabela()
+    return _tabela
+
+def equidade_mao(mao, vira, num_jogadores):
+    """Chance de o time levar a mão pela tabela de equidade.
+    Só vale para a mão inteira (3 cartas); fora isso devolve None."""
+    tabela = tabela_equidade()
+    if tabela is None or len(mao) != 3:
+        return None
+    return tabela.equidade(mao, vira, num_jogadores)
+
+def _forcas(r):
+    forca = TABELAS_FORCA[r['vira'] // 4]
+    return sorted((forca[c] for c in r['mao']), reverse=True)
+
+def avaliar_mao(r):
+    """(equidade ou None, tem carta imbatível, forças em ordem decrescente).
+    É a parte determinística de pedir/aceitar truco; o sorteio fica de fora."""
+    chave = chave_avaliacao(r)
+    avaliacao = cache_decisoes.obter(chave)
+    if avaliacao is None:
+        avaliacao = (equidade_mao(r['mao'], r['vira'], r['num_jogadores']),
+                     bool(cartas_imbativeis(r['mao'], r['vira'], r['jogadas'])),
+                     tuple(_forcas(r)))
+        cache_decisoes.guardar(chave, avaliacao)
+    return avaliacao
+
+def escolher_carta_cache(r):
+    """escolher_carta pelo retrato, passando antes pelo cache"""
+    forca = FORCA_DENSA[r['vira'] // 4]
+    if len({forca[c] for c in r['mao']}) == 1:
+        return r['mao'][0]  # última carta (ou todas iguais): nada a decidir
+    chave = chave_carta(r)
+    f = cache_decisoes.obter(chave)
+    if f is not None:
+        return next(c for c in r['mao'] if forca[c] == f)
+    c = escolher_carta(r['mao'], r['vira'], r['mesa'], r['eu'], r['num_jogadores'],
+                       r['rodadas'], r['inicial'], valor=r['valor'],
+                       jogadas=r['jogadas'], orcamento=r['orcamento'])
+    if r['orcamento'] > 0:  # sem orçamento é só a heurística; não guarda
+        cache_decisoes.guardar(chave, forca[c])
+    return c
+
+def deve_pedir_truco(r):
+    if not r['mao']:
+        return False
+    chance = random.random()  # evita robô perfeito
+
+    # com a mão inteira, usa a chance real de vitória
+    equidade, imbativel, forcas = avaliar_mao(r)
+    if equidade is not None:
+        return (equidade >= 0.72 and chance < 0.75) or (equidade >= 0.62 and chance < 0.55)
+
+    # já ganhou uma rodada e tem a maior carta ainda viva: a mão está garantida
+    meu_time = r['eu'] % 2
+    if meu_time in r['rodadas'] and imbativel and chance < 0.85:
+        return True
+
+    # critérios simples e eficientes
+    tem_carta_muito_forte = forcas[0] >= 10
+    tem_duas_boas = len(forcas) >= 2 and forcas[1] >= 7
+    return (tem_carta_muito_forte and chance < 0.75) or (tem_duas_boas and chance < 0.55)
+
+def deve_blefar(r):
+    # NÃO blefa se já estiver muito alto
+    if not r['mao'] or r['valor'] >= 9:
+        return False
+    chance = random.random()
+
+    # blefe puro (mão fraca) / semi-blefe (mão média)
+    equidade, _, forcas = avaliar_mao(r)
+    if equidade is not None:
+        return (equidade < 0.35 and chance < 0.18) or (0.35 <= equidade < 0.5 and chance < 0.35)
+
+    return (forcas[0] < 6 and chance < 0.18) or (6 <= forcas[0] < 8 and chance < 0.35)
+
+def decidir_jogada(r):
+    """('truco', None) para pedir aumento, ou ('carta', id) para jogar"""
+    if r['pode_pedir'] and (deve_pedir_truco(r) or deve_blefar(r)):
+        return 'truco', None
+    return 'carta', escolher_carta_cache(r)
+
+def decidir_resposta_truco(r, valor_proposto):
+    """'ACEITAR' ou 'CORRER' para um pedido de valor_proposto"""
+    equidade, imbativel, _ = avaliar_mao(r)
+    if equidade is not None:
+        # quanto maior a aposta, mais forte a mão precisa ser
+        aceitar = equidade >= 0.35 + 0.01 * valor_proposto + random.uniform(-0.08, 0.08)
+    elif imbativel:
+        # no meio da mão: segurando a maior carta viva, aceita
+        aceitar = True
+    else:
+        aceitar = random.choice([True, False, True])
+    return 'ACEITAR' if aceitar else 'CORRER'
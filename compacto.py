@@ -0,0 +1,78 @@
+"""Codificação compacta dos quadros (opcional, negociada no connect).
+
+O cliente que conecta com auth {'codificacao': 'msgpack'} recebe os quadros
+como 'quadro_c': bytes MessagePack (anexo binário do Socket.IO) em vez de
+JSON com chaves por extenso. Dentro do pacote:
+- o quadro é [sala, versão, eventos] e cada evento é [código, dados], com o
+  código = índice em EVENTOS (nome por extenso se não estiver na lista);
+- carta é o id 0-39 (ver truco_core.id_carta);
+- os eventos do jogo viram listas de posição fixa (ver CODIFICADORES);
+  o resto vai como veio.
+O index.html tem o caminho inverso (expandirQuadro). Sem o msgpack instalado
+ninguém recebe compacto e todo mundo segue no JSON.
+"""
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from truco_core import CARTAS_POR_NOME
+
+DISPONIVEL = msgpack is not None
+
+# A ordem é o protocolo: só acrescentar no fim (o index.html tem a mesma lista)
+EVENTOS = (
+    'receber_mao', 'atualizar_mesa', 'info_jogo', 'status_vez', 'tocar_som',
+    'resultado_rodada', 'fim_de_mao', 'truco_respondido', 'fechar_modal_truco',
+    'receber_pedido_truco', 'aguardando_truco', 'decisao_mao_11', 'mensagem',
+    'fim_de_jogo', 'receber_emote', 'retomar',
+)
+CODIGOS = {nome: i for i, nome in enumerate(EVENTOS)}
+
+
+def carta(c):
+    return CARTAS_POR_NOME[(c['valor'], c['naipe'])].id
+
+
+def _mao(d):
+    return [carta(d['vira']), d['animar'], d['blind'], d['modo_jogo'],
+            [carta(c) for c in d['minhas_cartas']], d['seu_indice']]
+
+
+def _mesa(d):
+    saida = []
+    for c in d['cartas']:
+        saida += (carta(c), c['dono_idx'])
+    return saida
+
+
+def _info(d):
+    return [d['valor'], d['nomes'], d['rodadas_hist'], d['placar'], d['sets'], d['dono_aposta'], d['seu_indice']]
+
+
+def _retomar(d):
+    truco, m11 = d['truco'], d['mao_11']
+    return [_mao(d['mao']), _mesa(d['mesa']), _info(d['info']), d['restantes'], d['vez'],
+            truco and [truco['valor'], truco['quem_pediu']], d['aguardando'],
+            m11 and [[carta(c) for c in m11['cartas_parceiro']], carta(m11['vira']), m11['titulo']]]
+
+
+CODIFICADORES = {
+    'receber_mao': _mao,                           # [vira, animar, blind, modo, [cartas], seu_indice]
+    'atualizar_mesa': _mesa,                       # [carta, dono, carta, dono, ...]
+    'info_jogo': _info,                            # [valor, nomes, rodadas, placar, sets, dono_aposta, seu_indice]
+    'status_vez': lambda d: d['e_sua_vez'],
+    'tocar_som': lambda d: d['som'],
+    'retomar': _retomar,                           # [mao, mesa, info, restantes, vez, truco, aguardando, mao_11]
+}
+
+
+def compactar_evento(evento, dados):
+    codificar = CODIFICADORES.get(evento)
+    return [CODIGOS.get(evento, evento), codificar(dados) if codificar else dados]
+
+
+def codificar_quadro(pacote):
+    """Quadro ({'sala','v','eventos'}) em bytes MessagePack"""
+    eventos = [compactar_evento(evento, dados) for evento, dados in pacote['eventos']]
+    return msgpack.packb([pacote['sala'], pacote['v'], eventos])
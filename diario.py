@@ -0,0 +1,251 @@
+"""Diário das salas em disco: o servidor volta de onde parou.
+
+Depois de cada evento da caixa (ver ator.py) o estado da sala (Sala.estado)
+é comparado com o último gravado e só as chaves que mudaram entram no
+diário, um registro por evento (dar cartas, jogada, truco, mão de 11,
+placar...). Registro:
+    ['s', sala, estado]     sala nova (estado inteiro)
+    ['d', sala, {chave: v}] o que mudou
+    ['x', sala]             sala saiu
+em JSON compacto, com cabeçalho (tamanho, crc32): na recuperação o que vem
+depois de um registro cortado ou corrompido é descartado.
+
+registrar() só põe o registro no buffer (como objeto: o estado é um dict
+novo a cada evento, ninguém mexe nele depois); quem serializa e escreve é
+uma task que junta tudo o que chegou numa janela curta (JANELA segundos) e
+faz um write + um fsync por leva numa thread à parte (group commit). O
+jogo não espera o disco: uma queda perde no máximo a última janela.
+
+A cada CHECKPOINT registros o diário grava um retrato de todas as salas
+(retrato-N.json, por rename atômico), começa o segmento N (diario-N.log) e
+apaga os anteriores. recuperar() lê o último retrato e repassa só os
+segmentos a partir dele.
+
+Só liga com DIARIO=<pasta> no ambiente (cada shard numa subpasta dela);
+sem isso o servidor não grava nada em disco.
+"""
+import asyncio
+import concurrent.futures
+import json
+import os
+import re
+import struct
+import time
+import zlib
+
+PASTA = os.environ.get('DIARIO') or None  # sem pasta, desligado
+JANELA = float(os.environ.get('DIARIO_JANELA', 0.01))        # segundos juntando registros por fsync
+CHECKPOINT = int(os.environ.get('DIARIO_CHECKPOINT', 5000))  # registros entre retratos
+
+_CABECALHO = struct.Struct('<II')  # tamanho, crc32 do corpo
+_ARQUIVO = re.compile(r'(diario|retrato)-(\d{8})\.(log|json)$')
+
+
+def _json(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _registro(obj):
+    corpo = _json(obj)
+    return _CABECALHO.pack(len(corpo), zlib.crc32(corpo)) + corpo
+
+
+def ler_segmento(caminho):
+    """Registros do segmento, até o fim ou até o primeiro cortado/corrompido"""
+    with open(caminho, 'rb') as f:
+        dados = f.read()
+    registros, pos = [], 0
+    while pos + _CABECALHO.size <= len(dados):
+        tamanho, crc = _CABECALHO.unpack_from(dados, pos)
+        corpo = dados[pos + _CABECALHO.size:pos + _CABECALHO.size + tamanho]
+        if len(corpo) < tamanho or zlib.crc32(corpo) != crc:
+            break
+        registros.append(json.loads(corpo))
+        pos += _CABECALHO.size + tamanho
+    return registros
+
+
+def aplicar(estados, registro):
+    """Um registro do diário sobre {sala: estado}"""
+    tipo, nome = registro[0], registro[1]
+    if tipo == 's':
+        estados[nome] = registro[2]
+    elif tipo == 'd':
+        if nome in estados:
+            estados[nome].update(registro[2])
+    elif tipo == 'x':
+        estados.pop(nome, None)
+
+
+def _fsync_pasta(pasta):
+    fd = os.open(pasta, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Diario:
+    def __init__(self, pasta=PASTA, janela=JANELA, checkpoint=CHECKPOINT):
+        self.pasta = pasta or None
+        self.janela = janela
+        self.checkpoint = checkpoint
+        self._ultimo = {}       # sala -> último estado gravado
+        self._buffer = []       # registros esperando a próxima leva
+        self._desde_retrato = 0
+        self._segmento = 0
+        self._arquivo = None
+        self._tem_dados = None  # asyncio.Event, criado em iniciar()
+        self._tarefa = None
+        self._executor = None
+        self.stats = {'registros': 0, 'bytes': 0, 'levas': 0, 'fsync_ms': 0.0, 'retratos': 0,
+                      'recuperadas': 0, 'recuperacao_ms': 0.0}
+
+    @property
+    def ativo(self):
+        return self.pasta is not None
+
+    # --- gravação --------------------------------------------------------------
+
+    def registrar(self, sala):
+        """Depois de um evento: grava o que mudou na sala desde o último registro"""
+        if not self.ativo:
+            return
+        novo = sala.estado()
+        anterior = self._ultimo.get(sala.nome)
+        if anterior is None:
+            registro = ['s', sala.nome, novo]
+        else:
+            mudou = {k: v for k, v in novo.items() if anterior.get(k) != v}
+            if not mudou:
+                return
+            registro = ['d', sala.nome, mudou]
+        self._ultimo[sala.nome] = novo
+        self._anexar(registro)
+
+    def remover(self, nome):
+        if not self.ativo or self._ultimo.pop(nome, None) is None:
+            return
+        self._anexar(['x', nome])
+
+    def _anexar(self, registro):
+        self._buffer.append(registro)
+        self._desde_retrato += 1
+        self.stats['registros'] += 1
+        if self._tem_dados is not None:
+            self._tem_dados.set()
+
+    def iniciar(self):
+        """Abre o segmento novo e sobe a task de escrita (no loop do servidor).
+        Chamar depois de recuperar(): o primeiro passo é um retrato."""
+        if not self.ativo:
+            return
+        os.makedirs(self.pasta, exist_ok=True)
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='diario')
+        self._tem_dados = asyncio.Event()
+        self._desde_retrato = self.checkpoint  # retrato logo na primeira leva
+        self._tem_dados.set()
+        self._tarefa = asyncio.ensure_future(self._escrever())
+
+    async def _escrever(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._tem_dados.wait()
+            await asyncio.sleep(self.janela)  # junta o que chegar na janela numa leva só
+            await loop.run_in_executor(self._executor, self._gravar, *self._leva())
+
+    def _leva(self):
+        # Sem await entre pegar o buffer e copiar os estados: o retrato é
+        # exatamente o estado depois do último registro da leva
+        self._tem_dados.clear()
+        registros, self._buffer = self._buffer, []
+        retrato = None
+        if self._desde_retrato >= self.checkpoint:
+            retrato, self._desde_retrato = dict(self._ultimo), 0
+        return registros, retrato
+
+    def _gravar(self, registros, retrato):
+        inicio = time.perf_counter()
+        if registros:
+            dados = b''.join(map(_registro, registros))
+            self.stats['bytes'] += len(dados)
+            if self._arquivo is None:
+                self._abrir_segmento(self._segmento)
+            self._arquivo.write(dados)
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+        if retrato is not None:
+            self._gravar_retrato(retrato)
+        self.stats['levas'] += 1
+        self.stats['fsync_ms'] += (time.perf_counter() - inicio) * 1000
+
+    def _abrir_segmento(self, segmento):
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._segmento = segmento
+        self._arquivo = open(os.path.join(self.pasta, f'diario-{segmento:08d}.log'), 'ab')
+
+    def _gravar_retrato(self, estados):
+        segmento = self._segmento + 1
+        caminho = os.path.join(self.pasta, f'retrato-{segmento:08d}.json')
+        with open(caminho + '.tmp', 'wb') as f:
+            f.write(_json(estados))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(caminho + '.tmp', caminho)
+        _fsync_pasta(self.pasta)
+        self._abrir_segmento(segmento)
+        # Com o retrato novo no disco, o que veio antes dele não serve mais
+        for nome in os.listdir(self.pasta):
+            m = _ARQUIVO.match(nome)
+            if m and int(m.group(2)) < segmento:
+                os.remove(os.path.join(self.pasta, nome))
+        self.stats['retratos'] += 1
+
+    async def fechar(self):
+        """Grava o que falta e para a task (no desligamento do servidor)"""
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        self._tarefa = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._gravar, *self._leva())
+        self._executor.shutdown(wait=True)
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    # --- recuperação -----------------------------------------------------------
+
+    def recuperar(self):
+        """{sala: estado} do último retrato mais os segmentos depois dele"""
+        if not self.ativo or not os.path.isdir(self.pasta):
+            return {}
+        inicio = time.perf_counter()
+        retratos, segmentos = [], []
+        for nome in os.listdir(self.pasta):
+            m = _ARQUIVO.match(nome)
+            if m:
+                (retratos if m.group(1) == 'retrato' else segmentos).append(int(m.group(2)))
+        estados, base = {}, -1
+        for n in sorted(retratos, reverse=True):
+            try:
+                with open(os.path.join(self.pasta, f'retrato-{n:08d}.json'), 'rb') as f:
+                    estados = json.load(f)
+                base = n
+                break
+            except (OSError, ValueError):
+                continue  # retrato ilegível: tenta o anterior
+        for n in sorted(s for s in segmentos if s >= base):
+            for registro in ler_segmento(os.path.join(self.pasta, f'diario-{n:08d}.log')):
+                aplicar(estados, registro)
+        # Segmento novo depois de tudo o que já existe (o último pode ter ficado cortado)
+        self._segmento = max(retratos + segmentos + [-1]) + 1
+        self._ultimo = {nome: dict(estado) for nome, estado in estados.items()}
+        self.stats['recuperadas'] = len(estados)
+        self.stats['recuperacao_ms'] = (time.perf_counter() - inicio) * 1000
+        return estados
+
+    def metricas(self):
+        return {**self.stats, 'ativo': self.ativo, 'salas': len(self._ultimo), 'segmento': self._segmento,
+                'pendentes': len(self._buffer)}
@@ -0,0 +1,155 @@
+"""Tabela de equidade das mãos: chance de vitória de cada mão de 3 cartas.
+
+Para cada modo (2 e 4 jogadores), cada valor de vira (10) e cada mão de 3
+cartas (C(40,3) = 9880), guarda a chance de o time dono da mão levar a mão,
+com todos jogando como o bot atual. Empate total (ninguém leva) conta meio.
+
+O arquivo é gerado offline (precisa de NumPy) e o servidor só faz mmap dele,
+sem NumPy: a leitura é O(1) e as páginas são compartilhadas entre processos.
+
+Gerar:
+    python equidade.py --amostras 1000 --seed 0
+"""
+import mmap
+import os
+import struct
+
+ARQUIVO_PADRAO = os.environ.get('TRUCO_EQUIDADE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'equidade.bin'))
+
+# Cabeçalho: magic, versão, nº de modos, nº de viras, nº de mãos
+CABECALHO = struct.Struct('<4sHHHH')
+MAGIC = b'TQEQ'
+VERSAO = 1
+
+MODOS = (2, 4)
+NUM_VIRAS = 10
+NUM_MAOS = 9880
+ESCALA = 65535  # chance gravada como uint16
+
+
+def indice_mao(ids):
+    """Índice (0-9879) de uma mão de 3 ids distintos, pelo sistema combinatório"""
+    a, b, c = sorted(ids)
+    return a + b * (b - 1) // 2 + c * (c - 1) * (c - 2) // 6
+
+
+class TabelaEquidade:
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, versao, modos, viras, maos = CABECALHO.unpack_from(self._mmap, 0)
+        if magic != MAGIC or versao != VERSAO or (modos, viras, maos) != (len(MODOS), NUM_VIRAS, NUM_MAOS):
+            self._mmap.close()
+            raise ValueError(f"Arquivo de equidade inválido: {caminho}")
+        self._dados = memoryview(self._mmap)[CABECALHO.size:].cast('H')
+
+    def equidade(self, ids_cartas, id_vira, num_jogadores):
+        """Chance (0-1) de o time de quem tem as 3 cartas levar a mão"""
+        pos = (MODOS.index(num_jogadores) * NUM_VIRAS + id_vira // 4) * NUM_MAOS + indice_mao(ids_cartas)
+        return self._dados[pos] / ESCALA
+
+
+def carregar_tabela(caminho=ARQUIVO_PADRAO):
+    """Abre a tabela; devolve None (bots usam a heurística antiga) se não existir"""
+    if not os.path.exists(caminho):
+        print(f"[SISTEMA] Tabela de equidade não encontrada ({caminho}). Bots usam heurística.")
+        return None
+    try:
+        tabela = TabelaEquidade(caminho)
+    except (OSError, ValueError) as e:
+        print(f"[SISTEMA] Falha ao carregar tabela de equidade: {e}")
+        return None
+    print("[SISTEMA] Tabela de equidade carregada.")
+    return tabela
+
+
+# ==============================================================================
+# GERAÇÃO OFFLINE (NumPy)
+# ==============================================================================
+
+def _todas_as_maos():
+    """As 9880 mãos na ordem de indice_mao (ordem colexicográfica)"""
+    import numpy as np
+    maos = [(a, b, c) for c in range(40) for b in range(c) for a in range(b)]
+    return np.array(maos, dtype=np.int8)
+
+
+def _calcular_bloco(args):
+    """Equidade das 9880 mãos para um modo e um valor de vira"""
+    import numpy as np
+    from simulador import TABELA_FORCA, NINGUEM, resultado_rodadas, vencedor_mao
+
+    num_jogadores, idx_vira, amostras, seed, lote = args
+    rng = np.random.default_rng([seed, num_jogadores, idx_vira])
+
+    maos = _todas_as_maos()
+    todas = np.arange(40, dtype=np.int8)
+    # restantes[i] = as 37 cartas fora da mão i
+    restantes = np.array([np.setdiff1d(todas, m) for m in maos], dtype=np.int8)
+    eh_do_vira = (restantes // 4) == idx_vira
+    forca = TABELA_FORCA[idx_vira]
+    outras = 3 * (num_jogadores - 1)
+
+    pontos = np.zeros(NUM_MAOS, dtype=np.float64)
+    feitas = 0
+    while feitas < amostras:
+        k = min(lote, amostras - feitas)
+        resto = np.repeat(restantes, k, axis=0)
+        linhas = np.arange(len(resto))
+
+        # Vira: uma carta ao acaso entre as restantes com o valor idx_vira
+        chaves = rng.random(resto.shape, dtype=np.float32) + ~np.repeat(eh_do_vira, k, axis=0)
+        pos_vira = chaves.argmin(axis=1)
+
+        # Demais jogadores: cartas ao acaso entre as restantes, fora o vira
+        chaves = rng.random(resto.shape, dtype=np.float32)
+        chaves[linhas, pos_vira] = 2.0
+        ordem = chaves.argsort(axis=1)[:, :outras]
+        cartas_outros = resto[linhas[:, None], ordem].reshape(-1, num_jogadores - 1, 3)
+
+        # Assento 0 é o dono da mão; todos jogam a maior carta primeiro
+        todas_maos = np.concatenate([np.repeat(maos, k, axis=0)[:, None, :], cartas_outros], axis=1)
+        forcas = -np.sort(-forca[todas_maos], axis=2)
+        vencedor, _ = vencedor_mao(resultado_rodadas(forcas))
+
+        placar = (vencedor == 0) + 0.5 * (vencedor == NINGUEM)
+        pontos += placar.reshape(NUM_MAOS, k).sum(axis=1)
+        feitas += k
+
+    return num_jogadores, idx_vira, np.round(pontos / amostras * ESCALA).astype('<u2')
+
+
+def gerar(caminho=ARQUIVO_PADRAO, amostras=1000, seed=0, processos=None, lote=20):
+    """Gera a tabela em paralelo. Cada bloco (modo, vira) tem semente própria,
+    então o resultado é o mesmo com qualquer número de processos."""
+    from multiprocessing import Pool
+    import numpy as np
+
+    tarefas = [(n, v, amostras, seed, lote) for n in MODOS for v in range(NUM_VIRAS)]
+    dados = np.zeros((len(MODOS), NUM_VIRAS, NUM_MAOS), dtype='<u2')
+    with Pool(processos) as pool:
+        for num_jogadores, idx_vira, bloco in pool.imap_unordered(_calcular_bloco, tarefas):
+            dados[MODOS.index(num_jogadores), idx_vira] = bloco
+            print(f"  {num_jogadores} jogadores, vira {idx_vira}: ok")
+
+    temp = caminho + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(CABECALHO.pack(MAGIC, VERSAO, len(MODOS), NUM_VIRAS, NUM_MAOS))
+        f.write(dados.tobytes())
+    os.replace(temp, caminho)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Gera a tabela de equidade das mãos")
+    parser.add_argument('--saida', default=ARQUIVO_PADRAO)
+    parser.add_argument('--amostras', type=int, default=1000, help="distribuições simuladas por mão")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processos', type=int, default=None, help="padrão: todos os núcleos")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    gerar(args.saida, args.amostras, args.seed, args.processos)
+    print(f"Tabela gravada em {args.saida} ({time.perf_counter() - inicio:.1f}s)")
@@ -0,0 +1,163 @@
+"""Arquivos estáticos (index.html e os mp3) servidos da memória.
+
+Os arquivos são lidos uma vez, quando o servidor sobe. Cada um tem ETag
+forte (hash do conteúdo) e é servido de dois jeitos:
+- pelo nome de sempre ('/card.mp3'): Cache-Control no-cache, o navegador
+  revalida e recebe 304 se não mudou;
+- pelo nome com hash ('/card.1a2b3c4d5e.mp3'): immutable por um ano, nem
+  revalida. O index.html recebe o mapa nome -> nome com hash no lugar de
+  MARCADOR_ARQUIVOS e os sons são pedidos por ele.
+O que é texto (index.html) já fica comprimido em gzip e, com o módulo brotli
+instalado, em br; vai a variante que o Accept-Encoding aceitar. Pedido com
+Range (o <audio> pede) recebe 206 com o pedaço.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+MARCADOR_ARQUIVOS = b'/*ARQUIVOS*/{}'
+COMPRIMIVEIS = ('text/', 'application/javascript', 'application/json')
+CACHE_IMUTAVEL = b'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = b'no-cache'
+
+
+class Arquivo:
+    __slots__ = ('tipo', 'variantes', 'imutavel')
+
+    def __init__(self, corpo, tipo, imutavel):
+        self.tipo = tipo
+        self.imutavel = imutavel
+        etag = hashlib.sha256(corpo).hexdigest()[:20]
+        self.variantes = {None: (corpo, f'"{etag}"'.encode())}  # codificação -> (corpo, etag)
+        if tipo.startswith(COMPRIMIVEIS):
+            self.variantes['gzip'] = (gzip.compress(corpo, 9, mtime=0), f'"{etag}-gz"'.encode())
+            if brotli is not None:
+                self.variantes['br'] = (brotli.compress(corpo, quality=11), f'"{etag}-br"'.encode())
+
+
+def _nome_com_hash(caminho_url, corpo):
+    raiz, ext = os.path.splitext(caminho_url)
+    return f'{raiz}.{hashlib.sha256(corpo).hexdigest()[:10]}{ext}'
+
+
+class Estaticos:
+    """App ASGI dos estáticos; o que não é arquivo conhecido vai para 'resto'"""
+
+    def __init__(self, arquivos, resto=None, pasta=PASTA):
+        self.resto = resto
+        self.rotas = {}  # caminho da URL -> Arquivo
+        self.stats = {'200': 0, '206': 0, '304': 0, '416': 0, 'bytes': 0}
+        paginas = {}
+        mapa = {}  # 'card.mp3' -> 'card.1a2b3c4d5e.mp3', vai para dentro das páginas
+        for url, nome in arquivos.items():
+            with open(os.path.join(pasta, nome), 'rb') as f:
+                corpo = f.read()
+            tipo = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+            if MARCADOR_ARQUIVOS in corpo:
+                paginas[url] = (corpo, tipo)
+                continue
+            versionada = _nome_com_hash(url, corpo)
+            self.rotas[url] = Arquivo(corpo, tipo, imutavel=False)
+            self.rotas[versionada] = Arquivo(corpo, tipo, imutavel=True)
+            mapa[url.lstrip('/')] = versionada.lstrip('/')
+        marcador = b'/*ARQUIVOS*/' + json.dumps(mapa).encode()
+        for url, (corpo, tipo) in paginas.items():
+            self.rotas[url] = Arquivo(corpo.replace(MARCADOR_ARQUIVOS, marcador), tipo, imutavel=False)
+
+    async def __call__(self, scope, receive, send):
+        arquivo = self.rotas.get(scope['path']) if scope['type'] == 'http' else None
+        if arquivo is None or scope['method'] not in ('GET', 'HEAD'):
+            if self.resto is not None:
+                return await self.resto(scope, receive, send)
+            await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        pedido = {k.lower(): v for k, v in scope['headers']}
+        codificacao = self._codificacao(arquivo, pedido.get(b'accept-encoding', b''))
+        corpo, etag = arquivo.variantes[codificacao]
+        cabecalhos = [(b'content-type', arquivo.tipo.encode()), (b'etag', etag), (b'accept-ranges', b'bytes'),
+                      (b'cache-control', CACHE_IMUTAVEL if arquivo.imutavel else CACHE_REVALIDAR)]
+        if len(arquivo.variantes) > 1:
+            cabecalhos.append((b'vary', b'accept-encoding'))
+        if codificacao is not None:
+            cabecalhos.append((b'content-encoding', codificacao.encode()))
+
+        if _etag_confere(pedido.get(b'if-none-match'), etag):
+            self.stats['304'] += 1
+            await send({'type': 'http.response.start', 'status': 304, 'headers': cabecalhos})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        status = 200
+        faixa = pedido.get(b'range')
+        if faixa is not None and pedido.get(b'if-range', etag) == etag:
+            limites = _faixa(faixa, len(corpo))
+            if limites is None:
+                self.stats['416'] += 1
+                cabecalhos.append((b'content-range', f'bytes */{len(corpo)}'.encode()))
+                await send({'type': 'http.response.start', 'status': 416, 'headers': cabecalhos})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            if limites != (0, len(corpo) - 1):
+                inicio, fim = limites
+                cabecalhos.append((b'content-range', f'bytes {inicio}-{fim}/{len(corpo)}'.encode()))
+                corpo = corpo[inicio:fim + 1]
+                status = 206
+        cabecalhos.append((b'content-length', str(len(corpo)).encode()))
+        self.stats[str(status)] += 1
+        await send({'type': 'http.response.start', 'status': status, 'headers': cabecalhos})
+        if scope['method'] == 'HEAD':
+            corpo = b''
+        self.stats['bytes'] += len(corpo)
+        await send({'type': 'http.response.body', 'body': corpo})
+
+    @staticmethod
+    def _codificacao(arquivo, aceitas):
+        if len(arquivo.variantes) == 1:
+            return None
+        aceitas = {a.split(b';')[0].strip() for a in aceitas.split(b',')}
+        for codificacao in ('br', 'gzip'):
+            if codificacao in arquivo.variantes and codificacao.encode() in aceitas:
+                return codificacao
+        return None
+
+    def metricas(self):
+        corpos = {id(c): len(c) for a in self.rotas.values() for c, _ in a.variantes.values()}
+        return {**self.stats, 'arquivos': len(self.rotas), 'memoria': sum(corpos.values())}
+
+
+def _etag_confere(if_none_match, etag):
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == b'*' or etag in (e.strip().removeprefix(b'W/') for e in if_none_match.split(b','))
+
+
+def _faixa(cabecalho, tamanho):
+    """'bytes=a-b' / 'bytes=a-' / 'bytes=-n' -> (início, fim) inclusivo; None se
+    não dá para atender. Só uma faixa: com várias, atende a primeira. Unidade
+    que não é 'bytes' é ignorada (RFC 7233): volta o arquivo inteiro (200)."""
+    unidade, igual, faixas = cabecalho.decode('latin-1').partition('=')
+    if not igual or unidade.strip().lower() != 'bytes':
+        return 0, tamanho - 1
+    try:
+        inicio, fim = faixas.split(',')[0].strip().split('-', 1)
+        if inicio == '':
+            n = int(fim)
+            if n <= 0:
+                return None
+            return max(0, tamanho - n), tamanho - 1
+        inicio = int(inicio)
+        fim = int(fim) if fim else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho or fim < inicio:
+        return None
+    return inicio, min(fim, tamanho - 1)
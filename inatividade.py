@@ -0,0 +1,86 @@
+"""Prazos de inatividade (AFK) numa roda de tempo (hashed timer wheel).
+
+Cada sid tem um prazo (último sinal + limite) e mora num balde da roda,
+escolhido pelo prazo arredondado para a precisão. Registrar atividade é só
+atualizar o prazo (O(1)); o sid não troca de balde. Quando o balde dele
+chega, confere o prazo: venceu, sai na lista; senão vai para o balde do
+prazo novo. Assim cada varredura só olha os baldes que passaram, não todos
+os sids.
+
+A precisão é o tamanho do balde: um sid pode ser expulso até 'precisao'
+segundos depois do prazo.
+"""
+import math
+import time
+
+
+class MonitorInatividade:
+    def __init__(self, limite, precisao=1.0):
+        self.limite = limite
+        self.precisao = precisao
+        # Prazo nunca fica mais de 'limite' à frente, então a roda não dá volta
+        self._baldes = [set() for _ in range(math.ceil(limite / precisao) + 2)]
+        self._prazos = {}   # sid -> prazo (time.time())
+        self._balde = {}    # sid -> índice do balde onde ele está
+        self._tique = None  # último tique já varrido
+        self.stats = {'varreduras': 0, 'conferidos': 0, 'expirados': 0, 'ultima_varredura_ms': 0.0}
+
+    def __len__(self):
+        return len(self._prazos)
+
+    def __contains__(self, sid):
+        return sid in self._prazos
+
+    def _colocar(self, sid, prazo):
+        tique = math.ceil(prazo / self.precisao)
+        if self._tique is not None and tique <= self._tique:
+            tique = self._tique + 1  # balde já varrido: entra no próximo
+        i = tique % len(self._baldes)
+        self._baldes[i].add(sid)
+        self._balde[sid] = i
+
+    def tocar(self, sid, agora=None):
+        """Registra atividade do sid (O(1))"""
+        prazo = (time.time() if agora is None else agora) + self.limite
+        if sid not in self._prazos:
+            self._colocar(sid, prazo)
+        self._prazos[sid] = prazo
+
+    def remover(self, sid):
+        if self._prazos.pop(sid, None) is not None:
+            self._baldes[self._balde.pop(sid)].discard(sid)
+
+    def vencidos(self, agora=None):
+        """Tira e devolve os sids com prazo vencido, olhando só os baldes que passaram"""
+        inicio = time.perf_counter()
+        agora = time.time() if agora is None else agora
+        atual = math.floor(agora / self.precisao)
+        if self._tique is None:
+            self._tique = atual - 1
+        # Parado por mais de uma volta: basta varrer a roda uma vez
+        primeiro = max(self._tique + 1, atual - len(self._baldes) + 1)
+
+        expirados = []
+        conferidos = 0
+        for tique in range(primeiro, atual + 1):
+            i = tique % len(self._baldes)
+            balde = self._baldes[i]
+            if not balde:
+                continue
+            self._baldes[i] = set()
+            for sid in balde:
+                conferidos += 1
+                prazo = self._prazos[sid]
+                if prazo <= agora:
+                    del self._prazos[sid]
+                    del self._balde[sid]
+                    expirados.append(sid)
+                else:
+                    self._colocar(sid, prazo)  # prazo > agora: cai num tique depois de 'atual'
+        self._tique = atual
+
+        self.stats['varreduras'] += 1
+        self.stats['conferidos'] += conferidos
+        self.stats['expirados'] += len(expirados)
+        self.stats['ultima_varredura_ms'] = (time.perf_counter() - inicio) * 1000
+        return expirados
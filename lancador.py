@@ -0,0 +1,76 @@
+"""Sobe o servidor em N processos (shards) na mesma porta.
+
+Uso: python lancador.py [N]   (ou SHARDS=N; porta em PORT, padrão 10000)
+
+O lançador abre o socket da porta e o broker (socket Unix) e inicia N
+vezes o server.py com SHARD=i, SHARDS=N, BROKER e FD: o kernel divide as
+conexões entre os processos e cada um é dono das salas com
+crc32(nome) % N == i (ver shards.py). Os clientes usam só websocket (uma
+conexão = um processo); polling precisaria de sessão grudada.
+"""
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+
+from shards import servir_broker
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+
+
+async def lancar(num_shards, porta):
+    caminho = os.path.join(tempfile.mkdtemp(prefix='truco-'), 'broker.sock')
+    broker = await servir_broker(caminho)
+
+    ouvinte = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    ouvinte.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    ouvinte.bind(('0.0.0.0', porta))
+    ouvinte.listen(2048)
+    ouvinte.set_inheritable(True)
+
+    # Pool de bots dividido entre os processos, a não ser que venha definido
+    bots = os.environ.get('BOT_PROCESSOS', str(max(1, (os.cpu_count() or 1) // num_shards)))
+    processos = []
+    for i in range(num_shards):
+        env = dict(os.environ, SHARD=str(i), SHARDS=str(num_shards), BROKER=caminho,
+                   FD=str(ouvinte.fileno()), BOT_PROCESSOS=bots)
+        processos.append(subprocess.Popen([sys.executable, os.path.join(PASTA, 'server.py')], env=env,
+                                          pass_fds=(ouvinte.fileno(),)))
+    print(f"[SHARDS] {num_shards} processos na porta {porta} (broker em {caminho})")
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parar.set)
+
+    async def vigiar():
+        while all(p.poll() is None for p in processos):
+            await asyncio.sleep(0.5)
+        print("[SHARDS] Um processo caiu: derrubando os outros.")
+        parar.set()
+
+    vigia = asyncio.ensure_future(vigiar())
+    await parar.wait()
+    vigia.cancel()
+    for p in processos:
+        if p.poll() is None:
+            p.terminate()
+    for p in processos:
+        try:
+            # Fora do loop: o broker segue atendendo até cada processo fechar a conexão
+            await loop.run_in_executor(None, p.wait, 10)
+        except subprocess.TimeoutExpired:
+            p.kill()
+    await asyncio.sleep(0.1)
+    broker.close()
+    ouvinte.close()
+    os.unlink(caminho)
+    os.rmdir(os.path.dirname(caminho))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.environ.get('SHARDS', os.cpu_count() or 1))
+    asyncio.run(lancar(n, int(os.environ.get('PORT', 10000))))
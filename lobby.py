@@ -0,0 +1,125 @@
+"""Lista de salas do lobby, mandada em diferenças.
+
+Quem está no lobby recebe o retrato (uma página da lista, opcionalmente só
+de um modo) ao conectar ou quando pede, e depois só diferenças: salas que
+mudaram (criada, alguém sentou, plateia) e salas que saíram. As mudanças
+de uma janela curta (JANELA segundos) viram um diff só por canal; cada
+canal ('todos', 2, 4) tem a sua versão, e o cliente que vê um buraco na
+versão pede o retrato de novo.
+
+Os canais são salas do Socket.IO ('lobby:todos', 'lobby:2', 'lobby:4'):
+o diff é serializado uma vez para todo mundo do canal.
+
+A lista é a visão juntada ('salas'): as salas daqui, resumidas quando a
+janela fecha, mais as que outros processos mandarem (ver shards.py) por
+aplicar(). Com 'publicar' definido, as mudanças daqui também saem por ele.
+"""
+import asyncio
+import os
+
+JANELA = float(os.environ.get('LOBBY_JANELA', 0.25))
+POR_PAGINA = 20
+CANAIS = ('todos', 2, 4)
+
+
+def resumo(sala):
+    return {'nome': sala.nome, 'qtd': len(sala.jogadores), 'max': sala.max_jogadores,
+            'espectadores': len(sala.espectadores)}
+
+
+def _sala_io(canal):
+    return f'lobby:{canal}'
+
+
+class Lobby:
+    def __init__(self, sio, jogos, janela=JANELA):
+        self.sio = sio
+        self.jogos = jogos        # o 'jogos' do servidor (nome -> Sala)
+        self.janela = janela
+        self.salas = {}           # nome -> resumo, de todos os processos
+        self.publicar = None      # coroutine(mudanças): manda as daqui para os outros processos
+        self.versoes = {canal: 0 for canal in CANAIS}
+        self._canal = {}          # sid -> canal em que está inscrito
+        self._mudadas = {}        # nome -> modo (max_jogadores), desde o último diff
+        self._timer = None
+        self.stats = {'diffs': 0, 'mudancas': 0, 'retratos': 0}
+
+    def marcar(self, sala):
+        """A sala mudou (ou saiu de 'jogos'); vai no próximo diff"""
+        self._mudadas[sala.nome] = sala.max_jogadores
+        self.stats['mudancas'] += 1
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.janela, self._disparar)
+
+    def _disparar(self):
+        self._timer = None
+        asyncio.ensure_future(self._publicar())
+
+    async def _publicar(self):
+        mudadas, self._mudadas = self._mudadas, {}
+        mudancas = []  # (nome, modo, resumo ou None se saiu)
+        for nome, modo in mudadas.items():
+            sala = self.jogos.get(nome)
+            mudancas.append((nome, modo, resumo(sala) if sala is not None else None))
+        await self.aplicar(mudancas)
+        if self.publicar is not None:
+            await self.publicar(mudancas)
+
+    def locais(self):
+        """As salas daqui como mudanças (para um processo que acabou de subir)"""
+        return [(nome, sala.max_jogadores, resumo(sala)) for nome, sala in self.jogos.items()]
+
+    async def aplicar(self, mudancas):
+        """Atualiza a lista e manda um diff por canal aos inscritos deste processo"""
+        por_canal = {canal: ([], []) for canal in CANAIS}  # (mudou, saiu)
+        for nome, modo, dados in mudancas:
+            if dados is None:
+                if self.salas.pop(nome, None) is None:
+                    continue
+            else:
+                self.salas[nome] = dados
+            for canal in ('todos', modo):
+                if canal not in por_canal:
+                    continue
+                if dados is None:
+                    por_canal[canal][1].append(nome)
+                else:
+                    por_canal[canal][0].append(dados)
+        for canal, (mudou, saiu) in por_canal.items():
+            if not mudou and not saiu:
+                continue
+            self.versoes[canal] += 1
+            self.stats['diffs'] += 1
+            # Só para os inscritos daqui: cada processo manda os diffs aos seus
+            await self.sio.emit('lobby_diff', {'canal': canal, 'v': self.versoes[canal], 'mudou': mudou,
+                                               'saiu': saiu, 'total': self._total(canal)},
+                                room=_sala_io(canal), ignore_queue=True)
+
+    def _total(self, canal):
+        if canal == 'todos':
+            return len(self.salas)
+        return sum(1 for s in self.salas.values() if s['max'] == canal)
+
+    async def retrato(self, sid, modo=None, pagina=0, por_pagina=POR_PAGINA):
+        """Inscreve o sid no canal (modo 2, 4 ou todos) e manda uma página da lista"""
+        canal = modo if modo in CANAIS else 'todos'
+        anterior = self._canal.get(sid)
+        if anterior != canal:
+            if anterior is not None:
+                await self.sio.leave_room(sid, _sala_io(anterior))
+            await self.sio.enter_room(sid, _sala_io(canal))
+            self._canal[sid] = canal
+        salas = [s for s in self.salas.values() if canal == 'todos' or s['max'] == canal]
+        por_pagina = max(1, min(int(por_pagina), 100))
+        inicio = max(0, int(pagina)) * por_pagina
+        self.stats['retratos'] += 1
+        await self.sio.emit('lobby_retrato', {
+            'canal': canal, 'v': self.versoes[canal], 'pagina': inicio // por_pagina, 'por_pagina': por_pagina,
+            'total': len(salas), 'salas': salas[inicio:inicio + por_pagina],
+        }, to=sid)
+
+    async def sair(self, sid):
+        """O sid saiu do lobby (sentou, foi assistir ou desconectou)"""
+        canal = self._canal.pop(sid, None)
+        if canal is not None:
+            await self.sio.leave_room(sid, _sala_io(canal))
@@ -0,0 +1,111 @@
+"""Fila de partida rápida: o servidor monta as mesas.
+
+Uma fila por modo (2 ou 4 jogadores). Quem entra vai para o fim; quando a
+fila tem gente para uma mesa, os primeiros saem juntos e 'formar' abre a
+sala com eles. Entrar e sair são O(1) (OrderedDict por sid).
+
+Se ninguém completa a mesa em ESPERA_BOT segundos, quem está esperando
+sai junto e os assentos que faltam vão para bots (ESPERA_BOT=0 desliga).
+Há um timer por modo só, para o primeiro da fila.
+
+O tempo de espera de cada um que saiu com mesa entra numa amostra das
+últimas AMOSTRAS esperas por modo; metricas() dá os percentis.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+MODOS = (2, 4)
+ESPERA_BOT = float(os.environ.get('FILA_ESPERA_BOT', 15))  # segundos até completar com bots; 0 desliga
+AMOSTRAS = 1000
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+class Pareamento:
+    def __init__(self, formar, espera_bot=ESPERA_BOT, modos=MODOS):
+        self.formar = formar        # formar(modo, [(sid, nome)]): abre a sala; assentos vazios são de bot
+        self.espera_bot = espera_bot
+        self.filas = {modo: OrderedDict() for modo in modos}  # sid -> (nome, hora de entrada)
+        self._modo = {}             # sid -> modo da fila em que está
+        self._timers = {}           # modo -> TimerHandle do primeiro da fila
+        self.esperas = {modo: deque(maxlen=AMOSTRAS) for modo in modos}
+        self.stats = {'entradas': 0, 'saidas': 0, 'mesas': 0, 'mesas_com_bot': 0, 'bots': 0}
+
+    def entrar(self, sid, nome, modo):
+        """Põe o sid no fim da fila do modo; devolve quantos esperam nela"""
+        if modo not in self.filas:
+            raise ValueError(f"modo {modo!r} não tem fila")
+        self.sair(sid)
+        fila = self.filas[modo]
+        fila[sid] = (nome, time.monotonic())
+        self._modo[sid] = modo
+        self.stats['entradas'] += 1
+        esperando = len(fila)
+        if esperando >= modo:
+            self._fechar(modo, modo)
+        elif esperando == 1:
+            self._agendar(modo)
+        return esperando
+
+    def sair(self, sid):
+        """Tira o sid da fila (desistiu, desconectou, sentou em outra sala)"""
+        modo = self._modo.pop(sid, None)
+        if modo is None:
+            return False
+        fila = self.filas[modo]
+        primeiro = next(iter(fila)) == sid
+        del fila[sid]
+        self.stats['saidas'] += 1
+        if primeiro:
+            self._agendar(modo)
+        return True
+
+    def _fechar(self, modo, quantos):
+        fila = self.filas[modo]
+        agora = time.monotonic()
+        jogadores = []
+        for _ in range(min(quantos, len(fila))):
+            sid, (nome, entrada) = fila.popitem(last=False)
+            del self._modo[sid]
+            self.esperas[modo].append(agora - entrada)
+            jogadores.append((sid, nome))
+        bots = modo - len(jogadores)
+        self.stats['mesas'] += 1
+        if bots:
+            self.stats['mesas_com_bot'] += 1
+            self.stats['bots'] += bots
+        self._agendar(modo)
+        self.formar(modo, jogadores)
+
+    def _agendar(self, modo):
+        """Timer para o (novo) primeiro da fila completar com bots"""
+        timer = self._timers.pop(modo, None)
+        if timer is not None:
+            timer.cancel()
+        fila = self.filas[modo]
+        if not fila or not self.espera_bot:
+            return
+        _nome, entrada = next(iter(fila.values()))
+        atraso = max(0.0, entrada + self.espera_bot - time.monotonic())
+        self._timers[modo] = asyncio.get_running_loop().call_later(atraso, self._vencer, modo)
+
+    def _vencer(self, modo):
+        self._timers.pop(modo, None)
+        if self.filas[modo]:
+            self._fechar(modo, modo)
+
+    def metricas(self):
+        saida = {**self.stats}
+        for modo, fila in self.filas.items():
+            ordenadas = sorted(self.esperas[modo])
+            info = saida[str(modo)] = {'esperando': len(fila), 'amostras': len(ordenadas)}
+            for p in (50, 90, 99):
+                valor = percentil(ordenadas, p)
+                info[f'p{p}_ms'] = None if valor is None else round(valor * 1000, 1)
+        return saida
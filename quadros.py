@@ -0,0 +1,99 @@
+"""Quadros: o que uma sala muda num evento vai num pacote só por jogador.
+
+Os emits de um evento da sala (jogada, truco, fim de rodada...) não saem na
+hora: entram no quadro da sala com a lista de quem recebe. No fim do evento
+(ver Ator.depois) o quadro é fechado: um pacote 'quadro' por grupo de
+jogadores que recebem a mesma lista, com versão crescente. O cliente aplica
+a lista inteira de uma vez, sem desenhar os estados do meio.
+
+Eventos que são retrato do estado (mesa, vez, placar) substituem o anterior
+do mesmo tipo para o mesmo jogador: só o último vai.
+
+A plateia (espectadores) tem uma lista à parte, só com o que é público:
+vira um pacote único, o mesmo para todos que assistem.
+"""
+
+SUBSTITUIVEIS = frozenset(('atualizar_mesa', 'status_vez', 'info_jogo'))
+
+
+def coalescer(eventos):
+    """[(evento, dados)] sem os retratos que um posterior do mesmo tipo substitui"""
+    vistos = set()
+    saida = []
+    for evento, dados in reversed(eventos):
+        if evento in SUBSTITUIVEIS:
+            if evento in vistos:
+                continue
+            vistos.add(evento)
+        saida.append((evento, dados))
+    saida.reverse()
+    return saida
+
+# Totais de todas as salas
+ESTATISTICAS = {'eventos': 0, 'substituidos': 0, 'quadros': 0, 'pacotes': 0}
+
+
+class Quadro:
+    __slots__ = ('sala', 'versao', '_pendentes', '_publicos')
+
+    def __init__(self, sala):
+        self.sala = sala      # nome, vai no pacote junto com a versão
+        self.versao = 0
+        self._pendentes = []  # (evento, dados, sids que recebem)
+        self._publicos = []   # (evento, dados) para a plateia
+
+    def __len__(self):
+        return len(self._pendentes)
+
+    def adicionar(self, evento, dados, para):
+        if para:
+            self._pendentes.append((evento, dados, para))
+
+    def publicar(self, evento, dados):
+        self._publicos.append((evento, dados))
+
+    def descartar(self):
+        self._pendentes = []
+        self._publicos = []
+
+    def fechar(self, humanos):
+        """Esvazia o quadro e devolve ([(pacote, sids)], pacote da plateia):
+        um pacote por grupo de jogadores que recebem exatamente os mesmos
+        eventos; o da plateia é None se não houve nada público"""
+        pendentes, publicos = self._pendentes, self._publicos
+        if not pendentes and not publicos:
+            return [], None
+        self._pendentes = []
+        self._publicos = []
+        self.versao += 1
+
+        grupos = {}  # índices dos eventos -> sids
+        for p in humanos:
+            vistos = set()
+            indices = []
+            for i in range(len(pendentes) - 1, -1, -1):  # de trás: o último de cada retrato vale
+                evento, _, para = pendentes[i]
+                if p not in para:
+                    continue
+                ESTATISTICAS['eventos'] += 1
+                if evento in SUBSTITUIVEIS:
+                    if evento in vistos:
+                        ESTATISTICAS['substituidos'] += 1
+                        continue
+                    vistos.add(evento)
+                indices.append(i)
+            if indices:
+                indices.reverse()
+                grupos.setdefault(tuple(indices), []).append(p)
+
+        saida = []
+        for indices, sids in grupos.items():
+            eventos = [(pendentes[i][0], pendentes[i][1]) for i in indices]
+            saida.append(({'sala': self.sala, 'v': self.versao, 'eventos': eventos}, sids))
+            ESTATISTICAS['quadros'] += 1
+            ESTATISTICAS['pacotes'] += len(sids)
+
+        publico = None
+        if publicos:
+            publico = {'sala': self.sala, 'v': self.versao, 'eventos': coalescer(publicos)}
+        return saida, publico
@@ -0,0 +1,130 @@
+"""Fila de saída de cada cliente.
+
+Quadro para um grupo de clientes em dia sai num emit só (serializado uma
+vez). Cliente atrasado (transporte com mais de LIMITE_TRANSPORTE pacotes
+parados na fila do engine.io) ganha uma fila curta aqui e uma task que
+escreve um quadro de cada vez, quando o transporte esvazia; os outros
+seguem sem esperar por ele.
+
+Na fila, um quadro novo da mesma sala se junta ao último pendente: retratos
+do estado (mesa, vez, placar) ficam só com o mais novo e os cosméticos
+(som, emote) do velho caem; eventos únicos (fim_de_jogo, mão nova...)
+nunca saem. Passando de LIMITE_EVENTOS sem nada para descartar, o cliente
+não acompanha o jogo e é desconectado.
+
+Cliente que pediu codificação compacta (ver compacto.py) recebe o quadro
+como 'quadro_c', codificado uma vez por grupo na hora de sair.
+"""
+import asyncio
+import os
+from collections import deque
+
+import compacto
+from quadros import coalescer
+
+LIMITE_EVENTOS = int(os.environ.get('SAIDA_LIMITE', 64))
+LIMITE_TRANSPORTE = int(os.environ.get('SAIDA_TRANSPORTE', 8))
+ESPERA_TRANSPORTE = 0.05  # segundos entre olhadas num transporte cheio
+
+DESCARTAVEIS = frozenset(('tocar_som', 'receber_emote'))
+
+
+class Saidas:
+    def __init__(self, sio, limite_eventos=LIMITE_EVENTOS, limite_transporte=LIMITE_TRANSPORTE):
+        self.sio = sio
+        self.limite_eventos = limite_eventos
+        self.limite_transporte = limite_transporte
+        self._filas = {}    # sid -> deque de quadros pendentes
+        self._tarefas = {}  # sid -> task que esvazia a fila
+        self.compactos = set()  # sids que recebem 'quadro_c' (ver compacto.py)
+        self.stats = {'diretos': 0, 'enfileirados': 0, 'substituidos': 0, 'descartados': 0, 'desconectados': 0}
+
+    def _atraso(self, sid):
+        """Pacotes parados no transporte do cliente"""
+        try:
+            eio_sid = self.sio.manager.eio_sid_from_sid(sid, '/')
+            return self.sio.eio.sockets[eio_sid].queue.qsize()
+        except (KeyError, AttributeError):
+            return 0
+
+    async def enviar(self, sids, evento, pacote):
+        """Um emit para os clientes em dia; os atrasados recebem pela fila"""
+        livres, compactos = [], []
+        for sid in sids:
+            if sid in self._filas or self._atraso(sid) > self.limite_transporte:
+                self._enfileirar(sid, evento, pacote)
+            elif evento == 'quadro' and sid in self.compactos:
+                compactos.append(sid)
+            else:
+                livres.append(sid)
+        self.stats['diretos'] += len(livres) + len(compactos)
+        if livres:
+            await self.sio.emit(evento, pacote, to=livres)
+        if compactos:
+            await self.sio.emit('quadro_c', compacto.codificar_quadro(pacote), to=compactos)
+
+    def _enfileirar(self, sid, evento, pacote):
+        self.stats['enfileirados'] += 1
+        fila = self._filas.setdefault(sid, deque())
+        ultimo = fila[-1] if fila else None
+        if ultimo is not None and ultimo[0] == evento == 'quadro' and ultimo[1]['sala'] == pacote['sala']:
+            # Som e emote do quadro velho já passaram da hora
+            antigos = [e for e in ultimo[1]['eventos'] if e[0] not in DESCARTAVEIS]
+            self.stats['descartados'] += len(ultimo[1]['eventos']) - len(antigos)
+            eventos = antigos + pacote['eventos']
+            juntos = coalescer(eventos)
+            self.stats['substituidos'] += len(eventos) - len(juntos)
+            fila[-1] = (evento, {**pacote, 'eventos': juntos})
+        else:
+            fila.append((evento, pacote))
+        if self._profundidade(fila) > self.limite_eventos:
+            self._aparar(sid, fila)
+        if sid in self._filas and sid not in self._tarefas:
+            self._tarefas[sid] = asyncio.ensure_future(self._escrever(sid))
+
+    @staticmethod
+    def _profundidade(fila):
+        return sum(len(p['eventos']) if ev == 'quadro' else 1 for ev, p in fila)
+
+    def _aparar(self, sid, fila):
+        for i, (ev, p) in enumerate(fila):
+            if ev != 'quadro':
+                continue
+            ficam = [e for e in p['eventos'] if e[0] not in DESCARTAVEIS]
+            self.stats['descartados'] += len(p['eventos']) - len(ficam)
+            fila[i] = (ev, {**p, 'eventos': ficam})
+        if self._profundidade(fila) > self.limite_eventos:
+            self.stats['desconectados'] += 1
+            self.remover(sid)
+            print(f"[SAIDA] {sid} não acompanha o jogo ({self.limite_eventos}+ eventos na fila): desconectado")
+            self.sio.start_background_task(self.sio.disconnect, sid)
+
+    async def _escrever(self, sid):
+        try:
+            while sid in self._filas:
+                while self._atraso(sid) > self.limite_transporte:
+                    await asyncio.sleep(ESPERA_TRANSPORTE)
+                fila = self._filas.get(sid)
+                if not fila:
+                    self._filas.pop(sid, None)
+                    break
+                evento, pacote = fila.popleft()
+                if evento == 'quadro' and sid in self.compactos:
+                    evento, pacote = 'quadro_c', compacto.codificar_quadro(pacote)
+                await self.sio.emit(evento, pacote, to=sid)
+        finally:
+            if self._tarefas.get(sid) is asyncio.current_task():
+                del self._tarefas[sid]
+
+    def remover(self, sid):
+        """Cliente saiu: descarta a fila e para a task dele"""
+        self._filas.pop(sid, None)
+        self.compactos.discard(sid)
+        tarefa = self._tarefas.pop(sid, None)
+        if tarefa is not None and tarefa is not asyncio.current_task():
+            tarefa.cancel()
+
+    def metricas(self):
+        profundidades = [self._profundidade(f) for f in self._filas.values()]
+        return {**self.stats, 'compactos': len(self.compactos), 'clientes_atrasados': len(profundidades),
+                'eventos_na_fila': sum(profundidades), 'maior_fila': max(profundidades, default=0)}
@@ -0,0 +1,206 @@
+"""Estado de uma sala de jogo (o que antes era um dict dentro de 'jogos').
+
+Sala usa __slots__: os campos são fixos, então acesso é por atributo e um
+campo opcional "não existe" é None (em vez de 'chave' in sala / del sala[...]).
+Guarda também o que o servidor recalculava a toda hora:
+- indices_time[t]: assentos do time t (pares = 0, ímpares = 1)
+- humanos: sids que não são bot, na ordem dos assentos
+- assento: sid -> índice do assento
+- espectadores: sids que só assistem (recebem só o que é público)
+- fichas[i]: segredo do humano do assento i para voltar a ele depois de
+  cair (None para bot); trocar_jogador() põe o sid novo no lugar do velho
+E a caixa de eventos (ator) que serializa tudo que mexe na sala, com o
+quadro onde os emits de cada evento se juntam.
+
+estado() / Sala.restaurar() levam o jogo para um dict só de tipos simples
+(carta = id) e de volta; é o que o diário grava (ver diario.py).
+
+'atividade' é a hora (monotonic) do último evento e 'clientes' quem abriu a
+sala (todos os humanos, na mesa da fila); servem à coleta de salas e aos limites de admissão do servidor.
+memoria() estima os bytes da sala, sem o que é compartilhado entre salas.
+"""
+import asyncio
+import functools
+import sys
+import time
+import types
+from collections import deque
+
+from ator import Ator
+from quadros import Quadro
+from truco_core import BARALHO, TABELAS_FORCA, Mao, TrucoGame
+
+
+def eh_bot(sid):
+    return sid.startswith('BOT')
+
+
+_INDICES_TIME = {}  # max_jogadores -> índices por time, compartilhado entre as salas
+
+def _indices_time(max_jogadores):
+    if max_jogadores not in _INDICES_TIME:
+        _INDICES_TIME[max_jogadores] = (tuple(range(0, max_jogadores, 2)), tuple(range(1, max_jogadores, 2)))
+    return _INDICES_TIME[max_jogadores]
+
+
+# Não entram na conta: código, o loop e tasks (de todo o processo)
+_NAO_CONTA = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+              functools.partial, asyncio.AbstractEventLoop, asyncio.Future)
+
+
+def compartilhados():
+    """ids do que as salas só referenciam: as 40 cartas, as tabelas de força e os índices por time"""
+    ids = {id(c) for c in BARALHO} | {id(t) for t in TABELAS_FORCA}
+    for par in _INDICES_TIME.values():
+        ids.add(id(par))
+        ids.update(id(t) for t in par)
+    return ids
+
+
+def tamanho(obj, vistos):
+    """sys.getsizeof em profundidade; 'vistos' (ids) não conta nada duas vezes"""
+    pilha, total = [obj], 0
+    while pilha:
+        o = pilha.pop()
+        if id(o) in vistos or isinstance(o, _NAO_CONTA):
+            continue
+        vistos.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            pilha.extend(o.keys())
+            pilha.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            pilha.extend(o)
+        elif not isinstance(o, (str, bytes, int, float)):
+            for cls in type(o).__mro__:
+                pilha.extend(getattr(o, campo, None) for campo in getattr(cls, '__slots__', ()))
+            if hasattr(o, '__dict__'):
+                pilha.append(vars(o))
+    return total
+
+
+class Sala:
+    __slots__ = (
+        'nome', 'jogo', 'mao', 'maos_server', 'jogadores', 'jogadores_nomes',
+        'mesa_cartas', 'placar', 'sets', 'vez_atual_idx', 'estado_jogo',
+        'max_jogadores', 'jogador_inicial_mao', 'pedinte_temp', 'valor_proposto_temp',
+        'rastreador', 'indices_time', 'humanos', 'assento', 'espectadores', 'ator', 'quadro', 'turno', 'num_mao',
+        'fichas', 'atividade', 'clientes',
+    )
+
+    def __init__(self, nome, max_jogadores, rastreador=None):
+        self.nome = nome
+        self.jogo = TrucoGame()
+        self.mao = None
+        self.maos_server = []
+        self.jogadores = []
+        self.jogadores_nomes = []
+        self.mesa_cartas = []
+        self.placar = [0, 0]
+        self.sets = [0, 0]
+        self.vez_atual_idx = None
+        self.estado_jogo = 'JOGANDO'
+        self.max_jogadores = max_jogadores
+        self.jogador_inicial_mao = -1
+        self.pedinte_temp = None          # assento de quem pediu o truco em aberto
+        self.valor_proposto_temp = None   # valor do truco em aberto
+        self.rastreador = rastreador      # RastreadorCartas, só em sala com bot
+        self.indices_time = _indices_time(max_jogadores)
+        self.humanos = []
+        self.assento = {}
+        self.espectadores = set()
+        self.ator = Ator(nome)           # caixa de eventos (ver ator.py)
+        self.quadro = Quadro(nome)       # emits do evento em andamento (ver quadros.py)
+        self.turno = 0                   # sobe a cada vez publicada; jogada de bot velha é descartada
+        self.num_mao = 0
+        self.fichas = []
+        self.atividade = time.monotonic()
+        self.clientes = ()               # quem abriu (endereços), para o limite de salas por cliente
+
+    def __repr__(self):
+        return f"<Sala {self.nome!r} {len(self.jogadores)}/{self.max_jogadores} {self.estado_jogo}>"
+
+    def adicionar_jogador(self, sid, nome, ficha=None):
+        """Senta o jogador no próximo assento livre; devolve o índice"""
+        idx = len(self.jogadores)
+        self.jogadores.append(sid)
+        self.jogadores_nomes.append(nome)
+        self.fichas.append(ficha)
+        self.assento[sid] = idx
+        if not eh_bot(sid):
+            self.humanos.append(sid)
+        return idx
+
+    def trocar_jogador(self, antigo, novo):
+        """O humano do sid 'antigo' voltou com o sid 'novo'; devolve o assento"""
+        idx = self.assento.pop(antigo)
+        self.assento[novo] = idx
+        self.jogadores[idx] = novo
+        self.humanos[self.humanos.index(antigo)] = novo
+        self.mesa_cartas = [(novo if sid == antigo else sid, carta) for sid, carta in self.mesa_cartas]
+        return idx
+
+    def cheia(self):
+        return len(self.jogadores) >= self.max_jogadores
+
+    def indices_do_time(self, idx_ref):
+        return self.indices_time[idx_ref % 2]
+
+    def indices_oponentes(self, idx_ref):
+        return self.indices_time[1 - idx_ref % 2]
+
+    def memoria(self, base=None):
+        """Bytes aproximados desta sala; 'base' é compartilhados(), para montar
+        uma vez só quando são várias salas"""
+        return tamanho(self, set(base if base is not None else compartilhados()))
+
+    def limpar_truco(self):
+        self.pedinte_temp = None
+        self.valor_proposto_temp = None
+
+    def estado(self):
+        """O jogo em tipos simples; um dict novo a cada chamada"""
+        mao = self.mao
+        return {
+            'max': self.max_jogadores, 'jogadores': list(self.jogadores), 'nomes': list(self.jogadores_nomes),
+            'fichas': list(self.fichas),
+            'estado': self.estado_jogo, 'placar': list(self.placar), 'sets': list(self.sets),
+            'vez': self.vez_atual_idx, 'inicial': self.jogador_inicial_mao,
+            'pedinte': self.pedinte_temp, 'proposto': self.valor_proposto_temp,
+            'vira': self.jogo.vira.id if self.jogo.vira is not None else None,
+            'maos': [[c.id for c in m] for m in self.maos_server],
+            'mesa': [[sid, c.id] for sid, c in self.mesa_cartas],
+            'mao': None if mao is None else [list(mao.rodadas), mao.valor_atual, mao.dono_atual_da_aposta, mao.vencedor_mao],
+            'jogadas': self.rastreador.jogadas if self.rastreador is not None else None,
+            'turno': self.turno, 'num_mao': self.num_mao,
+        }
+
+    @classmethod
+    def restaurar(cls, nome, estado, rastreador=None):
+        """Sala a partir de estado(); 'rastreador' novo para salas com bot"""
+        sala = cls(nome, estado['max'], rastreador=rastreador)
+        fichas = estado.get('fichas') or [None] * len(estado['jogadores'])  # diário de antes das fichas
+        for sid, nome_jogador, ficha in zip(estado['jogadores'], estado['nomes'], fichas):
+            sala.adicionar_jogador(sid, nome_jogador, ficha)
+        sala.estado_jogo = estado['estado']
+        sala.placar = list(estado['placar'])
+        sala.sets = list(estado['sets'])
+        sala.vez_atual_idx = estado['vez']
+        sala.jogador_inicial_mao = estado['inicial']
+        sala.pedinte_temp = estado['pedinte']
+        sala.valor_proposto_temp = estado['proposto']
+        if estado['vira'] is not None:
+            sala.jogo.vira = BARALHO[estado['vira']]
+            sala.jogo.definir_manilha()
+        sala.maos_server = [[BARALHO[c] for c in m] for m in estado['maos']]
+        sala.mesa_cartas = [(sid, BARALHO[c]) for sid, c in estado['mesa']]
+        if estado['mao'] is not None:
+            sala.mao = Mao(sala.jogo)
+            rodadas, sala.mao.valor_atual, sala.mao.dono_atual_da_aposta, sala.mao.vencedor_mao = estado['mao']
+            sala.mao.rodadas = list(rodadas)
+        if rastreador is not None:
+            rastreador.jogadas = estado['jogadas'] or 0
+            rastreador.vira = estado['vira']
+        sala.turno = estado['turno']
+        sala.num_mao = estado['num_mao']
+        return sala
@@ -1,935 +1,1416 @@
-import socketio
-import asyncio
-import random
-import time
-import uvicorn
-import os
-import traceback
-from truco_core import TrucoGame, Mao, Carta
-
-# ==============================================================================
-# CONFIGURAÇÕES INICIAIS
-# ==============================================================================
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
-
-# Arquivos estáticos
-static_files = {
-    '/': 'index.html',
-    '/win.mp3': 'win.mp3',
-    '/lose.mp3': 'lose.mp3',
-    '/shuffle.mp3': 'shuffle.mp3',
-    '/card.mp3': 'card.mp3',
-    '/truco.mp3': 'truco.mp3',
-    '/truco1.mp3': 'truco1.mp3',
-    '/seis.mp3': 'seis.mp3',
-    '/nove.mp3': 'nove.mp3',
-    '/doze.mp3': 'doze.mp3',
-    '/correr.mp3': 'correr.mp3',
-    '/correr1.mp3': 'correr1.mp3',
-    '/seis1.mp3': 'seis1.mp3',
-    '/nove1.mp3': 'nove1.mp3',
-    '/doze1.mp3': 'doze1.mp3',
-
-}
-
-app = socketio.ASGIApp(sio, static_files=static_files)
-
-# Listas de sons (SEM .mp3)
-SONS_TRUCO = ['truco', 'truco1']
-SONS_SEIS  = ['seis', 'seis1']
-SONS_NOVE  = ['nove', 'nove1']
-SONS_DOZE  = ['doze', 'doze1']
-SONS_CORRER = ['correr', 'correr1']
-
-def get_som_aleatorio(lista):
-    if not lista:
-        return None
-    return random.choice(lista)
-
-
-
-def obter_indices_time(sala, idx_ref):
-    return [i for i in range(sala['max_jogadores']) if (i % 2) == (idx_ref % 2)]
-
-def obter_indices_oponentes(sala, idx_ref):
-    return [i for i in range(sala['max_jogadores']) if (i % 2) != (idx_ref % 2)]
-
-async def emitir_pedido_truco_para_indices(nome_sala, sala, indices_alvo, valor, quem_pediu):
-    """Envia modal de TRUCO para todos humanos dos indices_alvo.
-    Se todos forem BOT, chama bot_responder_truco para 1 deles.
-    """
-    sids_alvo = [sala['jogadores'][i] for i in indices_alvo]
-    humanos = [sid for sid in sids_alvo if not sid.startswith('BOT')]
-
-    if humanos:
-        for sid in humanos:
-            await sio.emit('receber_pedido_truco', {'valor': int(valor), 'quem_pediu': quem_pediu}, to=sid)
-        return
-
-    # todos bots
-    if indices_alvo:
-        asyncio.create_task(bot_responder_truco(nome_sala, indices_alvo[0], int(valor)))
-
-
-jogos = {}
-ultimos_sinais = {} 
-TEMPO_LIMITE_AFK = 60 
-
-# ==============================================================================
-# 1. MONITORAMENTO E UTILITÁRIOS
-# ==============================================================================
-
-async def loop_monitoramento_afk():
-    print("[SISTEMA] Monitor de inatividade iniciado.")
-    while True:
-        await asyncio.sleep(5)
-        agora = time.time()
-        sids = list(ultimos_sinais.keys())
-        for sid in sids:
-            ultimo = ultimos_sinais.get(sid, agora)
-            if agora - ultimo > TEMPO_LIMITE_AFK:
-                if sid in ultimos_sinais: del ultimos_sinais[sid]
-                await gerenciar_desistencia(sid)
-                try: await sio.disconnect(sid)
-                except: pass
-
-async def emitir_som(nome_sala, som):
-    if not som: return
-    if nome_sala in jogos:
-        sala = jogos[nome_sala]
-        for p in sala['jogadores']:
-            if not p.startswith('BOT'):
-                await sio.emit('tocar_som', {'som': som}, to=p)
-
-async def enviar_estado_mesa(nome_sala):
-    if nome_sala not in jogos: return
-    sala = jogos[nome_sala]
-    lista = []
-    for item in sala['mesa_cartas']:
-        sid_dono, carta = item
-        idx = -1
-        if sid_dono in sala['jogadores']:
-            idx = sala['jogadores'].index(sid_dono)
-        lista.append({'valor': carta.valor, 'naipe': carta.naipe, 'dono_idx': idx})
-    
-    for p in sala['jogadores']:
-        if not p.startswith('BOT'):
-            await sio.emit('atualizar_mesa', {'cartas': lista}, to=p)
-
-async def notificar_info_jogo(nome_sala):
-    if nome_sala not in jogos: return
-    sala = jogos[nome_sala]
-    sets_atuais = sala.get('sets', [0, 0])
-    try: dono_real_idx = getattr(sala['mao'], 'dono_atual_da_aposta', None)
-    except: dono_real_idx = None
-
-    for i, p in enumerate(sala['jogadores']):
-        if p.startswith('BOT'): continue
-        meu_time = i % 2
-        placar_vis = sala['placar'] if meu_time == 0 else sala['placar'][::-1]
-        sets_vis = sets_atuais if meu_time == 0 else sets_atuais[::-1]
-        dono_para_enviar = dono_real_idx
-        if dono_real_idx is not None:
-            try:
-                dono_idx_int = int(dono_real_idx)
-                if (dono_idx_int % 2) == meu_time: dono_para_enviar = i 
-            except ValueError: pass 
-
-        await sio.emit('info_jogo', {
-            'placar': placar_vis, 'sets': sets_vis,
-            'valor': sala['mao'].valor_atual, 'dono_aposta': dono_para_enviar,
-            'nomes': sala['jogadores_nomes'], 'seu_indice': i,
-            'rodadas_hist': sala['mao'].rodadas
-        }, to=p)
-
-async def atualizar_turnos(nome_sala):
-    if nome_sala not in jogos: return
-    sala = jogos[nome_sala]
-    
-    if sala['estado_jogo'] in ['MAO_DE_11', 'TRUCO', 'FIM']: return
-
-    vez_idx = sala['vez_atual_idx']
-    
-    if vez_idx is not None:
-        sid_vez = sala['jogadores'][vez_idx]
-        for p_sid in sala['jogadores']:
-            if not p_sid.startswith('BOT'):
-                await sio.emit('status_vez', {'e_sua_vez': (p_sid == sid_vez)}, to=p_sid)
-        
-        if sid_vez.startswith('BOT'):
-            try:
-                asyncio.create_task(bot_jogar_delay(nome_sala, vez_idx))
-            except Exception as e:
-                print(f"ERRO AO INICIAR BOT: {e}")
-    else:
-        for p_sid in sala['jogadores']:
-            if not p_sid.startswith('BOT'):
-                await sio.emit('status_vez', {'e_sua_vez': False}, to=p_sid)
-
-# ==============================================================================
-# 2. LÓGICA DO JOGO
-# ==============================================================================
-# ======================================================================
-# IA DO BOT — PEDIR TRUCO / SEIS / NOVE / DOZE
-# ======================================================================
-
-def bot_deve_pedir_truco(sala, idx_bot):
-    if sala.get('estado_jogo') != 'JOGANDO' or 11 in sala.get('placar', []):
-        return False
-    mao = sala['maos_server'][idx_bot]
-    if not mao:
-        return False
-
-    # calcula força das cartas
-    forcas = sorted(
-        [sala['jogo'].calcular_forca(c) for c in mao],
-        reverse=True
-    )
-
-    # critérios simples e eficientes
-    tem_carta_muito_forte = forcas[0] >= 10
-    tem_duas_boas = len(forcas) >= 2 and forcas[1] >= 7
-
-    chance = random.random()  # evita robô perfeito
-
-    if tem_carta_muito_forte and chance < 0.75:
-        return True
-    if tem_duas_boas and chance < 0.55:
-        return True
-
-    return False
-
-async def bot_pedir_truco(nome_sala, idx_bot):
-    # BOT inicia o pedido de aumento igual ao humano (evento pedir_truco)
-    if nome_sala not in jogos:
-        return
-    sala = jogos[nome_sala]
-        # GARANTIA FORTE: só pede truco se for realmente a vez do BOT (SID)
-    sid_da_vez = sala['jogadores'][sala['vez_atual_idx']]
-    sid_bot = sala['jogadores'][idx_bot]
-
-    # se não for a vez do bot, nem tenta
-    if sid_da_vez != sid_bot:
-        return
-
-    # só pode pedir se estiver jogando e for a vez dele
-    # bloqueia truco na mão de 11 (igual ao evento pedir_truco)
-    if sala.get('estado_jogo') != 'JOGANDO' or 11 in sala.get('placar', []):
-        return
-
-    if sala['vez_atual_idx'] != idx_bot:
-        return
-
-    # respeita regra do core (se existir)
-    try:
-        pode, msg = sala['mao'].pode_pedir_aumento(idx_bot)
-        if not pode:
-            return
-    except:
-        pass
-
-    atual = sala['mao'].valor_atual
-
-    # próximo valor
-    if atual == 1:
-        novo_valor = 3
-    elif atual == 3:
-        novo_valor = 6
-    elif atual == 6:
-        novo_valor = 9
-    elif atual == 9:
-        novo_valor = 12
-    else:
-        return
-
-    # muda estado para TRUCO e registra o “pedinte”
-    sala['estado_jogo'] = 'TRUCO'
-    sala['pedinte_temp'] = idx_bot
-    sala['valor_proposto_temp'] = novo_valor
-
-    # toca som certo (truco/seis/nove/doze)
-    som_escolhido = get_som_aleatorio(SONS_TRUCO)
-    if novo_valor == 6:
-        som_escolhido = get_som_aleatorio(SONS_SEIS)
-    elif novo_valor == 9:
-        som_escolhido = get_som_aleatorio(SONS_NOVE)
-    elif novo_valor == 12:
-        som_escolhido = get_som_aleatorio(SONS_DOZE)
-
-    await emitir_som(nome_sala, som_escolhido)
-
-    # envia pedido para TODOS do time adversário (em duplas, os 2 recebem)
-    nome_bot = sala['jogadores_nomes'][idx_bot]
-    indices_defesa = obter_indices_oponentes(sala, idx_bot)
-
-    await emitir_pedido_truco_para_indices(nome_sala, sala, indices_defesa, novo_valor, nome_bot)
-
-    # quem pediu fica "aguardando"
-    await sio.emit('aguardando_truco', {}, to=sala['jogadores'][idx_bot])
-
-
-# ======================================================================
-# IA DO BOT — BLEFE (pode pedir aumento mesmo com mão fraca)
-# ======================================================================
-
-def bot_deve_blefar(sala, idx_bot):
-    if sala.get('estado_jogo') != 'JOGANDO' or 11 in sala.get('placar', []):
-        return False
-    mao = sala['maos_server'][idx_bot]
-    if not mao:
-        return False
-
-    # força das cartas
-    forcas = sorted(
-        [sala['jogo'].calcular_forca(c) for c in mao],
-        reverse=True
-    )
-
-    atual = sala['mao'].valor_atual
-
-    # NÃO blefa se já estiver muito alto
-    if atual >= 9:
-        return False
-
-    chance = random.random()
-
-    # blefe puro (mão fraca, mas arrisca)
-    if forcas[0] < 6 and chance < 0.18:
-        return True
-
-    # semi-blefe (1 carta média)
-    if forcas[0] >= 6 and forcas[0] < 8 and chance < 0.35:
-        return True
-
-    return False
-
-async def bot_jogar_delay(nome_sala, idx_bot):
-    await asyncio.sleep(1.5)
-    try:
-        if nome_sala not in jogos: return
-        sala = jogos[nome_sala]
-
-        if sala.get('estado_jogo') != 'JOGANDO':
-            return
-        
-        if sala['vez_atual_idx'] != idx_bot: 
-            return 
-
-        # GARANTIA EXTRA: confirma pelo SID (evita pedir no turno do humano)
-        if sala['jogadores'][sala['vez_atual_idx']] != sala['jogadores'][idx_bot]:
-            return
-
-            
-        mao_bot = sala['maos_server'][idx_bot]
-        if not mao_bot:
-            return
-
-        # decide truco / aumento (força real ou blefe)
-        # decide truco / aumento (força real ou blefe)
-        if bot_deve_pedir_truco(sala, idx_bot) or bot_deve_blefar(sala, idx_bot):
-            await bot_pedir_truco(nome_sala, idx_bot)
- 
-        # se o pedido REALMENTE foi feito, o estado vira TRUCO -> para aqui
-         # se não conseguiu pedir (pode_pedir_aumento negou), segue e joga carta
-            if sala.get('estado_jogo') == 'TRUCO':
-                return
-
-
-        # joga carta normalmente
-        carta_escolhida = max(
-            mao_bot,
-            key=lambda c: sala['jogo'].calcular_forca(c)
-        )
-        mao_bot.remove(carta_escolhida)
-
-        sid_bot = sala['jogadores'][idx_bot]
-        await processar_jogada_carta(
-            nome_sala,
-            sid_bot,
-            carta_escolhida
-        )
-
-        
-    except Exception as e:
-        print(f"ERRO CRÍTICO NO BOT: {e}")
-        traceback.print_exc()
-
-async def processar_jogada_carta(nome_sala, sid, carta_obj):
-    if nome_sala not in jogos: return
-    sala = jogos[nome_sala]
-    
-    sala['mesa_cartas'].append( (sid, carta_obj) )
-    await emitir_som(nome_sala, 'card')
-    await enviar_estado_mesa(nome_sala)
-
-    num_p = sala['max_jogadores']
-    
-    # --- Verifica se a rodada (mesa) está cheia ---
-    if len(sala['mesa_cartas']) < num_p:
-        sala['vez_atual_idx'] = (sala['vez_atual_idx'] + 1) % num_p
-        await atualizar_turnos(nome_sala)
-    else:
-        # FIM DA RODADA - Todos jogaram
-        sala['vez_atual_idx'] = None
-        await atualizar_turnos(nome_sala) 
-        await asyncio.sleep(1.5)
-        
-        # --- 1. CALCULA QUEM GANHOU A RODADA (OU EMPATE) ---
-        maior_forca = -1
-        times_com_maior_forca = set() # Armazena quais times (0 ou 1) têm a maior carta
-        
-        for item in sala['mesa_cartas']:
-            sid_j, c = item
-            f = sala['jogo'].calcular_forca(c)
-            
-            # Descobre o time deste jogador
-            idx_jogador = sala['jogadores'].index(sid_j)
-            time_jogador = idx_jogador % 2
-            
-            if f > maior_forca:
-                maior_forca = f
-                times_com_maior_forca = {time_jogador} # Novo líder
-            elif f == maior_forca:
-                times_com_maior_forca.add(time_jogador) # Empate potencial
-        
-        # Decide o resultado da RODADA
-        vencedor_rodada = -1 # -1 significa EMPATE (Canga)
-        vencedor_txt = "EMPATE (Canga)"
-        
-        if len(times_com_maior_forca) == 1:
-            # Apenas um time tem a carta mais forte
-            vencedor_rodada = list(times_com_maior_forca)[0]
-            vencedor_txt = "Time A" if vencedor_rodada == 0 else "Time B"
-        
-        # Adiciona o resultado ao histórico
-        sala['mao'].rodadas.append(vencedor_rodada)
-        
-        # Define quem começa a próxima (quem ganhou ou quem começou a anterior se empatou)
-        proximo_a_jogar = -1
-        if vencedor_rodada != -1:
-            # Procura o jogador desse time que jogou a maior carta para ser o primeiro
-            # (Simplificação: pega o primeiro índice desse time que venceu a rodada atual)
-            # Para ser exato, deveríamos guardar quem jogou a carta, mas a regra básica manda o vencedor tornar.
-            # Vamos achar quem jogou a carta vencedora:
-            for item in sala['mesa_cartas']:
-                sid_j, c = item
-                if sala['jogo'].calcular_forca(c) == maior_forca:
-                    idx = sala['jogadores'].index(sid_j)
-                    if (idx % 2) == vencedor_rodada:
-                        proximo_a_jogar = idx
-                        break
-        else:
-             # Se empatou, quem torna é quem começou a rodada atual (regra comum) ou o "pé"
-             # Mas o mais comum no empate é quem "melou" a carta, ou segue a roda. 
-             # Vamos manter: quem tornou a rodada atual, torna a próxima.
-             # Para isso precisamos saber quem começou essa rodada. Vamos usar lógica de incremento:
-             # Se empatou, o próximo é o próximo do 'jogador_inicial_mao' + n_rodada?
-             # Simplificação robusta: O mão (primeiro da rodada 1) torna no empate.
-             proximo_a_jogar = sala['jogador_inicial_mao']
-
-
-        # --- 2. LÓGICA DE QUEM LEVA A MÃO (AQUI ESTAVA O ERRO) ---
-        r = sala['mao'].rodadas
-        venc_mao_int = None 
-        
-        # Contagem simples
-        vitorias_t0 = r.count(0)
-        vitorias_t1 = r.count(1)
-        
-        # REGRA 1: Vitória simples (2x0)
-        if vitorias_t0 == 2: venc_mao_int = 0
-        elif vitorias_t1 == 2: venc_mao_int = 1
-        
-        # REGRA 2: Primeira rodada empatou (Canga na 1ª)
-        # Regra: Quem ganhar a 2ª, LEVA A MÃO.
-        elif r[0] == -1:
-            if len(r) >= 2 and r[1] != -1:
-                venc_mao_int = r[1] # <--- AQUI O FIX: Acaba na 2ª rodada!
-            elif len(r) == 3 and r[1] == -1 and r[2] != -1:
-                venc_mao_int = r[2] # 1ª e 2ª empataram, quem levar a 3ª ganha.
-            elif len(r) == 3 and r[1] == -1 and r[2] == -1:
-                venc_mao_int = -2 # 3 empates (ninguém ganha ou ganha o mão, escolhi anular)
-
-        # REGRA 3: Primeira teve vencedor, mas a 2ª empatou
-        # Regra: Quem ganhou a 1ª LEVA A MÃO.
-        elif len(r) >= 2 and r[1] == -1 and r[0] != -1:
-            venc_mao_int = r[0] # <--- FIX: Acaba na 2ª rodada se ela empatar!
-
-        # REGRA 4: 1ª e 2ª tiveram vencedores diferentes (1x1), decide na 3ª
-        elif len(r) == 3 and r[2] == -1:
-            # Se a 3ª empatar, a regra oficial diz que ganha quem venceu a 1ª
-            if r[0] != -1: venc_mao_int = r[0]
-
-        sala['mao'].vencedor_mao = venc_mao_int
-        
-        # --- 3. EXECUÇÃO DO RESULTADO ---
-        if sala['mao'].vencedor_mao is not None:
-             # Mão encerrada
-             sala['mesa_cartas'] = []
-             await enviar_estado_mesa(nome_sala)
-             await finalizar_mao(nome_sala, sala['mao'].vencedor_mao)
-        else:
-            # Continua para a próxima rodada
-            await notificar_info_jogo(nome_sala)
-            for p in sala['jogadores']:
-                if not p.startswith('BOT'):
-                    await sio.emit('resultado_rodada', {'vencedor': vencedor_txt}, to=p)
-            
-            sala['mesa_cartas'] = []
-            await enviar_estado_mesa(nome_sala)
-            
-            sala['vez_atual_idx'] = proximo_a_jogar
-            await atualizar_turnos(nome_sala)
-
-async def iniciar_nova_mao(nome_sala):
-    if nome_sala not in jogos: return
-    sala = jogos[nome_sala]
-    
-    if 'valor_proposto_temp' in sala: del sala['valor_proposto_temp']
-    if 'pedinte_temp' in sala: del sala['pedinte_temp']
-
-    jogo = sala['jogo']
-    sala['mao'] = Mao(jogo)
-    sala['mao'].dono_atual_da_aposta = None 
-    
-    sala['mesa_cartas'] = []; sala['maos_server'] = [] 
-    
-    num_p = sala['max_jogadores']
-    maos, vira = jogo.dar_cartas(num_jogadores=num_p)
-    sala['maos_server'] = maos 
-
-    if 'jogador_inicial_mao' not in sala: sala['jogador_inicial_mao'] = -1
-    sala['jogador_inicial_mao'] = (sala['jogador_inicial_mao'] + 1) % num_p
-    sala['vez_atual_idx'] = sala['jogador_inicial_mao']
-
-    placar = sala['placar']
-    time_11 = -1
-    eh_ferro = (placar[0] == 11 and placar[1] == 11)
-    
-    sala['estado_jogo'] = 'JOGANDO'
-    
-    if placar[0] == 11 and not eh_ferro: time_11 = 0; sala['estado_jogo'] = 'MAO_DE_11'
-    elif placar[1] == 11 and not eh_ferro: time_11 = 1; sala['estado_jogo'] = 'MAO_DE_11'
-
-    for p in sala['jogadores']: 
-        if not p.startswith('BOT'): await sio.emit('atualizar_mesa', {'cartas': []}, to=p)
-    await emitir_som(nome_sala, 'shuffle')
-
-    for i, p_sid in enumerate(sala['jogadores']):
-        if p_sid.startswith('BOT'): continue
-        cartas_json = [{'valor': c.valor, 'naipe': c.naipe} for c in maos[i]]
-        vira_json = {'valor': vira.valor, 'naipe': vira.naipe}
-        blind = False
-        await sio.emit('receber_mao', {
-            'minhas_cartas': cartas_json, 'vira': vira_json, 
-            'animar': True, 'blind': blind, 'seu_indice': i, 'modo_jogo': num_p
-        }, to=p_sid)
-        
-        if time_11 != -1 and (i % 2) == time_11:
-            idx_parc = (i + 2) % num_p
-            cartas_visualizar = []
-            msg_titulo = ""
-            if num_p == 2:
-                cartas_visualizar = [{'valor': c.valor, 'naipe': c.naipe} for c in maos[i]]
-                msg_titulo = "JOGAR A MÃO DE 11?"
-            else:
-                cartas_visualizar = [{'valor': c.valor, 'naipe': c.naipe} for c in maos[idx_parc]]
-                msg_titulo = "CARTAS DO PARCEIRO"
-
-            vira_json = {'valor': vira.valor, 'naipe': vira.naipe}
-            await sio.emit('decisao_mao_11', {
-                'cartas_parceiro': cartas_visualizar, 
-                'vira': vira_json, 
-                'titulo': msg_titulo 
-            }, to=p_sid)
-
-    if sala['estado_jogo'] == 'MAO_DE_11':
-        jogs_decisao = [j for k, j in enumerate(sala['jogadores']) if k % 2 == time_11]
-        if all(j.startswith('BOT') for j in jogs_decisao):
-            sala['estado_jogo'] = 'JOGANDO'; sala['mao'].valor_atual = 3
-
-    await notificar_info_jogo(nome_sala)
-    
-    if sala['estado_jogo'] == 'JOGANDO':
-        await atualizar_turnos(nome_sala)
-    else:
-        for p in sala['jogadores']:
-            if not p.startswith('BOT'): await sio.emit('status_vez', {'e_sua_vez': False}, to=p)
-
-async def finalizar_mao(nome_sala, ganhador_dado):
-    if nome_sala not in jogos: return
-    sala = jogos[nome_sala]
-    pontos = sala['mao'].valor_atual
-    
-    time_venc = 0 # Valor padrão (só usado se tudo falhar, mas não vai falhar)
-    
-    # 1. Se receber Inteiro (0 ou 1), confia nele.
-    if isinstance(ganhador_dado, int):
-        time_venc = ganhador_dado % 2
-    
-    # 2. Se receber String (fallback), analisa o conteúdo.
-    elif isinstance(ganhador_dado, str):
-        texto = ganhador_dado.upper()
-        # Se tiver "1", "B", ou "TIME 1", é o Time 1.
-        if "1" in texto or "B" in texto:
-            time_venc = 1
-        else:
-            time_venc = 0
-            
-    # Aplica os pontos no array do placar (índice 0 ou 1)
-    sala['placar'][time_venc] += pontos
-    print(f"[DEBUG] VENCEDOR MAO: Time {time_venc} (Pontos: {pontos})")
-
-    # Verifica se alguém fechou o SET (12 pontos)
-    if max(sala['placar']) >= 12:
-        idx_set_winner = 0 if sala['placar'][0] >= 12 else 1
-        
-        if 'sets' not in sala: sala['sets'] = [0, 0]
-        sala['sets'][idx_set_winner] += 1
-        sala['placar'] = [0, 0] 
-        
-        if sala['sets'][idx_set_winner] >= 2:
-            win_team_letra = "A" if idx_set_winner == 0 else "B"
-            for i, p in enumerate(sala['jogadores']):
-                if p.startswith('BOT'): continue
-                meu_time = i % 2
-                eh_vitoria = (meu_time == idx_set_winner)
-                msg = "VITÓRIA! CAMPEÃO!" if eh_vitoria else "DERROTA! FIM DE JOGO!"
-                snd = 'win' if eh_vitoria else 'lose'
-                await sio.emit('fim_de_jogo', {
-                    'titulo': msg, 
-                    'motivo': f"Time {win_team_letra} venceu a partida!", 
-                    'placar': [0,0], 
-                    'som': snd
-                }, to=p)
-            sala['sets'] = [0, 0]; sala['estado_jogo'] = 'FIM'
-        else:
-            # Fim de Set
-            placar_sets = f"{sala['sets'][0]} x {sala['sets'][1]}"
-            msg = f"FIM DA PARTIDA! Time {'A' if idx_set_winner==0 else 'B'} venceu o Set.\nSETS: {placar_sets}"
-            for i, p in enumerate(sala['jogadores']):
-                if not p.startswith('BOT'):
-                    await sio.emit('mensagem', msg, to=p)
-                    som = 'win' if (i%2) == idx_set_winner else 'lose'
-                    await sio.emit('tocar_som', {'som': som}, to=p)
-            await asyncio.sleep(4)
-            await iniciar_nova_mao(nome_sala)
-    else:
-        # Fim de Mão Normal
-        nome_exibir = "Time A" if time_venc == 0 else "Time B"
-        for p in sala['jogadores']:
-            if not p.startswith('BOT'):
-                await sio.emit('fim_de_mao', {
-                    'ganhador': nome_exibir, 
-                    'ganhador_idx': time_venc,
-                    'pontos': pontos
-                }, to=p)
-        await asyncio.sleep(3)
-        await iniciar_nova_mao(nome_sala)
-
-
-# ==============================================================================
-# 3. TRUCO E INTERAÇÕES
-# ==============================================================================
-
-async def bot_responder_truco(nome_sala, idx_bot, valor_proposto):
-    await asyncio.sleep(2.0)
-    if nome_sala not in jogos: return
-    aceitar = random.choice([True, False, True]) 
-    sid_bot = jogos[nome_sala]['jogadores'][idx_bot]
-    if aceitar: await responder_truco_logica(nome_sala, sid_bot, 'ACEITAR')
-    else: await responder_truco_logica(nome_sala, sid_bot, 'CORRER')
-
-async def responder_truco_logica(nome_sala, sid, resposta, dados_extras=None):
-    sala = jogos[nome_sala]
-    
-    if resposta == 'ACEITAR':
-        if 'valor_proposto_temp' in sala:
-            sala['mao'].valor_atual = sala['valor_proposto_temp']
-        else:
-            vals = {1:3, 3:6, 6:9, 9:12, 12:12}
-            sala['mao'].valor_atual = vals.get(sala['mao'].valor_atual, 3)
-        
-        pedinte_idx = sala.get('pedinte_temp', None)
-        if pedinte_idx is not None:
-            sala['mao'].dono_atual_da_aposta = pedinte_idx
-            
-        sala['estado_jogo'] = 'JOGANDO' 
-        if 'valor_proposto_temp' in sala: del sala['valor_proposto_temp']
-        if 'pedinte_temp' in sala: del sala['pedinte_temp']
-
-        for p in sala['jogadores']:
-            if not p.startswith('BOT'): 
-                await sio.emit('truco_respondido', {'msg': f'ACEITOU! VALE {sala["mao"].valor_atual}'}, to=p)
-        
-        await notificar_info_jogo(nome_sala)
-        await atualizar_turnos(nome_sala) 
-
-    elif resposta == 'CORRER':
-        await emitir_som(nome_sala, get_som_aleatorio(SONS_CORRER))
-        idx = sala['jogadores'].index(sid)
-        idx_vencedor = 1 if (idx % 2) == 0 else 0
-        await finalizar_mao(nome_sala, idx_vencedor)
-        
-    elif resposta == 'AUMENTAR':
-        # Confirma o valor anterior
-        if 'valor_proposto_temp' in sala:
-            sala['mao'].valor_atual = sala['valor_proposto_temp']
-
-        pedinte_original_idx = sala.get('pedinte_temp')
-        repicador_idx = sala['jogadores'].index(sid)
-
-        # Leitura segura do valor
-        val_recebido = 0
-        if dados_extras:
-            val_recebido = dados_extras.get('novo_valor') or dados_extras.get('valor') or 0
-
-        if not val_recebido:
-            atual = sala['mao'].valor_atual
-            if atual == 3:
-                val_recebido = 6
-            elif atual == 6:
-                val_recebido = 9
-            elif atual == 9:
-                val_recebido = 12
-
-        novo_valor = int(val_recebido)
-
-        # Som do aumento (se quiser variações, coloque seis1/nove1/doze1 nas listas)
-        som_aumento = None
-        if novo_valor == 6:
-            som_aumento = get_som_aleatorio(SONS_SEIS)
-        elif novo_valor == 9:
-            som_aumento = get_som_aleatorio(SONS_NOVE)
-        elif novo_valor == 12:
-            som_aumento = get_som_aleatorio(SONS_DOZE)
-
-        if som_aumento:
-            await emitir_som(nome_sala, som_aumento)
-
-        sala['valor_proposto_temp'] = novo_valor
-        sala['pedinte_temp'] = repicador_idx
-        sala['estado_jogo'] = 'TRUCO'
-
-        nome_repicador = sala['jogadores_nomes'][repicador_idx]
-
-        # Quando tem AUMENTO (SEIS/NOVE/DOZE), o time que pediu antes (pedinte_original) deve responder.
-        # Em duplas, os 2 jogadores desse time recebem o modal (se houver humano; bot segue humano).
-        indices_time_pedinte = obter_indices_time(sala, pedinte_original_idx)
-
-        await emitir_pedido_truco_para_indices(nome_sala, sala, indices_time_pedinte, novo_valor, nome_repicador)
-    
-@sio.event
-async def pedir_truco(sid, dados):
-    n = dados['nome_sala']
-    sala = jogos[n]
-    ultimos_sinais[sid] = time.time()
-    
-    # Validações
-    if sala['estado_jogo'] != 'JOGANDO' or 11 in sala['placar']: return
-    idx = sala['jogadores'].index(sid)
-    if sala['vez_atual_idx'] != idx: return 
-    try:
-        pode, msg = sala['mao'].pode_pedir_aumento(idx)
-        if not pode: return 
-    except: pass
-    
-    sala['estado_jogo'] = 'TRUCO'
-    sala['pedinte_temp'] = idx
-    sala['valor_proposto_temp'] = dados['valor']
-    
-    # --- BLOCO DE SOM (SUBSTITUIR) ---
-    som_escolhido = get_som_aleatorio(SONS_TRUCO)
-    val = int(dados['valor'])
-
-    if val == 6:
-        som_escolhido = get_som_aleatorio(SONS_SEIS)
-    elif val == 9:
-        som_escolhido = get_som_aleatorio(SONS_NOVE)
-    elif val == 12:
-        som_escolhido = get_som_aleatorio(SONS_DOZE)
-
-    await emitir_som(n, som_escolhido)
-# --------------------------------
-
-    
-  
-        # Em duplas, ambos os jogadores do time adversário devem receber o pedido.
-    nome = sala['jogadores_nomes'][idx]
-    indices_defesa = obter_indices_oponentes(sala, idx)
-
-    await emitir_pedido_truco_para_indices(n, sala, indices_defesa, dados['valor'], nome)
-
-    # quem pediu fica "aguardando"
-    await sio.emit('aguardando_truco', {}, to=sid)
-@sio.event
-async def responder_truco(sid, dados): 
-    ultimos_sinais[sid] = time.time()
-    await responder_truco_logica(dados['nome_sala'], sid, dados['resposta'], dados)
-
-    # Fecha o modal de TRUCO em todos (em duplas, o parceiro também fecha automaticamente)
-    await sio.emit('fechar_modal_truco', {}, room=dados['nome_sala'])
-
-@sio.event
-async def responder_mao_11(sid, dados):
-    ultimos_sinais[sid] = time.time()
-    n = dados['nome_sala']; sala = jogos[n]
-    resposta = dados['resposta']
-    if resposta == 'JOGAR':
-        sala['mao'].valor_atual = 3
-        sala['estado_jogo'] = 'JOGANDO'
-        await notificar_info_jogo(n)
-        await sio.emit('mensagem', "Mão de 11 ACEITA! Valendo 3!", room=n)
-        await atualizar_turnos(n)
-    elif resposta == 'CORRER':
-        sala['mao'].valor_atual = 1
-        idx = sala['jogadores'].index(sid)
-        idx_vencedor = 1 if (idx % 2) == 0 else 0
-        await finalizar_mao(n, idx_vencedor)
-
-# ==============================================================================
-# 4. EVENTOS DE CONEXÃO E SALAS
-# ==============================================================================
-
-async def enviar_lista_salas(sid=None):
-    lista = [{'nome': n, 'qtd': len(d['jogadores']), 'max': d['max_jogadores']} for n, d in jogos.items()]
-    msg = 'receber_lista_salas'
-    if sid: await sio.emit(msg, lista, to=sid)
-    else: await sio.emit(msg, lista)
-
-async def gerenciar_desistencia(sid):
-    sala_encontrada = None; nome_sala = None
-    for nome, sala in jogos.items():
-        if sid in sala['jogadores']:
-            sala_encontrada = sala; nome_sala = nome; break
-    if sala_encontrada:
-        idx = sala_encontrada['jogadores'].index(sid)
-        time_venc = 1 if (idx % 2) == 0 else 0
-        for p in sala_encontrada['jogadores']:
-            if isinstance(p, str) and not p.startswith('BOT') and p != sid:
-                meu_time = sala_encontrada['jogadores'].index(p) % 2
-                tit = "VITÓRIA (W.O.)!" if meu_time == time_venc else "DERROTA"
-                await sio.emit('fim_de_jogo', {
-                    'titulo': tit, 'motivo': 'Oponente desconectou.', 
-                    'placar': sala_encontrada['placar'], 
-                    'som': 'win' if meu_time==time_venc else 'lose'
-                }, to=p)
-        del jogos[nome_sala]
-        await enviar_lista_salas()
-
-@sio.event
-async def connect(sid, environ): 
-    ultimos_sinais[sid] = time.time()
-    await enviar_lista_salas(sid)
-
-@sio.event
-async def disconnect(sid): 
-    if sid in ultimos_sinais: del ultimos_sinais[sid]
-    await gerenciar_desistencia(sid)
-
-@sio.event
-async def pedir_lista_salas(sid): await enviar_lista_salas(sid)
-
-@sio.event
-async def criar_sala_vs_bot(sid, d):
-    ultimos_sinais[sid] = time.time()
-    n = d['nome_sala']; modo = int(d.get('modo', 4))
-    if n in jogos: return
-    jogs = [sid] + [f'BOT_{i+1}' for i in range(modo-1)]
-    nomes = [d['nome_jogador']] + [f'Robô {i+1}' for i in range(modo-1)]
-    jogos[n] = {'jogo': TrucoGame(), 'mao': None, 'maos_server': [], 'jogadores': jogs, 'jogadores_nomes': nomes, 'mesa_cartas': [], 'placar': [0,0], 'sets': [0,0], 'vez_atual_idx': None, 'estado_jogo': 'JOGANDO', 'max_jogadores': modo}
-    await sio.enter_room(sid, n)
-    await iniciar_nova_mao(n)
-    await enviar_lista_salas()
-
-@sio.event
-async def criar_sala(sid, d):
-    ultimos_sinais[sid] = time.time()
-    n = d['nome_sala']; modo = int(d['modo'])
-    if n in jogos: return
-    jogos[n] = {'jogo': TrucoGame(), 'mao': None, 'maos_server': [], 'jogadores': [sid], 'jogadores_nomes': [d['nome_jogador']], 'mesa_cartas': [], 'placar': [0,0], 'sets': [0,0], 'vez_atual_idx': None, 'estado_jogo': 'JOGANDO', 'max_jogadores': modo}
-    await sio.enter_room(sid, n)
-    await enviar_lista_salas()
-
-@sio.event
-async def entrar_sala(sid, d):
-    ultimos_sinais[sid] = time.time()
-    n = d['nome_sala']
-    if n in jogos:
-        s = jogos[n]
-        if len(s['jogadores']) < s['max_jogadores']:
-            s['jogadores'].append(sid); s['jogadores_nomes'].append(d['nome_jogador'])
-            await sio.enter_room(sid, n)
-            if len(s['jogadores']) == s['max_jogadores']: await iniciar_nova_mao(n)
-            else: await sio.emit('mensagem', 'Aguardando...', to=sid)
-            await enviar_lista_salas()
-        else: await sio.emit('erro', 'Sala cheia', to=sid)
-
-@sio.event
-async def jogar_carta(sid, d):
-    ultimos_sinais[sid] = time.time()
-    n = d['nome_sala']; sala = jogos[n]
-    idx = sala['jogadores'].index(sid)
-    if sala['vez_atual_idx'] != idx: return
-    mao = sala['maos_server'][idx]
-    
-    val_alvo = str(d['carta']['valor'])
-    nai_alvo = str(d['carta']['naipe'])
-    
-    c_obj = next((c for c in mao if str(c.valor) == val_alvo and str(c.naipe) == nai_alvo), None)
-    
-    if c_obj:
-        mao.remove(c_obj)
-        await processar_jogada_carta(n, sid, c_obj)
-    else:
-        print(f"ERRO: Carta não encontrada! {val_alvo}/{nai_alvo}")
-
-@sio.event
-async def enviar_emote(sid, d):
-    n = d['nome_sala']
-    if n in jogos:
-        idx = jogos[n]['jogadores'].index(sid)
-        for p in jogos[n]['jogadores']: 
-            if not p.startswith('BOT'): await sio.emit('receber_emote', {'remetente_idx': idx, 'conteudo': d['conteudo'], 'tipo': d['tipo']}, to=p)
-
-@sio.event
-async def sair_do_jogo(sid): await gerenciar_desistencia(sid)
-
-sio.start_background_task(loop_monitoramento_afk)
-
-if __name__ == '__main__':
-    port = int(os.environ.get("PORT", 10000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+import socketio
+import asyncio
+import random
+import time
+import uvicorn
+import os
+import traceback
+import functools
+import json
+import secrets
+import itertools
+import resource
+from collections import Counter, deque
+from truco_core import Mao, BARALHO, CARTAS_POR_NOME, resolver_mao
+from bot_ia import ORCAMENTO_PADRAO, RastreadorCartas, decidir_jogada, decidir_resposta_truco, equidade_mao, tabela_equidade
+from agenda import Agenda
+from inatividade import MonitorInatividade
+from sala import Sala, compartilhados, eh_bot
+from servico_bots import ServicoBots
+import compacto
+from estaticos import Estaticos
+from saida import Saidas
+from shards import GerenteShards, ClienteUnix, NUM_SHARDS, SHARD, BROKER, dono
+from lobby import Lobby
+from pareamento import Pareamento
+from diario import Diario, PASTA as PASTA_DIARIO
+from ator import ESTATISTICAS as ESTATISTICAS_CAIXAS
+from quadros import ESTATISTICAS as ESTATISTICAS_QUADROS
+
+# ==============================================================================
+# CONFIGURAÇÕES INICIAIS
+# ==============================================================================
+# Com SHARDS > 1 (ver lancador.py) cada processo é dono de parte das salas e
+# os emits para clientes de outro processo passam pelo broker (ver shards.py)
+gerente = GerenteShards(ClienteUnix(BROKER, SHARD)) if NUM_SHARDS > 1 else None
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', client_manager=gerente)
+
+# Arquivos estáticos (servidos da memória, ver estaticos.py)
+static_files = {
+    '/': 'index.html',
+    '/win.mp3': 'win.mp3',
+    '/lose.mp3': 'lose.mp3',
+    '/shuffle.mp3': 'shuffle.mp3',
+    '/card.mp3': 'card.mp3',
+    '/truco.mp3': 'truco.mp3',
+    '/truco1.mp3': 'truco1.mp3',
+    '/seis.mp3': 'seis.mp3',
+    '/nove.mp3': 'nove.mp3',
+    '/doze.mp3': 'doze.mp3',
+    '/correr.mp3': 'correr.mp3',
+    '/correr1.mp3': 'correr1.mp3',
+    '/seis1.mp3': 'seis1.mp3',
+    '/nove1.mp3': 'nove1.mp3',
+    '/doze1.mp3': 'doze1.mp3',
+
+}
+
+async def app_metricas(scope, receive, send):
+    """GET /metricas: contadores do servidor em JSON (o resto é 404)"""
+    if scope['type'] == 'websocket':
+        await send({'type': 'websocket.close'})
+        return
+    if scope['type'] != 'http': return
+    if scope['path'] != '/metricas':
+        await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    corpo = json.dumps(metricas()).encode()
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/json'), (b'cache-control', b'no-store')]})
+    await send({'type': 'http.response.body', 'body': corpo})
+
+estaticos = Estaticos(static_files, resto=app_metricas)
+app = socketio.ASGIApp(sio, other_asgi_app=estaticos)
+saidas = Saidas(sio)  # fila de saída de cada cliente (ver saida.py)
+
+# Listas de sons (SEM .mp3)
+SONS_TRUCO = ['truco', 'truco1']
+SONS_SEIS  = ['seis', 'seis1']
+SONS_NOVE  = ['nove', 'nove1']
+SONS_DOZE  = ['doze', 'doze1']
+SONS_CORRER = ['correr', 'correr1']
+
+def get_som_aleatorio(lista):
+    if not lista:
+        return None
+    return random.choice(lista)
+
+
+
+async def emitir_pedido_truco_para_indices(nome_sala, sala, indices_alvo, valor, quem_pediu):
+    """Envia modal de TRUCO para todos humanos dos indices_alvo.
+    Se todos forem BOT, chama bot_responder_truco para 1 deles.
+    """
+    sids_alvo = [sala.jogadores[i] for i in indices_alvo]
+    humanos = [sid for sid in sids_alvo if not eh_bot(sid)]
+
+    if humanos:
+        emitir_para(sala, humanos, 'receber_pedido_truco', {'valor': int(valor), 'quem_pediu': quem_pediu})
+        return
+
+    # todos bots
+    if indices_alvo:
+        pedinte = sala.pedinte_temp
+        agendar_evento(sala, ATRASO_BOT_TRUCO, bot_responder_truco, nome_sala, indices_alvo[0], int(valor),
+                       valido=lambda: sala.estado_jogo == 'TRUCO' and sala.pedinte_temp == pedinte)
+
+
+jogos = {}  # nome -> Sala
+assentos = {}  # sid humano -> (nome da sala, assento); mantido junto com 'jogos'
+espectando = {}  # sid -> nome da sala que está assistindo
+lobby = Lobby(sio, jogos)  # lista de salas em diferenças (ver lobby.py)
+# Estado das salas em disco para voltar de uma queda (ver diario.py); um diário por processo
+diario = Diario(os.path.join(PASTA_DIARIO, f'shard-{SHARD}') if PASTA_DIARIO and NUM_SHARDS > 1 else PASTA_DIARIO)
+MAX_ESPECTADORES = int(os.environ.get('MAX_ESPECTADORES', 500))  # por sala
+TEMPO_LIMITE_AFK = 60 
+PRECISAO_AFK = float(os.environ.get('AFK_PRECISAO', 1.0))  # segundos; expulsa até isso depois do prazo
+monitor_afk = MonitorInatividade(TEMPO_LIMITE_AFK, PRECISAO_AFK)
+# Quem cai no meio da partida tem esse tempo para voltar ao assento com a ficha
+TEMPO_RESERVA = float(os.environ.get('TEMPO_RESERVA', 30))
+fichas = {}    # ficha -> nome da sala; o cliente guarda a dele e manda em 'reconectar'
+reservas = {}  # sid que caiu -> nome da sala, enquanto o assento espera por ele
+
+# Coleta de salas (ver loop_coleta_salas): prazos sem evento, em segundos
+COLETA_INTERVALO = float(os.environ.get('COLETA_INTERVALO', 30))
+SALA_FIM_TTL = float(os.environ.get('SALA_FIM_TTL', 60))         # partida terminada ('FIM')
+SALA_ESPERA_TTL = float(os.environ.get('SALA_ESPERA_TTL', 300))  # aberta e nunca completou
+SALA_OCIOSA_TTL = float(os.environ.get('SALA_OCIOSA_TTL', 900))  # parada no meio
+AMOSTRA_MEMORIA = 10   # salas medidas por varredura, uma por volta do loop (~0.3 ms cada)
+JANELA_MEMORIA = 200   # últimas medidas que entram nas métricas
+# Admissão: salas abertas no total e por cliente (endereço de quem abriu)
+MAX_SALAS = int(os.environ.get('MAX_SALAS', 5000))
+MAX_SALAS_POR_CLIENTE = int(os.environ.get('MAX_SALAS_POR_CLIENTE', 3))
+clientes = {}                  # sid conectado aqui -> endereço
+salas_por_cliente = Counter()  # endereço -> salas abertas por ele
+coleta = {'varreduras': 0, 'ultima_ms': 0.0, 'fim': 0, 'vazia': 0, 'abandonada': 0, 'ociosa': 0,
+          'recusadas_total': 0, 'recusadas_cliente': 0}
+memoria_salas = {}             # resumo de tamanhos_salas (ver medir_memoria)
+tamanhos_salas = deque(maxlen=JANELA_MEMORIA)
+
+# Pausas do jogo (segundos), cumpridas pela agenda sem segurar o handler
+ATRASO_BOT_JOGADA = 1.5
+ATRASO_BOT_TRUCO = 2.0
+ATRASO_FIM_RODADA = 1.5
+ATRASO_FIM_MAO = 3
+ATRASO_FIM_SET = 4
+agenda = Agenda()
+
+def agendar_evento(sala, atraso, funcao, *args, valido=None):
+    """Daqui a 'atraso' segundos, põe funcao(*args) na caixa da sala (ver ator.py)"""
+    agenda.agendar(sala.nome, atraso, sala.ator.enviar, funcao, *args, valido=valido, interno=True)
+
+# Chance de vitória pré-calculada de cada mão (mmap; None se o arquivo não existir)
+TABELA_EQUIDADE = tabela_equidade()
+
+# Decisões dos bots rodam em processos separados (ver servico_bots.py)
+servico_bots = ServicoBots()
+
+async def encerrar():
+    # Fecha os processos junto com o servidor (senão ficam órfãos segurando a porta)
+    servico_bots.encerrar()
+    await diario.fechar()
+
+app.on_shutdown = encerrar
+
+# ==============================================================================
+# 1. MONITORAMENTO E UTILITÁRIOS
+# ==============================================================================
+
+async def expulsar_inativo(sid):
+    await gerenciar_desistencia(sid)
+    try: await sio.disconnect(sid)
+    except: pass
+
+async def loop_monitoramento_afk():
+    print(f"[SISTEMA] Monitor de inatividade iniciado (precisão {PRECISAO_AFK}s).")
+    while True:
+        await asyncio.sleep(PRECISAO_AFK)
+        vencidos = monitor_afk.vencidos()
+        if not vencidos: continue
+        # Todos de uma vez: uma leva grande não segura a próxima varredura
+        await asyncio.gather(*(expulsar_inativo(sid) for sid in vencidos))
+        s = monitor_afk.stats
+        print(f"[AFK] {len(vencidos)} expulsos | pendentes: {len(monitor_afk)} | "
+              f"varredura: {s['ultima_varredura_ms']:.2f} ms | conferidos até agora: {s['conferidos']}")
+
+# Emits de um evento da sala entram no quadro dela e saem juntos no fim do
+# evento (ver quadros.py): um pacote por grupo de jogadores que recebem o
+# mesmo, serializado uma vez. Payload por assento parte de uma base comum e
+# só acrescenta o que muda.
+# O que vai para a sala inteira também vai para a plateia; o que é de um
+# assento (mão, decisão da mão de 11) nunca.
+
+# --- Coleta de salas e limites de admissão ---------------------------------
+# A varredura tira de 'jogos' (por remover_sala, que cancela agenda, bots e
+# caixa) a sala terminada, a que nunca completou, a que ninguém mais usa
+# (nenhum humano conectado nem com assento reservado) e a parada no meio.
+
+def cliente_de(sid):
+    # Com shards o endereço de quem está em outro processo vem no evento encaminhado
+    return clientes.get(sid) or (gerente is not None and gerente.enderecos.get(sid)) or sid
+
+async def admitir_sala(sid):
+    """Cabe mais uma sala (no total e para o cliente)? Senão recusa na hora"""
+    if len(jogos) >= MAX_SALAS:
+        coleta['recusadas_total'] += 1
+        await sio.emit('erro', 'Servidor cheio, tente daqui a pouco.', to=sid)
+        return False
+    if salas_por_cliente[cliente_de(sid)] >= MAX_SALAS_POR_CLIENTE:
+        coleta['recusadas_cliente'] += 1
+        await sio.emit('erro', 'Você já tem salas demais abertas.', to=sid)
+        return False
+    return True
+
+def conectado(sid):
+    return sio.manager.is_connected(sid, '/') or (gerente is not None and sid in gerente.origem)
+
+def motivo_coleta(sala, agora):
+    parada = agora - sala.atividade
+    if sala.estado_jogo == 'FIM' and parada > SALA_FIM_TTL: return 'fim'
+    if sala.mao is None and parada > SALA_ESPERA_TTL: return 'vazia'
+    if not any(conectado(p) or p in reservas for p in sala.humanos): return 'abandonada'
+    if parada > SALA_OCIOSA_TTL: return 'ociosa'
+    return None
+
+MOTIVOS_COLETA = {'vazia': 'A sala não completou a tempo.', 'ociosa': 'A sala ficou parada demais.'}
+
+async def coletar_salas():
+    inicio = time.perf_counter()
+    agora = time.monotonic()
+    coletadas = [(sala, motivo) for sala in list(jogos.values()) if (motivo := motivo_coleta(sala, agora))]
+    for sala, motivo in coletadas:
+        remover_sala(sala.nome)
+        coleta[motivo] += 1
+        if motivo in MOTIVOS_COLETA:  # quem ainda está na mesa sabe por que ela fechou
+            emitir_sala(sala, 'fim_de_jogo', {'titulo': "SALA ENCERRADA", 'motivo': MOTIVOS_COLETA[motivo],
+                                              'placar': sala.placar, 'som': None})
+            await enviar_quadro(sala)
+    coleta['varreduras'] += 1
+    coleta['ultima_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    if coletadas:
+        print(f"[COLETA] {len(coletadas)} salas removidas ({', '.join(m for _, m in coletadas)}) | "
+              f"abertas: {len(jogos)} | {coleta['ultima_ms']:.1f} ms")
+
+async def medir_memoria():
+    """Bytes de umas poucas salas sorteadas, uma por volta do loop (a conta é
+    cara); as métricas resumem as últimas JANELA_MEMORIA medidas"""
+    base = compartilhados()
+    for nome in random.sample(list(jogos), min(len(jogos), AMOSTRA_MEMORIA)):
+        await asyncio.sleep(0)
+        if nome in jogos: tamanhos_salas.append(jogos[nome].memoria(base))
+    media = sum(tamanhos_salas) / len(tamanhos_salas) if tamanhos_salas else 0
+    memoria_salas.update({'salas': len(jogos), 'medidas': len(tamanhos_salas), 'media_kb': round(media / 1024, 1),
+                          'maior_kb': round(max(tamanhos_salas, default=0) / 1024, 1),
+                          'total_estimado_kb': round(media * len(jogos) / 1024, 1)})
+
+async def loop_coleta_salas():
+    print(f"[SISTEMA] Coleta de salas a cada {COLETA_INTERVALO:g}s (máximo {MAX_SALAS} salas, "
+          f"{MAX_SALAS_POR_CLIENTE} por cliente).")
+    while True:
+        await asyncio.sleep(COLETA_INTERVALO)
+        try:
+            await coletar_salas()
+            await medir_memoria()
+        except Exception: traceback.print_exc()
+
+def emitir_para(sala, sids, evento, dados):
+    sala.quadro.adicionar(evento, dados, sids)
+
+def emitir_sala(sala, evento, dados, exceto=None):
+    emitir_para(sala, [p for p in sala.humanos if p != exceto], evento, dados)
+    if sala.espectadores: sala.quadro.publicar(evento, dados)
+
+def emitir_time(sala, time_alvo, evento, dados, exceto=None):
+    emitir_para(sala, [p for p in sala.humanos if sala.assento[p] % 2 == time_alvo and p != exceto], evento, dados)
+
+async def fim_de_evento(sala):
+    sala.atividade = time.monotonic()
+    diario.registrar(sala)
+    await enviar_quadro(sala)
+
+async def enviar_quadro(sala):
+    grupos, publico = sala.quadro.fechar(sala.humanos)
+    for pacote, sids in grupos:
+        if reservas:  # quem caiu não recebe: volta com o retrato em 'retomar'
+            sids = [p for p in sids if p not in reservas]
+            if not sids: continue
+        await saidas.enviar(sids, 'quadro', pacote)
+    if publico is not None and sala.espectadores:
+        # Um pacote para a plateia inteira, numa task à parte: quem assiste
+        # não segura a caixa da sala
+        sio.start_background_task(saidas.enviar, list(sala.espectadores), 'quadro', publico)
+
+def abrir_sala(sala, clientes=()):
+    """Põe a sala em 'jogos'; no fim de cada evento da caixa o que mudou vai
+    para o diário e o quadro sai. A sala conta no limite de cada um de 'clientes'."""
+    sala.ator.depois = functools.partial(fim_de_evento, sala)
+    jogos[sala.nome] = sala
+    sala.clientes = tuple(dict.fromkeys(clientes))  # uma vez por endereço, mesmo com vários na mesa
+    for cliente in sala.clientes: salas_por_cliente[cliente] += 1
+    lobby.marcar(sala)
+
+async def emitir_som(nome_sala, som):
+    if not som: return
+    if nome_sala in jogos:
+        emitir_sala(jogos[nome_sala], 'tocar_som', {'som': som})
+
+def cartas_na_mesa(sala):
+    lista = []
+    for item in sala.mesa_cartas:
+        sid_dono, carta = item
+        idx_dono = sala.assento.get(sid_dono)
+        if idx_dono is not None:
+            lista.append(carta.json_mesa[idx_dono])
+        else:
+            lista.append({**carta.json, 'dono_idx': -1})
+    return lista
+
+async def enviar_estado_mesa(nome_sala):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+    emitir_sala(sala, 'atualizar_mesa', {'cartas': cartas_na_mesa(sala)})
+
+def dono_aposta_visto_por(sala, i):
+    """Dono da aposta para o assento i: se é do time dele, aparece como ele"""
+    try: dono_real_idx = getattr(sala.mao, 'dono_atual_da_aposta', None)
+    except: dono_real_idx = None
+    if dono_real_idx is not None:
+        try:
+            if (int(dono_real_idx) % 2) == i % 2: return i
+        except ValueError: pass
+    return dono_real_idx
+
+def info_base(sala):
+    return {'valor': sala.mao.valor_atual, 'nomes': sala.jogadores_nomes, 'rodadas_hist': sala.mao.rodadas}
+
+def info_publica(sala, base=None):
+    """info_jogo da plateia: a mesa vista do assento 0"""
+    return {**(base or info_base(sala)), 'placar': sala.placar, 'sets': sala.sets,
+            'dono_aposta': dono_aposta_visto_por(sala, 0), 'seu_indice': 0}
+
+def mao_publica(sala, base_mao=None):
+    base_mao = base_mao or {'vira': sala.jogo.vira.json, 'animar': False, 'blind': False, 'modo_jogo': sala.max_jogadores}
+    return {**base_mao, 'minhas_cartas': [], 'seu_indice': 0}
+
+async def notificar_info_jogo(nome_sala):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+
+    base = info_base(sala)
+    # Placar e sets na visão de cada time; por assento só muda o índice e o dono da aposta
+    por_time = ({**base, 'placar': sala.placar, 'sets': sala.sets},
+                {**base, 'placar': sala.placar[::-1], 'sets': sala.sets[::-1]})
+
+    for p in sala.humanos:
+        i = sala.assento[p]
+        emitir_para(sala, [p], 'info_jogo', {**por_time[i % 2], 'dono_aposta': dono_aposta_visto_por(sala, i), 'seu_indice': i})
+
+    if sala.espectadores:
+        sala.quadro.publicar('info_jogo', info_publica(sala, base))
+
+async def atualizar_turnos(nome_sala):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+    
+    if sala.estado_jogo in ['MAO_DE_11', 'TRUCO', 'FIM', 'FIM_DE_MAO']: return
+
+    vez_idx = sala.vez_atual_idx
+    
+    if vez_idx is not None:
+        sala.turno += 1
+        turno = sala.turno
+        sid_vez = sala.jogadores[vez_idx]
+        # "Não é sua vez" para a sala num emit só; quem joga recebe o dele
+        if eh_bot(sid_vez):
+            emitir_sala(sala, 'status_vez', {'e_sua_vez': False})
+        else:
+            emitir_sala(sala, 'status_vez', {'e_sua_vez': False}, exceto=sid_vez)
+            emitir_para(sala, [sid_vez], 'status_vez', {'e_sua_vez': True})
+
+        if eh_bot(sid_vez):
+            # Se a vez mudar antes (truco, nova mão...), a jogada é descartada na caixa
+            agendar_evento(sala, ATRASO_BOT_JOGADA, bot_jogar, nome_sala, vez_idx,
+                           valido=lambda: sala.turno == turno)
+    else:
+        emitir_sala(sala, 'status_vez', {'e_sua_vez': False})
+
+# ==============================================================================
+# 2. LÓGICA DO JOGO
+# ==============================================================================
+# ======================================================================
+# IA DO BOT — PEDIR TRUCO / SEIS / NOVE / DOZE
+# ======================================================================
+
+def retrato_bot(sala, idx_bot, orcamento=ORCAMENTO_PADRAO):
+    """Estado que o bot enxerga, só com ids e números (vai para outro processo)"""
+    mao = sala.mao
+    try: pode, _ = mao.pode_pedir_aumento(idx_bot)
+    except: pode = True
+    return {
+        'mao': [c.id for c in sala.maos_server[idx_bot]],
+        'vira': sala.jogo.vira.id,
+        'mesa': [(sala.assento[s], c.id) for s, c in sala.mesa_cartas],
+        'eu': idx_bot,
+        'num_jogadores': sala.max_jogadores,
+        'rodadas': list(mao.rodadas),
+        'inicial': sala.jogador_inicial_mao,
+        'valor': mao.valor_atual,
+        'jogadas': sala.rastreador.jogadas,
+        'pode_pedir': pode and sala.estado_jogo == 'JOGANDO' and 11 not in sala.placar,
+        'orcamento': orcamento,
+    }
+
+async def bot_pedir_truco(nome_sala, idx_bot):
+    # BOT inicia o pedido de aumento igual ao humano (evento pedir_truco)
+    if nome_sala not in jogos:
+        return
+    sala = jogos[nome_sala]
+        # GARANTIA FORTE: só pede truco se for realmente a vez do BOT (SID)
+    sid_da_vez = sala.jogadores[sala.vez_atual_idx]
+    sid_bot = sala.jogadores[idx_bot]
+
+    # se não for a vez do bot, nem tenta
+    if sid_da_vez != sid_bot:
+        return
+
+    # só pode pedir se estiver jogando e for a vez dele
+    # bloqueia truco na mão de 11 (igual ao evento pedir_truco)
+    if sala.estado_jogo != 'JOGANDO' or 11 in sala.placar:
+        return
+
+    if sala.vez_atual_idx != idx_bot:
+        return
+
+    # respeita regra do core (se existir)
+    try:
+        pode, msg = sala.mao.pode_pedir_aumento(idx_bot)
+        if not pode:
+            return
+    except:
+        pass
+
+    atual = sala.mao.valor_atual
+
+    # próximo valor
+    if atual == 1:
+        novo_valor = 3
+    elif atual == 3:
+        novo_valor = 6
+    elif atual == 6:
+        novo_valor = 9
+    elif atual == 9:
+        novo_valor = 12
+    else:
+        return
+
+    # muda estado para TRUCO e registra o “pedinte”
+    sala.estado_jogo = 'TRUCO'
+    sala.pedinte_temp = idx_bot
+    sala.valor_proposto_temp = novo_valor
+
+    # toca som certo (truco/seis/nove/doze)
+    som_escolhido = get_som_aleatorio(SONS_TRUCO)
+    if novo_valor == 6:
+        som_escolhido = get_som_aleatorio(SONS_SEIS)
+    elif novo_valor == 9:
+        som_escolhido = get_som_aleatorio(SONS_NOVE)
+    elif novo_valor == 12:
+        som_escolhido = get_som_aleatorio(SONS_DOZE)
+
+    await emitir_som(nome_sala, som_escolhido)
+
+    # envia pedido para TODOS do time adversário (em duplas, os 2 recebem)
+    nome_bot = sala.jogadores_nomes[idx_bot]
+    indices_defesa = sala.indices_oponentes(idx_bot)
+
+    await emitir_pedido_truco_para_indices(nome_sala, sala, indices_defesa, novo_valor, nome_bot)
+
+
+
+async def bot_jogar(nome_sala, idx_bot):
+    try:
+        if nome_sala not in jogos: return
+        sala = jogos[nome_sala]
+
+        if sala.estado_jogo != 'JOGANDO':
+            return
+        
+        if sala.vez_atual_idx != idx_bot: 
+            return 
+
+        # GARANTIA EXTRA: confirma pelo SID (evita pedir no turno do humano)
+        if sala.jogadores[sala.vez_atual_idx] != sala.jogadores[idx_bot]:
+            return
+
+            
+        mao_bot = sala.maos_server[idx_bot]
+        if not mao_bot:
+            return
+
+        # decide truco / aumento (força real ou blefe) ou a carta (Monte Carlo),
+        # fora do loop; a sala pode mudar enquanto isso, então revalida depois
+        mao_antes = list(mao_bot)
+        acao, id_carta = await servico_bots.decidir(nome_sala, decidir_jogada, retrato_bot(sala, idx_bot))
+        if jogos.get(nome_sala) is not sala or sala.estado_jogo != 'JOGANDO':
+            return
+        if sala.vez_atual_idx != idx_bot or mao_bot != mao_antes:
+            return
+
+        if acao == 'truco':
+            await bot_pedir_truco(nome_sala, idx_bot)
+            # se o pedido REALMENTE foi feito, o estado vira TRUCO -> para aqui
+            if sala.estado_jogo == 'TRUCO':
+                return
+            # se não conseguiu pedir, joga a carta da heurística
+            _, id_carta = decidir_jogada(dict(retrato_bot(sala, idx_bot, orcamento=0), pode_pedir=False))
+
+        carta_escolhida = BARALHO[id_carta]
+        mao_bot.remove(carta_escolhida)
+
+        sid_bot = sala.jogadores[idx_bot]
+        await processar_jogada_carta(
+            nome_sala,
+            sid_bot,
+            carta_escolhida
+        )
+
+        
+    except Exception as e:
+        print(f"ERRO CRÍTICO NO BOT: {e}")
+        traceback.print_exc()
+
+async def processar_jogada_carta(nome_sala, sid, carta_obj):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+    
+    sala.mesa_cartas.append( (sid, carta_obj) )
+    if sala.rastreador: sala.rastreador.registrar(carta_obj.id)
+    await emitir_som(nome_sala, 'card')
+    await enviar_estado_mesa(nome_sala)
+
+    num_p = sala.max_jogadores
+    
+    # --- Verifica se a rodada (mesa) está cheia ---
+    if len(sala.mesa_cartas) < num_p:
+        sala.vez_atual_idx = (sala.vez_atual_idx + 1) % num_p
+        await atualizar_turnos(nome_sala)
+    else:
+        # FIM DA RODADA - Todos jogaram
+        sala.vez_atual_idx = None
+        await atualizar_turnos(nome_sala) 
+        # Deixa a mesa cheia à vista antes de recolher
+        agendar_evento(sala, ATRASO_FIM_RODADA, fechar_rodada, nome_sala,
+                       valido=lambda: sala.vez_atual_idx is None and len(sala.mesa_cartas) == num_p)
+
+async def fechar_rodada(nome_sala):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+
+    # --- 1. CALCULA QUEM GANHOU A RODADA (OU EMPATE) ---
+    maior_forca = -1
+    times_com_maior_forca = set() # Armazena quais times (0 ou 1) têm a maior carta
+
+    for item in sala.mesa_cartas:
+        sid_j, c = item
+        f = sala.jogo.calcular_forca(c)
+
+        # Descobre o time deste jogador
+        idx_jogador = sala.assento[sid_j]
+        time_jogador = idx_jogador % 2
+
+        if f > maior_forca:
+            maior_forca = f
+            times_com_maior_forca = {time_jogador} # Novo líder
+        elif f == maior_forca:
+            times_com_maior_forca.add(time_jogador) # Empate potencial
+
+    # Decide o resultado da RODADA
+    vencedor_rodada = -1 # -1 significa EMPATE (Canga)
+    vencedor_txt = "EMPATE (Canga)"
+
+    if len(times_com_maior_forca) == 1:
+        # Apenas um time tem a carta mais forte
+        vencedor_rodada = list(times_com_maior_forca)[0]
+        vencedor_txt = "Time A" if vencedor_rodada == 0 else "Time B"
+
+    # Adiciona o resultado ao histórico
+    sala.mao.rodadas.append(vencedor_rodada)
+
+    # Define quem começa a próxima (quem ganhou ou quem começou a anterior se empatou)
+    proximo_a_jogar = -1
+    if vencedor_rodada != -1:
+        # Procura o jogador desse time que jogou a maior carta para ser o primeiro
+        # (Simplificação: pega o primeiro índice desse time que venceu a rodada atual)
+        # Para ser exato, deveríamos guardar quem jogou a carta, mas a regra básica manda o vencedor tornar.
+        # Vamos achar quem jogou a carta vencedora:
+        for item in sala.mesa_cartas:
+            sid_j, c = item
+            if sala.jogo.calcular_forca(c) == maior_forca:
+                idx = sala.assento[sid_j]
+                if (idx % 2) == vencedor_rodada:
+                    proximo_a_jogar = idx
+                    break
+    else:
+         # Se empatou, quem torna é quem começou a rodada atual (regra comum) ou o "pé"
+         # Mas o mais comum no empate é quem "melou" a carta, ou segue a roda. 
+         # Vamos manter: quem tornou a rodada atual, torna a próxima.
+         # Para isso precisamos saber quem começou essa rodada. Vamos usar lógica de incremento:
+         # Se empatou, o próximo é o próximo do 'jogador_inicial_mao' + n_rodada?
+         # Simplificação robusta: O mão (primeiro da rodada 1) torna no empate.
+         proximo_a_jogar = sala.jogador_inicial_mao
+
+
+    # --- 2. LÓGICA DE QUEM LEVA A MÃO (regras em truco_core.resolver_mao) ---
+    venc_mao_int = resolver_mao(sala.mao.rodadas)
+
+    sala.mao.vencedor_mao = venc_mao_int
+
+    # --- 3. EXECUÇÃO DO RESULTADO ---
+    if sala.mao.vencedor_mao is not None:
+         # Mão encerrada
+         sala.mesa_cartas = []
+         await enviar_estado_mesa(nome_sala)
+         await finalizar_mao(nome_sala, sala.mao.vencedor_mao)
+    else:
+        # Continua para a próxima rodada
+        await notificar_info_jogo(nome_sala)
+        emitir_sala(sala, 'resultado_rodada', {'vencedor': vencedor_txt})
+
+        sala.mesa_cartas = []
+        await enviar_estado_mesa(nome_sala)
+
+        sala.vez_atual_idx = proximo_a_jogar
+        await atualizar_turnos(nome_sala)
+
+async def iniciar_nova_mao(nome_sala):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+    
+    sala.limpar_truco()
+    sala.num_mao += 1
+
+    jogo = sala.jogo
+    sala.mao = Mao(jogo)
+    sala.mao.dono_atual_da_aposta = None 
+    
+    sala.mesa_cartas = []; sala.maos_server = [] 
+    
+    num_p = sala.max_jogadores
+    maos, vira = jogo.dar_cartas(num_jogadores=num_p)
+    sala.maos_server = maos 
+    if sala.rastreador: sala.rastreador.nova_mao(vira.id)
+
+    sala.jogador_inicial_mao = (sala.jogador_inicial_mao + 1) % num_p
+    sala.vez_atual_idx = sala.jogador_inicial_mao
+
+    placar = sala.placar
+    time_11 = -1
+    eh_ferro = (placar[0] == 11 and placar[1] == 11)
+    
+    sala.estado_jogo = 'JOGANDO'
+    
+    if placar[0] == 11 and not eh_ferro: time_11 = 0; sala.estado_jogo = 'MAO_DE_11'
+    elif placar[1] == 11 and not eh_ferro: time_11 = 1; sala.estado_jogo = 'MAO_DE_11'
+
+    emitir_sala(sala, 'atualizar_mesa', {'cartas': []})
+    await emitir_som(nome_sala, 'shuffle')
+
+    vira_json = vira.json
+    base_mao = {'vira': vira_json, 'animar': True, 'blind': False, 'modo_jogo': num_p}
+    for p_sid in sala.humanos:
+        i = sala.assento[p_sid]
+        emitir_para(sala, [p_sid], 'receber_mao', {**base_mao, 'minhas_cartas': [c.json for c in maos[i]], 'seu_indice': i})
+        
+        if time_11 != -1 and (i % 2) == time_11:
+            emitir_para(sala, [p_sid], 'decisao_mao_11', decisao_mao_11(sala, i))
+
+    if sala.espectadores:
+        # Plateia: a vira e o verso das cartas, nenhuma mão
+        sala.quadro.publicar('receber_mao', mao_publica(sala, base_mao))
+
+    if sala.estado_jogo == 'MAO_DE_11':
+        if all(eh_bot(sala.jogadores[k]) for k in sala.indices_time[time_11]):
+            # Bots veem as cartas do time: correm se nenhuma mão presta
+            equidades = [equidade_mao([c.id for c in maos[k]], vira.id, num_p) for k in sala.indices_time[time_11]]
+            if TABELA_EQUIDADE is not None and max(equidades) < 0.4:
+                sala.mao.valor_atual = 1
+                await finalizar_mao(nome_sala, 1 - time_11)
+                return
+            sala.estado_jogo = 'JOGANDO'; sala.mao.valor_atual = 3
+
+    await notificar_info_jogo(nome_sala)
+    
+    if sala.estado_jogo == 'JOGANDO':
+        await atualizar_turnos(nome_sala)
+    else:
+        emitir_sala(sala, 'status_vez', {'e_sua_vez': False})
+
+def decisao_mao_11(sala, i):
+    """O que o assento i vê para decidir a mão de 11: em duplas, a mão do parceiro"""
+    if sala.max_jogadores == 2:
+        cartas, titulo = sala.maos_server[i], "JOGAR A MÃO DE 11?"
+    else:
+        cartas, titulo = sala.maos_server[(i + 2) % sala.max_jogadores], "CARTAS DO PARCEIRO"
+    return {'cartas_parceiro': [c.json for c in cartas], 'vira': sala.jogo.vira.json, 'titulo': titulo}
+
+async def finalizar_mao(nome_sala, ganhador_dado):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+    if sala.estado_jogo in ('FIM_DE_MAO', 'FIM'): return  # já finalizada
+    sala.estado_jogo = 'FIM_DE_MAO'; sala.vez_atual_idx = None
+    pontos = sala.mao.valor_atual
+    num_mao = sala.num_mao
+    
+    time_venc = 0 # Valor padrão (só usado se tudo falhar, mas não vai falhar)
+    
+    # 1. Se receber Inteiro (0 ou 1), confia nele.
+    if isinstance(ganhador_dado, int):
+        time_venc = ganhador_dado % 2
+    
+    # 2. Se receber String (fallback), analisa o conteúdo.
+    elif isinstance(ganhador_dado, str):
+        texto = ganhador_dado.upper()
+        # Se tiver "1", "B", ou "TIME 1", é o Time 1.
+        if "1" in texto or "B" in texto:
+            time_venc = 1
+        else:
+            time_venc = 0
+            
+    # Aplica os pontos no array do placar (índice 0 ou 1)
+    sala.placar[time_venc] += pontos
+    print(f"[DEBUG] VENCEDOR MAO: Time {time_venc} (Pontos: {pontos})")
+
+    # Verifica se alguém fechou o SET (12 pontos)
+    if max(sala.placar) >= 12:
+        idx_set_winner = 0 if sala.placar[0] >= 12 else 1
+        
+        sala.sets[idx_set_winner] += 1
+        sala.placar = [0, 0] 
+        
+        if sala.sets[idx_set_winner] >= 2:
+            win_team_letra = "A" if idx_set_winner == 0 else "B"
+            for meu_time in (0, 1):
+                eh_vitoria = (meu_time == idx_set_winner)
+                msg = "VITÓRIA! CAMPEÃO!" if eh_vitoria else "DERROTA! FIM DE JOGO!"
+                snd = 'win' if eh_vitoria else 'lose'
+                emitir_time(sala, meu_time, 'fim_de_jogo', {
+                    'titulo': msg,
+                    'motivo': f"Time {win_team_letra} venceu a partida!",
+                    'placar': [0,0],
+                    'som': snd
+                })
+            if sala.espectadores:
+                sala.quadro.publicar('fim_de_jogo', {'titulo': "FIM DE JOGO!", 'motivo': f"Time {win_team_letra} venceu a partida!",
+                                                     'placar': [0,0], 'som': None})
+            sala.sets = [0, 0]; sala.estado_jogo = 'FIM'
+        else:
+            # Fim de Set
+            placar_sets = f"{sala.sets[0]} x {sala.sets[1]}"
+            msg = f"FIM DA PARTIDA! Time {'A' if idx_set_winner==0 else 'B'} venceu o Set.\nSETS: {placar_sets}"
+            emitir_sala(sala, 'mensagem', msg)
+            for meu_time in (0, 1):
+                som = 'win' if meu_time == idx_set_winner else 'lose'
+                emitir_time(sala, meu_time, 'tocar_som', {'som': som})
+            agendar_evento(sala, ATRASO_FIM_SET, iniciar_nova_mao, nome_sala, valido=lambda: sala.num_mao == num_mao)
+    else:
+        # Fim de Mão Normal
+        nome_exibir = "Time A" if time_venc == 0 else "Time B"
+        emitir_sala(sala, 'fim_de_mao', {
+            'ganhador': nome_exibir,
+            'ganhador_idx': time_venc,
+            'pontos': pontos
+        })
+        agendar_evento(sala, ATRASO_FIM_MAO, iniciar_nova_mao, nome_sala, valido=lambda: sala.num_mao == num_mao)
+
+
+# ==============================================================================
+# 3. TRUCO E INTERAÇÕES
+# ==============================================================================
+
+async def bot_responder_truco(nome_sala, idx_bot, valor_proposto):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+    resposta = await servico_bots.decidir(nome_sala, decidir_resposta_truco, retrato_bot(sala, idx_bot), valor_proposto)
+    if jogos.get(nome_sala) is not sala or sala.estado_jogo != 'TRUCO': return
+    sid_bot = sala.jogadores[idx_bot]
+    await responder_truco_logica(nome_sala, sid_bot, resposta)
+
+async def responder_truco_logica(nome_sala, sid, resposta, dados_extras=None):
+    sala = jogos[nome_sala]
+    
+    if resposta == 'ACEITAR':
+        if sala.valor_proposto_temp is not None:
+            sala.mao.valor_atual = sala.valor_proposto_temp
+        else:
+            vals = {1:3, 3:6, 6:9, 9:12, 12:12}
+            sala.mao.valor_atual = vals.get(sala.mao.valor_atual, 3)
+        
+        pedinte_idx = sala.pedinte_temp
+        if pedinte_idx is not None:
+            sala.mao.dono_atual_da_aposta = pedinte_idx
+            
+        sala.estado_jogo = 'JOGANDO' 
+        sala.limpar_truco()
+
+        emitir_sala(sala, 'truco_respondido', {'msg': f'ACEITOU! VALE {sala.mao.valor_atual}'})
+        
+        await notificar_info_jogo(nome_sala)
+        await atualizar_turnos(nome_sala) 
+
+    elif resposta == 'CORRER':
+        await emitir_som(nome_sala, get_som_aleatorio(SONS_CORRER))
+        idx = sala.assento[sid]
+        idx_vencedor = 1 if (idx % 2) == 0 else 0
+        await finalizar_mao(nome_sala, idx_vencedor)
+        
+    elif resposta == 'AUMENTAR':
+        # Confirma o valor anterior
+        if sala.valor_proposto_temp is not None:
+            sala.mao.valor_atual = sala.valor_proposto_temp
+
+        pedinte_original_idx = sala.pedinte_temp
+        repicador_idx = sala.assento[sid]
+
+        # Leitura segura do valor
+        val_recebido = 0
+        if dados_extras:
+            val_recebido = dados_extras.get('novo_valor') or dados_extras.get('valor') or 0
+
+        if not val_recebido:
+            atual = sala.mao.valor_atual
+            if atual == 3:
+                val_recebido = 6
+            elif atual == 6:
+                val_recebido = 9
+            elif atual == 9:
+                val_recebido = 12
+
+        novo_valor = int(val_recebido)
+
+        # Som do aumento (se quiser variações, coloque seis1/nove1/doze1 nas listas)
+        som_aumento = None
+        if novo_valor == 6:
+            som_aumento = get_som_aleatorio(SONS_SEIS)
+        elif novo_valor == 9:
+            som_aumento = get_som_aleatorio(SONS_NOVE)
+        elif novo_valor == 12:
+            som_aumento = get_som_aleatorio(SONS_DOZE)
+
+        if som_aumento:
+            await emitir_som(nome_sala, som_aumento)
+
+        sala.valor_proposto_temp = novo_valor
+        sala.pedinte_temp = repicador_idx
+        sala.estado_jogo = 'TRUCO'
+
+        nome_repicador = sala.jogadores_nomes[repicador_idx]
+
+        # Quando tem AUMENTO (SEIS/NOVE/DOZE), o time que pediu antes (pedinte_original) deve responder.
+        # Em duplas, os 2 jogadores desse time recebem o modal (se houver humano; bot segue humano).
+        indices_time_pedinte = sala.indices_do_time(pedinte_original_idx)
+
+        await emitir_pedido_truco_para_indices(nome_sala, sala, indices_time_pedinte, novo_valor, nome_repicador)
+    
+# Os eventos do cliente só entram na caixa da sala; quem mexe no estado é o
+# evento_* correspondente, um por vez
+
+@sio.event
+async def pedir_truco(sid, dados):
+    monitor_afk.tocar(sid)
+    n, sala, idx = localizar_jogador(sid)
+    if sala: sala.ator.enviar(evento_pedir_truco, n, sala, sid, idx, dados)
+
+async def evento_pedir_truco(n, sala, sid, idx, dados):
+    # Validações
+    if sala.estado_jogo != 'JOGANDO' or 11 in sala.placar: return
+    if sala.vez_atual_idx != idx: return 
+    try:
+        pode, msg = sala.mao.pode_pedir_aumento(idx)
+        if not pode: return 
+    except: pass
+    
+    sala.estado_jogo = 'TRUCO'
+    sala.pedinte_temp = idx
+    sala.valor_proposto_temp = dados['valor']
+    
+    # --- BLOCO DE SOM (SUBSTITUIR) ---
+    som_escolhido = get_som_aleatorio(SONS_TRUCO)
+    val = int(dados['valor'])
+
+    if val == 6:
+        som_escolhido = get_som_aleatorio(SONS_SEIS)
+    elif val == 9:
+        som_escolhido = get_som_aleatorio(SONS_NOVE)
+    elif val == 12:
+        som_escolhido = get_som_aleatorio(SONS_DOZE)
+
+    await emitir_som(n, som_escolhido)
+# --------------------------------
+
+    
+  
+        # Em duplas, ambos os jogadores do time adversário devem receber o pedido.
+    nome = sala.jogadores_nomes[idx]
+    indices_defesa = sala.indices_oponentes(idx)
+
+    await emitir_pedido_truco_para_indices(n, sala, indices_defesa, dados['valor'], nome)
+
+    # quem pediu fica "aguardando"
+    emitir_para(sala, [sid], 'aguardando_truco', {})
+
+@sio.event
+async def responder_truco(sid, dados): 
+    monitor_afk.tocar(sid)
+    n, sala, idx = localizar_jogador(sid)
+    if sala: sala.ator.enviar(evento_responder_truco, n, sala, sid, dados)
+
+async def evento_responder_truco(n, sala, sid, dados):
+    # Em duplas os dois recebem o pedido: só a primeira resposta vale
+    if sala.estado_jogo != 'TRUCO': return
+    await responder_truco_logica(n, sid, dados['resposta'], dados)
+
+    # Fecha o modal de TRUCO em todos (em duplas, o parceiro também fecha automaticamente)
+    emitir_sala(sala, 'fechar_modal_truco', {})
+
+@sio.event
+async def responder_mao_11(sid, dados):
+    monitor_afk.tocar(sid)
+    n, sala, idx = localizar_jogador(sid)
+    if sala: sala.ator.enviar(evento_responder_mao_11, n, sala, idx, dados)
+
+async def evento_responder_mao_11(n, sala, idx, dados):
+    if sala.estado_jogo != 'MAO_DE_11': return
+    resposta = dados['resposta']
+    if resposta == 'JOGAR':
+        sala.mao.valor_atual = 3
+        sala.estado_jogo = 'JOGANDO'
+        await notificar_info_jogo(n)
+        emitir_sala(sala, 'mensagem', "Mão de 11 ACEITA! Valendo 3!")
+        await atualizar_turnos(n)
+    elif resposta == 'CORRER':
+        sala.mao.valor_atual = 1
+        idx_vencedor = 1 if (idx % 2) == 0 else 0
+        await finalizar_mao(n, idx_vencedor)
+
+# ==============================================================================
+# 4. EVENTOS DE CONEXÃO E SALAS
+# ==============================================================================
+
+def localizar_jogador(sid):
+    """(nome_sala, sala, assento) do humano, ou (None, None, None) se não está em sala"""
+    local = assentos.get(sid)
+    if local is None: return None, None, None
+    nome_sala, idx = local
+    return nome_sala, jogos[nome_sala], idx
+
+def sentar_jogador(sala, sid, nome):
+    pareamento.sair(sid)  # sentou por conta própria: larga a fila
+    ficha = None if eh_bot(sid) else secrets.token_urlsafe(16)
+    idx = sala.adicionar_jogador(sid, nome, ficha)
+    if ficha is not None:
+        assentos[sid] = (sala.nome, idx)
+        fichas[ficha] = sala.nome
+        sio.start_background_task(sio.emit, 'ficha', {'nome_sala': sala.nome, 'ficha': ficha}, to=sid)
+    sala.atividade = time.monotonic()
+    lobby.marcar(sala)
+    diario.registrar(sala)
+    return idx
+
+def remover_sala(nome_sala):
+    """Único ponto que tira uma sala de 'jogos': limpa o índice de assentos e
+    cancela as decisões de bot, o que estava na agenda e a caixa de eventos"""
+    sala = jogos.pop(nome_sala, None)
+    if sala is None: return
+    lobby.marcar(sala)
+    diario.remover(nome_sala)
+    for cliente in sala.clientes:
+        salas_por_cliente[cliente] -= 1
+        if salas_por_cliente[cliente] <= 0: del salas_por_cliente[cliente]
+    for p in sala.humanos:
+        if assentos.get(p, (None,))[0] == nome_sala: del assentos[p]
+        reservas.pop(p, None)
+    for f in sala.fichas: fichas.pop(f, None)
+    for v in sala.espectadores: espectando.pop(v, None)
+    servico_bots.cancelar_sala(nome_sala)
+    agenda.cancelar_sala(nome_sala)
+    sala.ator.parar()
+    sala.quadro.descartar()  # meio evento cancelado: não manda estado pela metade
+
+def reservar_assento(sid):
+    """Quem cai com a partida em andamento não perde o assento na hora: a
+    sala segue (bots e timers inclusive) e ele tem TEMPO_RESERVA segundos
+    para voltar com a ficha. False se não há partida a esperar."""
+    nome_sala, sala, idx = localizar_jogador(sid)
+    if sala is None or sala.mao is None or sala.estado_jogo == 'FIM': return False
+    reservas[sid] = nome_sala
+    agenda.agendar(nome_sala, TEMPO_RESERVA, expirar_reserva, sid, nome_sala)
+    sala.ator.enviar(avisar_sala, sala, f"{sala.jogadores_nomes[idx]} caiu. Esperando voltar...", interno=True)
+    return True
+
+async def expirar_reserva(sid, nome_sala):
+    if reservas.get(sid) != nome_sala: return  # já voltou
+    print(f"[SISTEMA] {sid} não voltou para {nome_sala}: W.O.")
+    await gerenciar_desistencia(sid)
+
+async def avisar_sala(sala, texto):
+    emitir_sala(sala, 'mensagem', texto)
+
+def retomada(sala, idx):
+    """Retrato do jogo visto do assento idx, num evento só: quem volta
+    redesenha a mesa sem repetir receber_mao / info_jogo / atualizar_mesa"""
+    time_ = idx % 2
+    truco = None
+    if sala.estado_jogo == 'TRUCO' and sala.pedinte_temp is not None and sala.pedinte_temp % 2 != time_:
+        truco = {'valor': int(sala.valor_proposto_temp), 'quem_pediu': sala.jogadores_nomes[sala.pedinte_temp]}
+    return {
+        'mao': {'vira': sala.jogo.vira.json, 'animar': False, 'blind': False, 'modo_jogo': sala.max_jogadores,
+                'minhas_cartas': [c.json for c in sala.maos_server[idx]], 'seu_indice': idx},
+        'mesa': {'cartas': cartas_na_mesa(sala)},
+        'info': {**info_base(sala), 'placar': sala.placar if time_ == 0 else sala.placar[::-1],
+                 'sets': sala.sets if time_ == 0 else sala.sets[::-1],
+                 'dono_aposta': dono_aposta_visto_por(sala, idx), 'seu_indice': idx},
+        'restantes': [len(m) for m in sala.maos_server],
+        'vez': sala.estado_jogo == 'JOGANDO' and sala.vez_atual_idx == idx,
+        'truco': truco,
+        'aguardando': sala.estado_jogo == 'TRUCO' and truco is None,
+        'mao_11': decisao_mao_11(sala, idx) if sala.estado_jogo == 'MAO_DE_11' and sala.placar[time_] == 11 else None,
+    }
+
+def parar_de_assistir(sid):
+    n = espectando.pop(sid, None)
+    if n is not None:
+        jogos[n].espectadores.discard(sid)
+        lobby.marcar(jogos[n])
+
+async def gerenciar_desistencia(sid):
+    parar_de_assistir(sid)
+    nome_sala, sala, idx = localizar_jogador(sid)
+    if sala:
+        # Sai de 'jogos' antes de qualquer await: outra desistência na mesma sala
+        # (ex.: expirações em leva) já não a encontra
+        remover_sala(nome_sala)
+        if sala.estado_jogo == 'FIM': return  # partida já decidida: não há W.O.
+        time_venc = 1 if (idx % 2) == 0 else 0
+        for meu_time in (0, 1):
+            tit = "VITÓRIA (W.O.)!" if meu_time == time_venc else "DERROTA"
+            emitir_time(sala, meu_time, 'fim_de_jogo', {
+                'titulo': tit, 'motivo': 'Oponente desconectou.',
+                'placar': sala.placar,
+                'som': 'win' if meu_time==time_venc else 'lose'
+            }, exceto=sid)
+        if sala.espectadores:
+            sala.quadro.publicar('fim_de_jogo', {'titulo': "FIM DE JOGO", 'motivo': 'Um jogador desconectou.',
+                                                 'placar': sala.placar, 'som': None})
+        await enviar_quadro(sala)
+
+@sio.event
+async def connect(sid, environ, auth=None): 
+    monitor_afk.tocar(sid)
+    # Atrás de proxy (Render etc.) o endereço do cliente vem no X-Forwarded-For
+    encaminhado = environ.get('HTTP_X_FORWARDED_FOR', '').split(',')[0].strip()
+    clientes[sid] = encaminhado or environ.get('REMOTE_ADDR') or sid
+    # Codificação compacta é opcional: sem msgpack no servidor, segue no JSON
+    if isinstance(auth, dict) and auth.get('codificacao') == 'msgpack' and compacto.DISPONIVEL:
+        saidas.compactos.add(sid)
+    await lobby.retrato(sid)
+
+@sio.event
+async def disconnect(sid): 
+    monitor_afk.remover(sid)
+    saidas.remover(sid)
+    await lobby.sair(sid)
+    clientes.pop(sid, None)
+    pareamento.sair(sid)
+    parar_de_assistir(sid)
+    if not reservar_assento(sid): await gerenciar_desistencia(sid)
+
+@sio.event
+async def reconectar(sid, d):
+    """Volta ao assento da ficha (depois de cair ou recarregar a página)"""
+    monitor_afk.tocar(sid)
+    d = d if isinstance(d, dict) else {}
+    ficha = d.get('ficha')
+    sala = jogos.get(fichas.get(ficha))
+    if sala is None or sid in assentos:
+        await sio.emit('reconexao_recusada', {}, to=sid)
+        return
+    parar_de_assistir(sid)
+    sala.ator.enviar(evento_reconectar, sala.nome, sala, sid, ficha)
+    await lobby.sair(sid)
+
+async def evento_reconectar(n, sala, sid, ficha):
+    if ficha not in sala.fichas: return
+    idx = sala.fichas.index(ficha)
+    antigo = sala.jogadores[idx]
+    if antigo != sid:
+        sala.trocar_jogador(antigo, sid)
+        assentos.pop(antigo, None)
+        assentos[sid] = (n, idx)
+        if reservas.pop(antigo, None) is None:
+            # A conexão velha ainda não tinha caído (outra aba, troca de rede): fica a nova
+            sio.start_background_task(sio.disconnect, antigo)
+        emitir_sala(sala, 'mensagem', f"{sala.jogadores_nomes[idx]} voltou!", exceto=sid)
+    if sala.mao is None: emitir_para(sala, [sid], 'mensagem', 'Aguardando...')
+    else: emitir_para(sala, [sid], 'retomar', retomada(sala, idx))
+
+@sio.event
+async def pedir_lista_salas(sid, d=None):
+    """Retrato da lista (ressincronia, troca de filtro ou de página)"""
+    d = d if isinstance(d, dict) else {}
+    try: modo = int(d.get('modo')) if d.get('modo') is not None else None
+    except (TypeError, ValueError): modo = None
+    try: pagina = int(d.get('pagina', 0))
+    except (TypeError, ValueError): pagina = 0
+    await lobby.retrato(sid, modo, pagina)
+
+@sio.event
+async def criar_sala_vs_bot(sid, d):
+    monitor_afk.tocar(sid)
+    parar_de_assistir(sid)
+    n = d['nome_sala']; modo = int(d.get('modo', 4))
+    if n in jogos: return
+    if not await admitir_sala(sid): return
+    if sid in assentos: await gerenciar_desistencia(sid)  # largou a sala anterior
+    abrir_mesa(n, modo, [(sid, d['nome_jogador'])])
+    await lobby.sair(sid)
+
+def abrir_mesa(n, modo, jogadores):
+    """Sala com os humanos 'jogadores' [(sid, nome)] e bots no resto dos
+    assentos; a primeira mão já entra na caixa. Conta no limite de cada humano."""
+    sala = Sala(n, modo, rastreador=RastreadorCartas() if len(jogadores) < modo else None)
+    abrir_sala(sala, [cliente_de(sid) for sid, _ in jogadores])
+    for sid, nome in jogadores: sentar_jogador(sala, sid, nome)
+    for i in range(modo - len(jogadores)): sentar_jogador(sala, f'BOT_{i+1}', f'Robô {i+1}')
+    sala.ator.enviar(iniciar_nova_mao, n, interno=True)
+    return sala
+
+# --- Partida rápida (ver pareamento.py) ---
+
+_numeros_mesa = itertools.count(1)
+
+def nome_de_mesa():
+    """Nome livre para a mesa da fila; com shards, um que seja deste processo"""
+    while True:
+        n = f'Mesa {next(_numeros_mesa)}'
+        if n not in jogos and (gerente is None or dono(n) == SHARD): return n
+
+def formar_mesa(modo, jogadores):
+    for sid, _ in jogadores:
+        parar_de_assistir(sid)
+        sio.start_background_task(lobby.sair, sid)
+    sala = abrir_mesa(nome_de_mesa(), modo, jogadores)
+    print(f"[FILA] {sala.nome}: {len(jogadores)} de {modo} da fila"
+          + (f", {modo - len(jogadores)} bots" if len(jogadores) < modo else ""))
+
+pareamento = Pareamento(formar_mesa)
+
+@sio.event
+async def entrar_fila(sid, d):
+    monitor_afk.tocar(sid)
+    d = d if isinstance(d, dict) else {}
+    try: modo = int(d.get('modo', 4))
+    except (TypeError, ValueError): return
+    if modo not in pareamento.filas: return
+    if not await admitir_sala(sid): return
+    if sid in assentos: await gerenciar_desistencia(sid)
+    parar_de_assistir(sid)
+    esperando = pareamento.entrar(sid, str(d.get('nome_jogador') or 'Jogador'), modo)
+    if sid not in assentos:  # não fechou mesa: avisa quantos esperam
+        await sio.emit('na_fila', {'modo': modo, 'esperando': esperando}, to=sid)
+
+@sio.event
+async def sair_fila(sid, d=None):
+    pareamento.sair(sid)
+
+@sio.event
+async def criar_sala(sid, d):
+    monitor_afk.tocar(sid)
+    parar_de_assistir(sid)
+    n = d['nome_sala']; modo = int(d['modo'])
+    if n in jogos: return
+    if not await admitir_sala(sid): return
+    if sid in assentos: await gerenciar_desistencia(sid)
+    sala = Sala(n, modo)
+    abrir_sala(sala, [cliente_de(sid)])
+    sentar_jogador(sala, sid, d['nome_jogador'])
+    await lobby.sair(sid)
+
+@sio.event
+async def entrar_sala(sid, d):
+    monitor_afk.tocar(sid)
+    parar_de_assistir(sid)
+    n = d['nome_sala']
+    if n in jogos:
+        s = jogos[n]
+        if assentos.get(sid, (None,))[0] == n: return  # já está nesta sala
+        if not s.cheia():
+            if sid in assentos:
+                await gerenciar_desistencia(sid)
+                if jogos.get(n) is not s: return
+            sentar_jogador(s, sid, d['nome_jogador'])
+            if s.cheia(): s.ator.enviar(iniciar_nova_mao, n, interno=True)
+            else: await sio.emit('mensagem', 'Aguardando...', to=sid)
+            await lobby.sair(sid)
+        else: await sio.emit('erro', 'Sala cheia', to=sid)
+
+@sio.event
+async def assistir_sala(sid, d):
+    n = d['nome_sala']
+    sala = jogos.get(n)
+    if sala is None or sid in assentos or espectando.get(sid) == n: return
+    if len(sala.espectadores) >= MAX_ESPECTADORES:
+        await sio.emit('erro', 'Plateia cheia', to=sid); return
+    parar_de_assistir(sid)
+    monitor_afk.remover(sid)  # quem só assiste não é expulso por inatividade
+    sala.espectadores.add(sid)
+    espectando[sid] = n
+    lobby.marcar(sala)
+    # O retrato sai pela caixa, entre dois quadros: nada se perde nem repete
+    sala.ator.enviar(evento_assistir_sala, sala, sid)
+    await lobby.sair(sid)
+
+async def evento_assistir_sala(sala, sid):
+    if sid not in sala.espectadores: return
+    eventos = []
+    if sala.mao is not None:
+        eventos = [('receber_mao', mao_publica(sala)), ('info_jogo', info_publica(sala)),
+                   ('atualizar_mesa', {'cartas': cartas_na_mesa(sala)}), ('status_vez', {'e_sua_vez': False})]
+    await saidas.enviar([sid], 'quadro', {'sala': sala.nome, 'v': sala.quadro.versao, 'eventos': eventos})
+
+@sio.event
+async def jogar_carta(sid, d):
+    monitor_afk.tocar(sid)
+    n, sala, idx = localizar_jogador(sid)
+    if sala: sala.ator.enviar(evento_jogar_carta, n, sala, sid, idx, d)
+
+async def evento_jogar_carta(n, sala, sid, idx, d):
+    if sala.estado_jogo != 'JOGANDO' or sala.vez_atual_idx != idx: return
+    mao = sala.maos_server[idx]
+    
+    val_alvo = str(d['carta']['valor'])
+    nai_alvo = str(d['carta']['naipe'])
+    
+    # Cartas são únicas (flyweight): basta achar a instância e testar se está na mão
+    c_obj = CARTAS_POR_NOME.get((val_alvo, nai_alvo))
+    
+    if c_obj in mao:
+        mao.remove(c_obj)
+        await processar_jogada_carta(n, sid, c_obj)
+    else:
+        print(f"ERRO: Carta não encontrada! {val_alvo}/{nai_alvo}")
+
+@sio.event
+async def enviar_emote(sid, d):
+    n, sala, idx = localizar_jogador(sid)
+    if sala: sala.ator.enviar(evento_emote, sala, idx, d)
+
+async def evento_emote(sala, idx, d):
+    emitir_sala(sala, 'receber_emote', {'remetente_idx': idx, 'conteudo': d['conteudo'], 'tipo': d['tipo']})
+
+@sio.event
+async def sair_do_jogo(sid):
+    pareamento.sair(sid)
+    await gerenciar_desistencia(sid)
+
+def metricas():
+    return {
+        'salas': len(jogos), 'jogadores': len(assentos), 'espectadores': len(espectando), 'reservas': len(reservas),
+        'saida': saidas.metricas(),
+        'shards': gerente.metricas() if gerente is not None else None,
+        'estaticos': estaticos.metricas(),
+        'diario': diario.metricas(),
+        'fila': pareamento.metricas(),
+        'coleta': {**coleta, 'max_salas': MAX_SALAS, 'max_por_cliente': MAX_SALAS_POR_CLIENTE,
+                   'clientes_com_sala': len(salas_por_cliente)},
+        'memoria': {**memoria_salas, 'rss_max_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss},
+        'lobby': {**lobby.stats, 'versoes': {str(c): v for c, v in lobby.versoes.items()}},
+        'quadros': dict(ESTATISTICAS_QUADROS),
+        'caixas': dict(ESTATISTICAS_CAIXAS),
+        'agenda': {**agenda.stats, 'pendentes': agenda.pendentes(), 'em_execucao': agenda.em_execucao()},
+        'afk': {**monitor_afk.stats, 'pendentes': len(monitor_afk)},
+        'bots': {**servico_bots.stats, 'cache': servico_bots.stats_cache()},
+    }
+
+# ==============================================================================
+# 5. RECUPERAÇÃO (DIÁRIO)
+# ==============================================================================
+# As salas voltam como estavam no último evento gravado. O que estava na
+# agenda (jogada de bot, recolher a mesa, próxima mão) não vai para o
+# diário: retomar_sala agenda de novo a partir do estado. Os humanos ficam
+# com o assento reservado até voltarem com a ficha (ver reconectar).
+
+def recuperar_salas():
+    estados = diario.recuperar()
+    for nome, estado in estados.items():
+        com_bot = any(eh_bot(p) for p in estado['jogadores'])
+        sala = Sala.restaurar(nome, estado, rastreador=RastreadorCartas() if com_bot else None)
+        abrir_sala(sala)
+        for i, p in enumerate(sala.jogadores):
+            if eh_bot(p): continue
+            assentos[p] = (nome, i)
+            if sala.fichas[i] is not None: fichas[sala.fichas[i]] = nome
+            # Sid de antes da queda: o assento espera ele voltar com a ficha
+            if not reservar_assento(p): monitor_afk.tocar(p)
+        sala.ator.enviar(retomar_sala, nome, interno=True)
+    if estados:
+        print(f"[DIARIO] {len(estados)} salas recuperadas em {diario.stats['recuperacao_ms']:.1f} ms.")
+
+async def retomar_sala(nome_sala):
+    if nome_sala not in jogos: return
+    sala = jogos[nome_sala]
+    if sala.mao is None: return  # ainda esperando jogadores
+    num_p = sala.max_jogadores
+    if sala.estado_jogo == 'FIM': return  # partida acabou: a coleta leva a sala
+    if sala.estado_jogo == 'FIM_DE_MAO':
+        num_mao = sala.num_mao
+        agendar_evento(sala, ATRASO_FIM_MAO, iniciar_nova_mao, nome_sala, valido=lambda: sala.num_mao == num_mao)
+    elif sala.estado_jogo == 'TRUCO':
+        # Pedido em aberto: de novo para quem tem que responder (bot responde sozinho)
+        pedinte = sala.pedinte_temp
+        await emitir_pedido_truco_para_indices(nome_sala, sala, sala.indices_oponentes(pedinte),
+                                               sala.valor_proposto_temp, sala.jogadores_nomes[pedinte])
+    elif sala.estado_jogo == 'JOGANDO':
+        if sala.vez_atual_idx is None and len(sala.mesa_cartas) == num_p:
+            agendar_evento(sala, ATRASO_FIM_RODADA, fechar_rodada, nome_sala,
+                           valido=lambda: sala.vez_atual_idx is None and len(sala.mesa_cartas) == num_p)
+        else:
+            await atualizar_turnos(nome_sala)
+
+# ==============================================================================
+# 6. VÁRIOS PROCESSOS (SHARDS)
+# ==============================================================================
+
+async def cliente_foi_para_outro_shard(sid):
+    # Dali em diante o dono da sala cuida da inatividade dele
+    monitor_afk.remover(sid)
+    await lobby.sair(sid)
+
+async def receber_lobby(msg):
+    await lobby.aplicar(msg['mudancas'])
+
+async def pedido_de_lobby(msg):
+    await gerente.publicar({'method': 'lobby', 'shard': msg['origem'], 'mudancas': lobby.locais()})
+
+async def publicar_lobby(mudancas):
+    await gerente.publicar({'method': 'lobby', 'mudancas': mudancas})
+
+if gerente is not None:
+    gerente.rotear(sio)
+    gerente.ao_encaminhar = cliente_foi_para_outro_shard
+    gerente.endereco = clientes.get
+    gerente.compactos = saidas.compactos  # o dono da sala manda compacto também a quem conectou em outro processo
+    gerente.ouvintes['lobby'] = receber_lobby
+    gerente.ouvintes['lobby_pedir'] = pedido_de_lobby
+    lobby.publicar = publicar_lobby
+
+async def iniciar_tarefas():
+    # No startup do ASGI, já dentro do loop do uvicorn (no import elas iam para
+    # um loop que nunca roda)
+    sio.start_background_task(loop_monitoramento_afk)
+    sio.start_background_task(loop_coleta_salas)
+    sio.start_background_task(servico_bots.aquecer)
+    recuperar_salas()
+    diario.iniciar()
+    if diario.ativo:
+        print(f"[DIARIO] Gravando as salas em {os.path.abspath(diario.pasta)} "
+              f"(fsync a cada {diario.janela * 1000:g} ms, retrato a cada {diario.checkpoint} registros).")
+    if not compacto.DISPONIVEL:
+        print("[SISTEMA] msgpack não instalado: codificação compacta desligada, todos os clientes no JSON.")
+    if gerente is not None:
+        gerente.iniciar(sio)
+        # Processo novo: os outros mandam as salas deles para a lista do lobby
+        await gerente.publicar({'method': 'lobby_pedir', 'origem': SHARD})
+        print(f"[SHARDS] Processo {SHARD} de {NUM_SHARDS} no ar.")
+
+app.on_startup = iniciar_tarefas
+
+if __name__ == '__main__':
+    if 'FD' in os.environ:  # socket já aberto pelo lancador.py, dividido entre os processos
+        uvicorn.run(app, fd=int(os.environ['FD']))
+    else:
+        port = int(os.environ.get("PORT", 10000))
+        uvicorn.run(app, host="0.0.0.0", port=port)
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
@@ -0,0 +1,146 @@
+"""Serviço de decisões dos bots fora do loop do asyncio.
+
+As decisões (funções de bot_ia que recebem o retrato da sala) rodam num
+ProcessPoolExecutor, então a busca de um bot não atrasa as outras salas.
+- Pedidos que chegam no mesmo tick vão juntos para o pool (um lote por
+  processo), em vez de uma ida e volta por pedido.
+- Cada pedido tem prazo; estourou, a decisão sai na hora, no próprio loop,
+  com orçamento zero (heurística).
+- cancelar_sala() descarta os pedidos de uma sala que saiu de 'jogos'.
+- Cada processo tem seu cache de decisões (bot_ia.cache_decisoes); os
+  contadores voltam junto com cada lote e stats_cache() soma tudo.
+
+Com BOT_PROCESSOS=0 tudo roda direto no loop (útil para desenvolver).
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+BOT_PROCESSOS = int(os.environ.get('BOT_PROCESSOS', os.cpu_count() or 1))
+PRAZO_DECISAO = float(os.environ.get('BOT_PRAZO', 0.5))  # segundos
+
+
+def _aquecer():
+    """Roda no processo filho: importa a IA e abre a tabela de equidade"""
+    from bot_ia import tabela_equidade
+    tabela_equidade()
+
+
+def _executar_lote(lote):
+    """Roda no processo filho: [(funcao, retrato, args), ...] -> (pid, contadores
+    do cache, resultados)"""
+    from bot_ia import cache_decisoes
+    resultados = []
+    for funcao, retrato, args in lote:
+        try:
+            resultados.append((True, funcao(retrato, *args)))
+        except Exception as e:
+            resultados.append((False, e))
+    return os.getpid(), dict(cache_decisoes.stats), resultados
+
+
+class ServicoBots:
+    def __init__(self, processos=BOT_PROCESSOS, prazo=PRAZO_DECISAO):
+        self.processos = processos
+        self.prazo = prazo
+        self._executor = None
+        self._lote = []        # pedidos do tick atual: (sala, funcao, retrato, args, futuro)
+        self._por_sala = {}    # nome_sala -> futuros pendentes
+        self.stats = {'decisoes': 0, 'lotes': 0, 'estouros': 0, 'canceladas': 0}
+        self._cache_processos = {}  # pid -> últimos contadores do cache daquele processo
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.processos)
+        return self._executor
+
+    async def aquecer(self):
+        """Sobe os processos antes do primeiro bot precisar deles"""
+        if self.processos <= 0:
+            return
+        pool = self._pool()
+        await asyncio.gather(*(asyncio.wrap_future(pool.submit(_aquecer)) for _ in range(self.processos)))
+
+    async def decidir(self, nome_sala, funcao, retrato, *args):
+        """Executa funcao(retrato, *args) no pool e devolve o resultado.
+        Lança CancelledError se a sala for cancelada no meio."""
+        self.stats['decisoes'] += 1
+        if self.processos <= 0:
+            return funcao(retrato, *args)
+
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        if not self._lote:
+            loop.call_soon(self._despachar)
+        self._lote.append((nome_sala, funcao, retrato, args, futuro))
+        pendentes = self._por_sala.setdefault(nome_sala, set())
+        pendentes.add(futuro)
+        try:
+            return await asyncio.wait_for(futuro, self.prazo)
+        except asyncio.TimeoutError:
+            self.stats['estouros'] += 1
+            return funcao(dict(retrato, orcamento=0), *args)
+        finally:
+            pendentes.discard(futuro)
+            if not pendentes and self._por_sala.get(nome_sala) is pendentes:
+                del self._por_sala[nome_sala]
+
+    def _despachar(self):
+        pedidos = [p for p in self._lote if not p[4].done()]
+        self._lote = []
+        # Um lote por processo, para o tick não ficar todo num processo só
+        for i in range(min(self.processos, len(pedidos))):
+            self._enviar_lote(pedidos[i::self.processos])
+
+    def _enviar_lote(self, lote):
+        self.stats['lotes'] += 1
+        tarefa = asyncio.wrap_future(self._pool().submit(_executar_lote, [(f, r, a) for _, f, r, a, _ in lote]))
+
+        def entregar(tarefa):
+            if tarefa.cancelled():
+                return
+            erro = tarefa.exception()
+            if erro is None:
+                pid, cache, resultados = tarefa.result()
+                self._cache_processos[pid] = cache
+            for i, (_, _, _, _, futuro) in enumerate(lote):
+                if futuro.done():
+                    continue  # prazo estourado ou sala cancelada
+                if erro is not None:
+                    futuro.set_exception(erro)
+                else:
+                    ok, valor = resultados[i]
+                    if ok:
+                        futuro.set_result(valor)
+                    else:
+                        futuro.set_exception(valor)
+
+        tarefa.add_done_callback(entregar)
+
+    def cancelar_sala(self, nome_sala):
+        """Cancela as decisões pendentes da sala (ela saiu de 'jogos')"""
+        for futuro in self._por_sala.pop(nome_sala, ()):
+            if not futuro.done():
+                futuro.cancel()
+                self.stats['canceladas'] += 1
+
+    def stats_cache(self):
+        """Acertos e falhas do cache de decisões, somando todos os processos"""
+        from bot_ia import cache_decisoes
+        total = dict(cache_decisoes.stats)  # este processo: modo direto e estouros de prazo
+        for cache in self._cache_processos.values():
+            for chave, valor in cache.items():
+                total[chave] += valor
+        pedidos = total['acertos'] + total['falhas']
+        total['taxa_acerto'] = total['acertos'] / pedidos if pedidos else 0.0
+        return total
+
+    def encerrar(self):
+        cache = self.stats_cache()
+        print(f"[BOTS] {self.stats['decisoes']} decisões, cache: {cache['acertos']} acertos, "
+              f"{cache['falhas']} falhas ({100 * cache['taxa_acerto']:.1f}%)")
+        if self._executor is not None:
+            # Espera os processos saírem: com wait=False o servidor às vezes
+            # terminava antes e deixava um processo órfão preso na fila
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,343 @@
+"""Servidor em vários processos: cada sala tem um dono (shard).
+
+O dono da sala é crc32(nome) % SHARDS; só ele tem a Sala em 'jogos', a
+caixa de eventos e os timers dela. O cliente conecta em qualquer processo
+(o lancador.py divide o mesmo socket entre todos) e o processo onde ele
+está (origem) encaminha para o dono os eventos da sala:
+- criar_sala / criar_sala_vs_bot / entrar_sala / assistir_sala / reconectar
+  pelo nome;
+- entrar_fila para o dono de 'fila:<modo>': uma fila só por modo, e a mesa
+  que ela forma é aberta lá mesmo;
+- os de quem já está sentado ou na fila (jogar_carta, truco, sair_fila...)
+  pela rota guardada quando ele entrou;
+- disconnect roda na origem e também no dono.
+O dono roda o handler de sempre com o mesmo sid. Os emits para um sid de
+outro processo saem pelo GerenteShards (um client_manager do Socket.IO
+sobre pub/sub), direto para o processo de origem quando ele é conhecido.
+
+A troca de mensagens passa por um broker plugável: BrokerLocal (filas no
+mesmo processo) ou o broker de socket Unix (servir_broker / ClienteUnix)
+que o lancador.py sobe. Com SHARDS=1 (o padrão) nada disto é usado.
+"""
+import asyncio
+import base64
+import os
+import pickle
+import struct
+import zlib
+
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from socketio.packet import Packet
+
+NUM_SHARDS = int(os.environ.get('SHARDS', 1))
+SHARD = int(os.environ.get('SHARD', 0))
+BROKER = os.environ.get('BROKER')  # caminho do socket Unix do broker
+
+POR_SALA = ('criar_sala', 'criar_sala_vs_bot', 'entrar_sala', 'assistir_sala', 'reconectar')
+POR_FILA = ('entrar_fila',)
+POR_ASSENTO = ('jogar_carta', 'pedir_truco', 'responder_truco', 'responder_mao_11', 'enviar_emote', 'sair_do_jogo',
+               'sair_fila')
+
+
+def dono(nome_sala, num_shards=NUM_SHARDS):
+    return zlib.crc32(str(nome_sala).encode()) % num_shards
+
+
+def dono_fila(modo, num_shards=NUM_SHARDS):
+    return dono(f'fila:{modo}', num_shards)
+
+
+# ==============================================================================
+# BROKERS
+# ==============================================================================
+# Mensagem é um dict; com 'shard' vai só para aquele shard, sem, vai para
+# todos menos quem mandou. A conexão de cada shard tem publicar(msg) e
+# receber() (espera a próxima).
+
+class BrokerLocal:
+    """Broker dentro do processo (vários servidores no mesmo loop)"""
+
+    def __init__(self):
+        self._filas = {}  # shard -> asyncio.Queue
+
+    def conectar(self, shard):
+        fila = self._filas[shard] = asyncio.Queue()
+        broker = self
+
+        class Conexao:
+            async def publicar(self, msg):
+                broker._entregar(shard, msg)
+
+            async def receber(self):
+                return await fila.get()
+
+        return Conexao()
+
+    def _entregar(self, origem, msg):
+        alvo = msg.get('shard')
+        for shard, fila in self._filas.items():
+            if shard == alvo or (alvo is None and shard != origem):
+                fila.put_nowait(msg)
+
+
+_TAMANHO = struct.Struct('!I')
+_ALVO = struct.Struct('!i')  # shard de destino na frente do pickle; -1 = todos
+
+
+def _empacotar(msg):
+    alvo = msg.get('shard')
+    return _ALVO.pack(-1 if alvo is None else alvo) + pickle.dumps(msg, pickle.HIGHEST_PROTOCOL)
+
+
+def _quadro(dados):
+    return _TAMANHO.pack(len(dados)) + dados
+
+
+async def _ler(leitor):
+    tamanho, = _TAMANHO.unpack(await leitor.readexactly(_TAMANHO.size))
+    return await leitor.readexactly(tamanho)
+
+
+async def servir_broker(caminho):
+    """Broker de socket Unix: cada shard conecta e manda o número dele;
+    depois, mensagens com prefixo de tamanho nos dois sentidos. O broker só
+    lê o destino na frente da mensagem, não abre o pickle."""
+    conexoes = {}  # shard -> writer
+
+    async def atender(leitor, escritor):
+        shard = None
+        try:
+            shard, = _ALVO.unpack(await _ler(leitor))
+            conexoes[shard] = escritor
+            while True:
+                dados = await _ler(leitor)
+                alvo, = _ALVO.unpack_from(dados)
+                pacote = _quadro(dados)
+                if alvo >= 0:
+                    destino = conexoes.get(alvo)
+                    if destino is not None:
+                        destino.write(pacote)
+                else:
+                    for outro, destino in conexoes.items():
+                        if outro != shard:
+                            destino.write(pacote)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if conexoes.get(shard) is escritor:
+                del conexoes[shard]
+            escritor.close()
+
+    return await asyncio.start_unix_server(atender, path=caminho)
+
+
+class ClienteUnix:
+    """Conexão de um shard com o broker de socket Unix"""
+
+    def __init__(self, caminho, shard):
+        self.caminho = caminho
+        self.shard = shard
+        self._leitor = self._escritor = None
+        self._abrindo = None
+
+    async def _abrir(self):
+        if self._abrindo is None:
+            self._abrindo = asyncio.ensure_future(self._conectar())
+        await self._abrindo
+
+    async def _conectar(self):
+        for _ in range(100):  # o broker pode estar subindo
+            try:
+                self._leitor, self._escritor = await asyncio.open_unix_connection(self.caminho)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(0.05)
+        else:
+            raise ConnectionError(f"broker {self.caminho} não responde")
+        self._escritor.write(_quadro(_ALVO.pack(self.shard)))
+
+    async def publicar(self, msg):
+        await self._abrir()
+        self._escritor.write(_quadro(_empacotar(msg)))
+        await self._escritor.drain()
+
+    async def receber(self):
+        await self._abrir()
+        return pickle.loads((await _ler(self._leitor))[_ALVO.size:])
+
+
+# ==============================================================================
+# GERENTE (client_manager do Socket.IO) E ROTEAMENTO DE EVENTOS
+# ==============================================================================
+
+class GerenteShards(AsyncPubSubManager):
+    """Pub/sub do Socket.IO sobre o broker, mais as mensagens do truco:
+    'evento' (handler encaminhado para o dono da sala) e as registradas em
+    'ouvintes' (ex.: a lista de salas do lobby)"""
+    name = 'shards'
+
+    def __init__(self, conexao, shard=SHARD, num_shards=NUM_SHARDS):
+        super().__init__(channel='truco')
+        self.conexao = conexao
+        self.shard = shard
+        self.num_shards = num_shards
+        self.ouvintes = {}   # method -> coroutine(msg)
+        self.rota = {}       # sid daqui -> shard onde está sentado/assistindo
+        self.origem = {}     # sid de outro processo -> shard onde está conectado
+        self.originais = {}  # evento -> handler sem o roteamento
+        self.ao_encaminhar = None  # coroutine(sid): o cliente daqui foi para a sala de outro shard
+        self.endereco = None  # endereco(sid) do cliente daqui, vai junto com o evento encaminhado
+        self.enderecos = {}  # sid de outro processo -> endereço do cliente (limite de salas por cliente)
+        self.compactos = set()  # sids que pediram a codificação compacta (o servidor põe o de saida.py)
+        self.stats = {'encaminhados': 0, 'recebidos': 0, 'emits_diretos': 0, 'emits_todos': 0}
+
+    def iniciar(self, servidor):
+        """Começa a ouvir o broker já no startup (o Socket.IO só faria isso
+        na primeira conexão, e o dono de uma sala pode não ter nenhuma)"""
+        if not servidor.manager_initialized:
+            servidor.manager_initialized = True
+            self.initialize()
+
+    async def publicar(self, msg):
+        await self.conexao.publicar(msg)
+
+    async def _publish(self, data):
+        if data.get('method') == 'emit':
+            self.stats['emits_todos'] += 1
+        await self.conexao.publicar(data)
+
+    async def _listen(self):
+        while True:
+            msg = await self.conexao.receber()
+            metodo = msg.get('method')
+            if metodo == 'evento':
+                self.stats['recebidos'] += 1
+                self.origem[msg['sid']] = msg['origem']
+                if msg.get('cliente') is not None:
+                    self.enderecos[msg['sid']] = msg['cliente']
+                if msg.get('compacto'):
+                    self.compactos.add(msg['sid'])
+                # Uma task por evento, como o Socket.IO faz com os eventos dos clientes
+                self.server.start_background_task(self._executar, msg['evento'], msg['sid'], msg['args'])
+            elif metodo in self.ouvintes:
+                self.server.start_background_task(self.ouvintes[metodo], msg)
+            else:
+                yield msg
+
+    async def _executar(self, evento, sid, args):
+        try:
+            await self.originais[evento](sid, *args)
+        finally:
+            if evento == 'disconnect':
+                self.origem.pop(sid, None)
+                self.enderecos.pop(sid, None)
+                self.compactos.discard(sid)
+
+    async def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        """Para sids conhecidos vai direto a quem os tem (daqui: local; de
+        outro processo: só para o shard de origem); o resto (salas do
+        Socket.IO, sid desconhecido) vai para todos os processos"""
+        alvo = to or room
+        if kwargs.get('ignore_queue') or callback is not None or alvo is None:
+            return await super().emit(event, data, namespace=namespace, room=alvo, skip_sid=skip_sid,
+                                      callback=callback, **kwargs)
+        sids = [alvo] if isinstance(alvo, str) else list(alvo)
+        locais, por_shard = [], {}
+        for sid in sids:
+            if self.is_connected(sid, namespace or '/'):
+                locais.append(sid)
+            elif sid in self.origem:
+                por_shard.setdefault(self.origem[sid], []).append(sid)
+            else:
+                return await super().emit(event, data, namespace=namespace, room=alvo, skip_sid=skip_sid)
+        if locais:
+            await super().emit(event, data, namespace=namespace, room=locais, skip_sid=skip_sid, ignore_queue=True)
+        for shard, remotos in por_shard.items():
+            self.stats['emits_diretos'] += 1
+            await self.conexao.publicar(_mensagem_emit(event, data, namespace or '/', remotos, skip_sid,
+                                                       self.host_id, shard))
+
+    # --- roteamento dos handlers ---------------------------------------------
+
+    def rotear(self, servidor):
+        """Troca os handlers de sala pelos que encaminham ao dono; chamar
+        depois que todos os @sio.event foram registrados"""
+        handlers = servidor.handlers['/']
+        for evento in POR_SALA + POR_FILA + POR_ASSENTO + ('disconnect',):
+            self.originais[evento] = handlers[evento]
+        for evento in POR_SALA:
+            handlers[evento] = self._por_sala(evento)
+        for evento in POR_FILA:
+            handlers[evento] = self._por_fila(evento)
+        for evento in POR_ASSENTO:
+            handlers[evento] = self._por_assento(evento)
+        handlers['disconnect'] = self._desconectar
+
+    async def _encaminhar(self, shard, evento, sid, args):
+        self.stats['encaminhados'] += 1
+        await self.conexao.publicar({'method': 'evento', 'shard': shard, 'origem': self.shard,
+                                     'evento': evento, 'sid': sid, 'args': list(args),
+                                     'cliente': self.endereco(sid) if self.endereco is not None else None,
+                                     'compacto': sid in self.compactos})
+
+    def _por_sala(self, evento):
+        def alvo(d):
+            return dono(d.get('nome_sala', ''), self.num_shards)
+        return self._por_chave(evento, alvo)
+
+    def _por_fila(self, evento):
+        def alvo(d):
+            try:
+                return dono_fila(int(d.get('modo', 4)), self.num_shards)
+            except (TypeError, ValueError):
+                return self.shard  # o handler daqui recusa
+        return self._por_chave(evento, alvo)
+
+    def _por_chave(self, evento, chave):
+        original = self.originais[evento]
+
+        async def handler(sid, *args):
+            d = args[0] if args and isinstance(args[0], dict) else {}
+            alvo = chave(d)
+            anterior = self.rota.get(sid)
+            if anterior is not None and anterior != alvo:
+                # Larga a sala (ou plateia) do outro shard antes, como o handler faria
+                await self._encaminhar(anterior, 'sair_do_jogo', sid, ())
+            self.rota[sid] = alvo
+            if alvo == self.shard:
+                return await original(sid, *args)
+            if self.ao_encaminhar is not None:
+                await self.ao_encaminhar(sid)
+            await self._encaminhar(alvo, evento, sid, args)
+        return handler
+
+    def _por_assento(self, evento):
+        original = self.originais[evento]
+
+        async def handler(sid, *args):
+            alvo = self.rota.get(sid, self.shard)
+            if alvo == self.shard:
+                return await original(sid, *args)
+            await self._encaminhar(alvo, evento, sid, args)
+        return handler
+
+    async def _desconectar(self, sid, *_):
+        alvo = self.rota.pop(sid, None)
+        await self.originais['disconnect'](sid)
+        if alvo is not None and alvo != self.shard:
+            await self._encaminhar(alvo, 'disconnect', sid, ())
+
+    def metricas(self):
+        return {**self.stats, 'shard': self.shard, 'shards': self.num_shards,
+                'rotas': len(self.rota), 'remotos': len(self.origem)}
+
+
+def _mensagem_emit(event, data, namespace, sids, skip_sid, host_id, shard):
+    """A mensagem 'emit' do AsyncPubSubManager, endereçada a um shard"""
+    data = list(data) if isinstance(data, tuple) else [data]
+    binary = Packet.data_is_binary(data)
+    if binary:
+        data, anexos = Packet.deconstruct_binary(data)
+        data = [data, *[base64.b64encode(a).decode() for a in anexos]]
+    return {'method': 'emit', 'event': event, 'data': data, 'binary': binary, 'namespace': namespace,
+            'room': sids, 'skip_sid': skip_sid, 'callback': None, 'host_id': host_id, 'shard': shard}
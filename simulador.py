@@ -0,0 +1,134 @@
+"""Simulador vetorizado de mãos de truco (NumPy).
+
+Distribui, joga e pontua milhões de mãos de uma vez, usando as mesmas
+regras do servidor (força por vira, rodada empatada = canga, melhor de 3).
+Serve para calibrar os limiares dos bots (forcas[0] >= 10, chance < 0.75...).
+
+Uso:
+    python simulador.py --jogadores 4 --maos 2000000 --politica forte
+"""
+import argparse
+import time
+
+import numpy as np
+
+from truco_core import TABELAS_FORCA
+
+# TABELA_FORCA[idx_vira, id_carta] -> mesma força de TrucoGame.calcular_forca
+TABELA_FORCA = np.array(TABELAS_FORCA, dtype=np.int16)
+
+EMPATE = -1       # rodada empatada (canga)
+NINGUEM = -2      # mão anulada (3 empates), igual ao servidor
+INDEFINIDO = -3   # mão ainda sem vencedor
+
+POLITICAS = ('forte', 'aleatoria')
+
+
+def distribuir(rng, n, num_jogadores):
+    """Embaralha n baralhos e distribui 3 cartas por jogador + vira.
+    Retorna (maos[n, jogadores, 3], vira[n]) com ids de carta."""
+    baralhos = rng.permuted(np.tile(np.arange(40, dtype=np.int8), (n, 1)), axis=1)
+    num_cartas = num_jogadores * 3
+    maos = baralhos[:, :num_cartas].reshape(n, num_jogadores, 3)
+    vira = baralhos[:, num_cartas]
+    return maos, vira
+
+
+def forcas_por_rodada(maos, vira, politica='forte'):
+    """Força da carta que cada jogador joga em cada rodada: [n, jogadores, 3].
+
+    'forte' é o bot atual (sempre joga a maior carta); 'aleatoria' joga na
+    ordem em que recebeu. Nenhuma das duas olha a mesa, então a ordem de
+    jogada dentro da rodada não muda o resultado."""
+    forcas = TABELA_FORCA[(vira // 4)[:, None, None], maos]
+    if politica == 'forte':
+        forcas = -np.sort(-forcas, axis=2)
+    elif politica != 'aleatoria':
+        raise ValueError(f"Política desconhecida: {politica}")
+    return forcas
+
+
+def resultado_rodadas(forcas):
+    """Vencedor de cada rodada (0, 1 ou EMPATE): [n, 3].
+    Times são os assentos pares (0) e ímpares (1)."""
+    maior_t0 = forcas[:, 0::2, :].max(axis=1)
+    maior_t1 = forcas[:, 1::2, :].max(axis=1)
+    return np.where(maior_t0 > maior_t1, 0, np.where(maior_t1 > maior_t0, 1, EMPATE)).astype(np.int8)
+
+
+def vencedor_mao(rodadas):
+    """Aplica as regras de processar_jogada_carta a todas as mãos.
+    Retorna (vencedor[n] em {0, 1, NINGUEM}, rodadas_jogadas[n])."""
+    r0, r1, r2 = rodadas[:, 0], rodadas[:, 1], rodadas[:, 2]
+
+    # Decide na 2ª rodada: 2x0, canga na 1ª (leva a 2ª) ou canga na 2ª (leva a 1ª)
+    na_segunda = np.where((r0 == r1) & (r0 != EMPATE), r0,
+                 np.where((r0 == EMPATE) & (r1 != EMPATE), r1,
+                 np.where((r0 != EMPATE) & (r1 == EMPATE), r0, INDEFINIDO)))
+
+    # Decide na 3ª: quem ganhar leva; se empatar, leva quem ganhou a 1ª
+    na_terceira = np.where(r2 != EMPATE, r2, np.where(r0 != EMPATE, r0, NINGUEM))
+
+    decidida = na_segunda != INDEFINIDO
+    vencedor = np.where(decidida, na_segunda, na_terceira).astype(np.int8)
+    jogadas = np.where(decidida, 2, 3).astype(np.int8)
+    return vencedor, jogadas
+
+
+def simular(n, num_jogadores=4, politica='forte', seed=None, lote=250_000):
+    """Simula n mãos em lotes e devolve as contagens agregadas."""
+    rng = np.random.default_rng(seed)
+    stats = {
+        'maos': 0, 'vencedor': np.zeros(3, dtype=np.int64), 'rodadas': np.zeros(2, dtype=np.int64),
+        # Critérios de bot_deve_pedir_truco para o assento 0: [ocorrências, vitórias do time 0]
+        'forte_10': np.zeros(2, dtype=np.int64), 'duas_7': np.zeros(2, dtype=np.int64),
+    }
+    while stats['maos'] < n:
+        k = min(lote, n - stats['maos'])
+        maos, vira = distribuir(rng, k, num_jogadores)
+        forcas = forcas_por_rodada(maos, vira, politica)
+        vencedor, jogadas = vencedor_mao(resultado_rodadas(forcas))
+
+        stats['maos'] += k
+        stats['vencedor'] += np.bincount(vencedor + 2, minlength=4)[[2, 3, 0]]
+        stats['rodadas'] += np.bincount(jogadas - 2, minlength=2)
+
+        # Critérios olham a mão inteira do assento 0, em ordem decrescente
+        mao0 = -np.sort(-forcas[:, 0, :], axis=1)
+        venceu = vencedor == 0
+        for chave, criterio in (('forte_10', mao0[:, 0] >= 10), ('duas_7', mao0[:, 1] >= 7)):
+            stats[chave] += (criterio.sum(), (criterio & venceu).sum())
+    return stats
+
+
+def _pct(parte, total):
+    return 100.0 * parte / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador vetorizado de mãos de truco")
+    parser.add_argument('--jogadores', type=int, choices=(2, 4), nargs='+', default=[2, 4])
+    parser.add_argument('--maos', type=int, default=1_000_000)
+    parser.add_argument('--politica', choices=POLITICAS, default='forte')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    for num_jogadores in args.jogadores:
+        inicio = time.perf_counter()
+        s = simular(args.maos, num_jogadores, args.politica, args.seed)
+        duracao = time.perf_counter() - inicio
+        n = s['maos']
+        t0, t1, ninguem = s['vencedor']
+
+        print(f"== {num_jogadores} jogadores | política {args.politica} ==")
+        print(f"{n} mãos em {duracao:.2f}s ({n / duracao:,.0f} mãos/s)")
+        print(f"Time 0: {_pct(t0, n):.2f}%  Time 1: {_pct(t1, n):.2f}%  Ninguém: {_pct(ninguem, n):.3f}%")
+        print(f"Decididas na 2ª: {_pct(s['rodadas'][0], n):.2f}%  na 3ª: {_pct(s['rodadas'][1], n):.2f}%")
+        for chave, rotulo in (('forte_10', 'forcas[0] >= 10'), ('duas_7', 'forcas[1] >= 7')):
+            ocorr, vit = s[chave]
+            print(f"Assento 0 com {rotulo}: {_pct(ocorr, n):.2f}% das mãos, vence {_pct(vit, ocorr):.2f}%")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Caixa de eventos cheia: o cliente é recusado, os passos da sala não.
+
+python -m unittest test_ator (ou pytest)
+"""
+import asyncio
+import os
+import unittest
+
+os.environ.setdefault('BOT_PROCESSOS', '0')
+os.environ.setdefault('DIARIO', '')
+
+import server
+from ator import Ator
+
+
+class TesteCaixaCheia(unittest.TestCase):
+    def test_interno_entra_com_a_caixa_cheia(self):
+        async def rodar():
+            ator = Ator('A', capacidade=2)
+            liberar = asyncio.Event()
+            rodou = []
+
+            async def segura():
+                await liberar.wait()
+
+            async def passo(nome):
+                rodou.append(nome)
+
+            self.assertTrue(ator.enviar(segura))
+            await asyncio.sleep(0)
+            self.assertTrue(ator.enviar(passo, 'cliente'))
+            self.assertTrue(ator.enviar(passo, 'cliente'))
+            self.assertFalse(ator.enviar(passo, 'cliente demais'))
+            self.assertTrue(ator.enviar(passo, 'interno', interno=True))
+            liberar.set()
+            await asyncio.sleep(0.01)
+            self.assertEqual(rodou, ['cliente', 'cliente', 'interno'])
+            self.assertTrue(ator.enviar(passo, 'cliente de novo'))  # o limite volta com a caixa vazia
+
+        asyncio.run(rodar())
+
+    def test_fechar_rodada_agendado_roda_com_a_caixa_cheia(self):
+        async def rodar():
+            nome = 'Teste caixa cheia'
+            sala = server.abrir_mesa(nome, 2, [('h1', 'A'), ('h2', 'B')])
+            try:
+                for _ in range(100):  # a primeira mão sai pela caixa
+                    if sala.mao is not None and sala.ator._caixa is None:
+                        break
+                    await asyncio.sleep(0.01)
+                self.assertIsNotNone(sala.mao)
+                server.agenda.cancelar_sala(nome)
+
+                # Cliente inundando: um evento preso e a caixa no limite
+                liberar = asyncio.Event()
+
+                async def segura():
+                    await liberar.wait()
+
+                self.assertTrue(sala.ator.enviar(segura))
+                await asyncio.sleep(0)  # 'segura' já saiu da caixa e está rodando
+                while sala.ator.enviar(server.evento_emote, sala, 0, {'conteudo': 'x', 'tipo': 'texto'}):
+                    pass
+                self.assertGreaterEqual(server.ESTATISTICAS_CAIXAS['cheia'], 1)
+
+                # Os dois jogaram: o fim da rodada vem da agenda, como em jogar_carta
+                sala.mesa_cartas = [(sid, sala.maos_server[i].pop()) for i, sid in enumerate(sala.jogadores)]
+                sala.vez_atual_idx = None
+                server.agendar_evento(sala, 0, server.fechar_rodada, nome)
+                await asyncio.sleep(0.01)
+                liberar.set()
+                for _ in range(100):
+                    if sala.mao is None or sala.mao.rodadas:
+                        break
+                    await asyncio.sleep(0.01)
+                self.assertTrue(sala.mao is None or len(sala.mao.rodadas) == 1)
+                self.assertEqual(sala.mesa_cartas, [])
+            finally:
+                server.remover_sala(nome)
+
+        asyncio.run(rodar())
+
+
+if __name__ == '__main__':
+    unittest.main()